@@ -0,0 +1,96 @@
+    # Local stand-in for the RetroAchievements web API, serving data written by
+    # the benchmark library generator. Only the endpoints used by the checker
+    # are supported.
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import json
+import threading
+import time
+
+################################################################################
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """Request handler, expects 'ra_data', 'latency' and 'counts' to be set on the server."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        endpoint = url.path.rsplit('/', 1)[-1].removesuffix('.php')
+        ra_data = self.server.ra_data
+
+        with self.server.lock:
+            self.server.counts[endpoint] = self.server.counts.get(endpoint, 0) + 1
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if endpoint == 'API_GetConsoleIDs':
+            result = ra_data['consoles']
+        elif endpoint == 'API_GetGameList':
+            result = ra_data['games'].get(params.get('i', [''])[0], [])
+        elif endpoint == 'API_GetGameHashes':
+            result = {'Results': ra_data['hashes'].get(params.get('i', [''])[0], [])}
+        else:
+            self.send_error(404, f"Unknown endpoint {endpoint}")
+            return
+
+        body = json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+################################################################################
+
+def start(ra_data_path: str, port: int = 0, latency: float = 0.0) -> ThreadingHTTPServer:
+    '''
+    Starts the fake API on a background thread.
+
+    Args:
+        ra_data_path (str): Path to ra_data.json written by the library generator
+        port (int): Port to listen on, 0 for any free port
+        latency (float): Seconds to wait before answering each request
+
+    Returns:
+        The running server, base URL for the API is in server.url, and request
+        counts per endpoint in server.counts
+    '''
+    with open(ra_data_path, encoding='utf-8') as f:
+        ra_data = json.load(f)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeAPIHandler)
+    server.daemon_threads = True
+    server.ra_data = ra_data
+    server.latency = latency
+    server.counts = {}
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/API/"
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake RetroAchievements API for benchmarking")
+    parser.add_argument('ra_data', help="Path to ra_data.json written by the library generator")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds of latency to add to each request")
+    args = parser.parse_args()
+
+    server = start(args.ra_data, args.port, args.latency)
+    print(f"Serving fake API at {server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
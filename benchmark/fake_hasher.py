@@ -0,0 +1,42 @@
+    # Stand-in for RAHasher.exe and DolphinTool.exe, for benchmarking without
+    # the real tools. Prints the MD5 of the whole file, which matches what the
+    # benchmark library generator uses as RA hashes.
+    #
+    # RAHasher:   fake_hasher.py <system> <file>
+    # DolphinTool: fake_hasher.py verify -i <file> -a rchash
+    #
+    # Set FAKE_HASHER_DELAY to a number of seconds to simulate extra work.
+
+import hashlib
+import os
+import sys
+import time
+
+################################################################################
+
+def main(args: list) -> int:
+    if args[:1] == ['verify']:
+        file_path = args[args.index('-i') + 1]
+    elif len(args) == 2:
+        file_path = args[1]
+    else:
+        print("Usage: fake_hasher.py <system> <file>", file=sys.stderr)
+        return 1
+
+    if (delay := float(os.environ.get('FAKE_HASHER_DELAY') or 0)):
+        time.sleep(delay)
+
+    md5 = hashlib.md5()
+    try:
+        with open(file_path, 'rb') as f:
+            while (chunk := f.read(1024 * 1024)):
+                md5.update(chunk)
+    except OSError as e:
+        print(f"Could not open {file_path}: {e}", file=sys.stderr)
+        return 1
+
+    print(md5.hexdigest())
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,249 @@
+    # Generates a synthetic LaunchBox library, with ROM stub files and matching
+    # RetroAchievements data for the fake API, for benchmarking the checker.
+
+from xml.sax.saxutils import escape
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import stat
+import sys
+
+################################################################################
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXTENSIONS = {1: '.md', 2: '.z64', 3: '.sfc', 4: '.gb', 5: '.gba', 6: '.gbc', 7: '.nes', 8: '.pce'}
+"""ROM file extension for each RA console ID, anything else uses '.bin'."""
+
+FILLER_FIELDS = ('Notes', 'Developer', 'Publisher', 'Genre', 'Series', 'Region', 'PlayMode',
+                 'Version', 'Status', 'Source', 'ReleaseType', 'MaxPlayers', 'Rating',
+                 'CommunityStarRating', 'VideoUrl', 'WikipediaURL', 'DateAdded', 'DateModified')
+"""LaunchBox fields the checker doesn't use, repeated with suffixes to pad entries out."""
+
+################################################################################
+
+def rom_data(key: str, size: int) -> bytes:
+    """Unique, deterministic ROM stub contents for a key."""
+
+    seed = (key + '\n').encode('utf-8')
+    return (seed * (size // len(seed) + 1))[:size]
+
+def _entry_xml(tag: str, fields: dict, filler: int) -> str:
+    parts = [f"  <{tag}>"]
+    for k, v in fields.items():
+        if v is None or v == '':
+            parts.append(f"    <{k} />")
+        else:
+            parts.append(f"    <{k}>{escape(str(v))}</{k}>")
+    for i in range(filler):
+        parts.append(f"    <{FILLER_FIELDS[i % len(FILLER_FIELDS)]}{i}>Filler value {i}</{FILLER_FIELDS[i % len(FILLER_FIELDS)]}{i}>")
+    parts.append(f"  </{tag}>\n")
+    return "\n".join(parts)
+
+def _install_fake_hasher(dest: str):
+    """Copies the fake hasher script to dest as an executable using this Python."""
+
+    with open(os.path.join(REPO_DIR, 'benchmark', 'fake_hasher.py'), encoding='utf-8') as f:
+        script = f.read()
+    with open(dest, 'w', encoding='utf-8') as f:
+        f.write(f"#!{sys.executable}\n")
+        f.write(script)
+    os.chmod(dest, os.stat(dest).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+################################################################################
+
+def generate(out_dir: str, console_ids: list, games: int, apps: int, rom_size: int = 256,
+             filler: int = 80, match_ratio: float = 0.9, missing_ratio: float = 0.1, seed: int = 1) -> dict:
+    '''
+    Writes a synthetic LaunchBox install, RA data for the fake API and a
+    working directory with config files for the checker.
+
+    Layout of out_dir:
+        LaunchBox/      LaunchBox install with Data/, Games/ and a fake RAHasher
+        DolphinTool     Fake DolphinTool
+        ra_data.json    Data for the fake API
+        work/           Working directory to run the checker in
+
+    Args:
+        out_dir (str): Directory to write to, replaced if it exists
+        console_ids (list): RA console IDs to generate platforms for, names
+            come from config_consoles.json
+        games (int): Number of Game entries per platform
+        apps (int): Number of AdditionalApplication entries per platform
+        rom_size (int): Size of each ROM stub file in bytes
+        filler (int): Number of unused fields to pad each Game entry with
+        match_ratio (float): Fraction of Game/AA entries that have an RA game
+        missing_ratio (float): Number of extra RA games with no LB entry, as
+            a fraction of Game entries
+        seed (int): Random seed
+
+    Returns:
+        Dictionary of paths and counts for the generated library
+    '''
+    rng = random.Random(seed)
+
+    with open(os.path.join(REPO_DIR, 'config_consoles.json'), encoding='utf-8') as f:
+        consoles = json.load(f)
+    consoles_by_id = {c['rc_id']: c for c in consoles}
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+
+    lb_dir = os.path.join(out_dir, 'LaunchBox')
+    work_dir = os.path.join(out_dir, 'work')
+    os.makedirs(os.path.join(lb_dir, 'Data', 'Platforms'))
+    os.makedirs(os.path.join(lb_dir, 'ThirdParty', 'RetroAchievements'))
+    os.makedirs(work_dir)
+
+    _install_fake_hasher(os.path.join(lb_dir, 'ThirdParty', 'RetroAchievements', 'RAHasher.exe'))
+    _install_fake_hasher(os.path.join(out_dir, 'DolphinTool'))
+
+    ra_data = {'consoles': [], 'games': {}, 'hashes': {}}
+    ra_next_id = 1
+    counts = {'platforms': 0, 'games': 0, 'apps': 0, 'ra_games': 0}
+
+    with open(os.path.join(lb_dir, 'Data', 'Platforms.xml'), 'w', encoding='utf-8') as f_platforms:
+        f_platforms.write('<?xml version="1.0" standalone="yes"?>\n<LaunchBox>\n')
+
+        for c_id in console_ids:
+            c = consoles_by_id[c_id]
+            p_name = c['lb_scrapename'] or c['rc_name']
+            ext = EXTENSIONS.get(c_id, '.bin')
+            rom_dir = os.path.join('Games', p_name)
+            os.makedirs(os.path.join(lb_dir, rom_dir))
+
+            f_platforms.write(_entry_xml('Platform', {'Name': p_name, 'ScrapeAs': p_name, 'Folder': rom_dir}, 0))
+            ra_data['consoles'].append({'ID': c_id, 'Name': c['rc_name']})
+            ra_games = []
+
+            def add_ra_game(title: str, h: str) -> int:
+                nonlocal ra_next_id
+                g_id = ra_next_id
+                ra_next_id = ra_next_id + 1
+                ra_games.append({'ID': g_id, 'Title': title, 'ConsoleID': c_id, 'ConsoleName': c['rc_name'],
+                                 'NumAchievements': rng.randint(5, 80), 'Hashes': [h.upper()]})
+                ra_data['hashes'][str(g_id)] = [{'MD5': h, 'Name': title + ext, 'Labels': ['nointro']}]
+                return g_id
+
+            with open(os.path.join(lb_dir, 'Data', 'Platforms', p_name + '.xml'), 'w', encoding='utf-8') as f:
+                f.write('<?xml version="1.0" standalone="yes"?>\n<LaunchBox>\n')
+
+                g_ids = []
+                for i in range(games):
+                    title = f"{p_name} Game {i:06d}"
+                    app_path = os.path.join(rom_dir, title + ext)
+                    data = rom_data(f"{c_id}:game:{i}", rom_size)
+                    with open(os.path.join(lb_dir, app_path), 'wb') as f_rom:
+                        f_rom.write(data)
+
+                    h = hashlib.md5(data).hexdigest()
+                    ra_id = add_ra_game(title, h) if rng.random() < match_ratio else None
+                    g_id = f"{c_id:04x}0000-0000-0000-0000-{i:012x}"
+                    g_ids.append(g_id)
+
+                    f.write(_entry_xml('Game', {
+                        'ApplicationPath': app_path, 'ID': g_id, 'Title': title, 'Platform': p_name,
+                        'RetroAchievementsHash': h if ra_id else None, 'RetroAchievementsID': ra_id,
+                    }, filler))
+
+                for i in range(apps):
+                    g_i = i % max(games, 1)
+                    name = f"{p_name} Game {g_i:06d} (Hack {i:06d})"
+                    app_path = os.path.join(rom_dir, name + ext)
+                    data = rom_data(f"{c_id}:app:{i}", rom_size)
+                    with open(os.path.join(lb_dir, app_path), 'wb') as f_rom:
+                        f_rom.write(data)
+
+                    if rng.random() < match_ratio:
+                        add_ra_game(f"~Hack~ {name}", hashlib.md5(data).hexdigest())
+
+                    f.write(_entry_xml('AdditionalApplication', {
+                        'ApplicationPath': app_path, 'ID': f"{c_id:04x}0000-0000-0000-0001-{i:012x}",
+                        'GameID': g_ids[g_i] if g_ids else None, 'Name': name, 'Priority': 0,
+                    }, 0))
+
+                f.write('</LaunchBox>\n')
+
+            for i in range(int(games * missing_ratio)):
+                add_ra_game(f"{p_name} Missing Game {i:06d}", hashlib.md5(f"{c_id}:missing:{i}".encode()).hexdigest())
+
+            ra_data['games'][str(c_id)] = ra_games
+            counts['platforms'] = counts['platforms'] + 1
+            counts['games'] = counts['games'] + games
+            counts['apps'] = counts['apps'] + apps
+            counts['ra_games'] = counts['ra_games'] + len(ra_games)
+
+        f_platforms.write('</LaunchBox>\n')
+
+    with open(os.path.join(out_dir, 'ra_data.json'), 'w', encoding='utf-8') as f:
+        json.dump(ra_data, f)
+
+    # Config for running the checker against the library
+    for c in consoles:
+        c['should_scan'] = c['rc_id'] in console_ids
+        if c['should_scan'] and not c['lb_scrapename']:
+            c['lb_scrapename'] = c['rc_name']
+    with open(os.path.join(work_dir, 'config_consoles.json'), 'w', encoding='utf-8') as f:
+        json.dump(consoles, f, indent = 4)
+    write_config(work_dir, lb_dir, os.path.join(out_dir, 'DolphinTool'))
+
+    return {'out_dir': out_dir, 'launchbox': lb_dir, 'work': work_dir,
+            'ra_data': os.path.join(out_dir, 'ra_data.json'), 'counts': counts}
+
+################################################################################
+
+def write_config(work_dir: str, lb_dir: str, dtool_path: str, api_url: str = '', rate_limit: int = 0,
+                 native_hashing: bool = True, audit_games: bool = False):
+    '''
+    Writes config_settings.ini for running the checker in a working directory.
+    '''
+    with open(os.path.join(work_dir, 'config_settings.ini'), 'w', encoding='utf-8') as f:
+        f.write(f"""[LAUNCHBOX]
+directory = {lb_dir}
+
+[RAHASHER]
+doltool_path = {dtool_path}
+native_hashing = {native_hashing}
+workers =
+timeout =
+
+[RETROACHIEVEMENTS]
+username = benchmark
+api_key = benchmark
+workers =
+api_url = {api_url}
+rate_limit = {rate_limit or ''}
+
+[CHEEVO_CHECKER]
+dump_ra_data = False
+incremental = True
+audit_games = {audit_games}
+skip_demo = False
+skip_hack = False
+skip_homebrew = False
+skip_prototype = False
+skip_subset = False
+skip_unlicensed = False
+""")
+
+################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic LaunchBox library for benchmarking")
+    parser.add_argument('out_dir', help="Directory to write the library to (replaced if it exists)")
+    parser.add_argument('--consoles', type=int, nargs='+', default=[7], help="RA console IDs to generate platforms for")
+    parser.add_argument('--games', type=int, default=10000, help="Game entries per platform")
+    parser.add_argument('--apps', type=int, default=2000, help="AdditionalApplication entries per platform")
+    parser.add_argument('--rom-size', type=int, default=256, help="Size of ROM stub files in bytes")
+    parser.add_argument('--filler', type=int, default=80, help="Unused fields to pad each Game entry with")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    result = generate(args.out_dir, args.consoles, args.games, args.apps, args.rom_size, args.filler, seed=args.seed)
+    print(json.dumps(result, indent = 4))
+
+if __name__ == '__main__':
+    main()
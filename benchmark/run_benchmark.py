@@ -0,0 +1,193 @@
+    # Benchmarks the checker against a synthetic LaunchBox library and the fake
+    # RetroAchievements API, timing each phase separately.
+    #
+    # python -m benchmark.run_benchmark --games 10000 --apps 2000 --consoles 7 3
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmark import fake_api, library
+import modules.launchbox as LB
+
+################################################################################
+
+CHECKER_PATH = os.path.join(library.REPO_DIR, 'lb_cheevo_checker.py')
+
+LB_FIELDS = ('ID', 'GameID', 'Title', 'Name', 'ApplicationPath', 'RetroAchievementsHash', 'RetroAchievementsID')
+LB_TAGS = ('Game', 'AdditionalApplication')
+
+################################################################################
+
+def _reset_launchbox():
+    """Clears any data loaded by the launchbox module."""
+
+    LB.platforms.clear()
+    LB.gamedata.clear()
+    LB.gamedata_projection.clear()
+    LB.title_indexes.clear()
+    if LB.mirror is not None:
+        LB.mirror.close()
+        LB.mirror = None
+
+def _measure(func, memory: bool) -> dict:
+    """Runs a function, returning its wall time and optionally its peak traced memory."""
+
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    result = {'seconds': round(time.perf_counter() - start, 4)}
+    if memory:
+        result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+    return result
+
+def bench_parsing(lb_dir: str, platforms: list, mirror_path: str, memory: bool = False) -> dict:
+    '''
+    Times loading each platform with the launchbox module, using full dicts,
+    projected fields, and the SQLite mirror when cold and warm.
+    '''
+    results = {}
+    for p in platforms:
+        p_results = {}
+
+        def load(fields = None, tags = None):
+            LB.init(lb_dir)
+            LB.get_game_data(p, fields, tags)
+
+        _reset_launchbox()
+        p_results['full'] = _measure(load, memory)
+
+        _reset_launchbox()
+        p_results['projected'] = _measure(lambda: load(LB_FIELDS, LB_TAGS), memory)
+
+        for mode in ('mirror_cold', 'mirror_warm'):
+            _reset_launchbox()
+            if mode == 'mirror_cold' and os.path.exists(mirror_path):
+                os.remove(mirror_path)
+            LB.init(lb_dir)
+            LB.init_mirror(mirror_path)
+            p_results[mode] = _measure(lambda: LB.get_game_data(p, LB_FIELDS, LB_TAGS), memory)
+
+        _reset_launchbox()
+        p_results['xml_bytes'] = os.path.getsize(os.path.join(lb_dir, 'Data', 'Platforms', p + '.xml'))
+        results[p] = p_results
+    return results
+
+################################################################################
+
+def run_checker(work_dir: str) -> dict:
+    '''
+    Runs the checker in a working directory, returning its wall time and the
+    metrics summary it writes, which has timings for each phase and console.
+    '''
+    metrics_file = os.path.join(work_dir, 'data', 'metrics.json')
+    if os.path.exists(metrics_file):
+        os.remove(metrics_file)
+
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-u', CHECKER_PATH], cwd = work_dir,
+                          stdout = subprocess.PIPE, stderr = subprocess.STDOUT, text = True)
+    total = time.perf_counter() - start
+
+    result = {'returncode': proc.returncode, 'total': round(total, 4), 'phases': {}, 'consoles': {},
+              'counters': {}, 'output': proc.stdout.splitlines()}
+    if os.path.exists(metrics_file):
+        with open(metrics_file, encoding='utf-8') as f:
+            summary = json.load(f)
+        result.update((k, summary[k]) for k in ('phases', 'consoles', 'counters'))
+        # Interpreter startup and imports happen before the checker starts timing
+        result['phases'] = dict(interpreter = round(total - summary['total_seconds'], 4), **summary['phases'])
+    return result
+
+################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the checker against a synthetic library")
+    parser.add_argument('--dir', help="Directory for the generated library, defaults to a temporary directory")
+    parser.add_argument('--consoles', type=int, nargs='+', default=[7], help="RA console IDs to generate platforms for")
+    parser.add_argument('--games', type=int, default=10000, help="Game entries per platform")
+    parser.add_argument('--apps', type=int, default=2000, help="AdditionalApplication entries per platform")
+    parser.add_argument('--rom-size', type=int, default=256, help="Size of ROM stub files in bytes")
+    parser.add_argument('--filler', type=int, default=80, help="Unused fields to pad each Game entry with")
+    parser.add_argument('--runs', type=int, default=2, help="Checker runs, the first is cold and the rest warm")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds of latency for each fake API request")
+    parser.add_argument('--rate-limit', type=int, default=0, help="API requests per minute, defaults to the real limit")
+    parser.add_argument('--no-native', action='store_true', help="Hash with the fake RAHasher instead of natively")
+    parser.add_argument('--audit', action='store_true', help="Enable the Game hash audit")
+    parser.add_argument('--memory', action='store_true', help="Trace peak memory for parsing (slower)")
+    parser.add_argument('--skip-parsing', action='store_true', help="Don't benchmark launchbox module parsing")
+    parser.add_argument('--skip-checker', action='store_true', help="Don't benchmark checker runs")
+    parser.add_argument('--verbose', action='store_true', help="Show checker output")
+    parser.add_argument('--json', help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    tmp = None
+    out_dir = args.dir
+    if out_dir is None:
+        tmp = tempfile.TemporaryDirectory(prefix = 'lb_bench_')
+        out_dir = tmp.name
+
+    results = {'args': vars(args)}
+
+    print(f"Generating library in {out_dir}...")
+    start = time.perf_counter()
+    lib = library.generate(out_dir, args.consoles, args.games, args.apps, args.rom_size, args.filler)
+    results['generate'] = {'seconds': round(time.perf_counter() - start, 4), 'counts': lib['counts']}
+    print(f"  {lib['counts']} in {results['generate']['seconds']}s")
+
+    platforms = [p for p in os.listdir(os.path.join(lib['launchbox'], 'Data', 'Platforms'))]
+    platforms = sorted(p.removesuffix('.xml') for p in platforms)
+
+    if not args.skip_parsing:
+        print("Benchmarking LaunchBox parsing...")
+        results['parsing'] = bench_parsing(lib['launchbox'], platforms,
+                                           os.path.join(out_dir, 'bench_mirror.sqlite'), args.memory)
+        for p, r in results['parsing'].items():
+            print(f"  {p} ({r['xml_bytes'] / (1024 * 1024):.1f} MB)")
+            for mode in ('full', 'projected', 'mirror_cold', 'mirror_warm'):
+                peak = f", peak {r[mode]['peak_mb']} MB" if 'peak_mb' in r[mode] else ''
+                print(f"    {mode:<12} {r[mode]['seconds']:>8.3f}s{peak}")
+
+    if not args.skip_checker:
+        server = fake_api.start(lib['ra_data'], latency = args.latency)
+        library.write_config(lib['work'], lib['launchbox'], os.path.join(out_dir, 'DolphinTool'),
+                             server.url, args.rate_limit, not args.no_native, args.audit)
+
+        results['checker'] = []
+        for run in range(args.runs):
+            label = 'cold' if run == 0 else 'warm'
+            print(f"Running checker ({label})...")
+            server.counts.clear()
+            r = run_checker(lib['work'])
+            r['label'] = label
+            r['api_requests'] = dict(server.counts)
+            if args.verbose or r['returncode'] != 0:
+                print("\n".join("    | " + line for line in r['output']))
+            if not args.verbose:
+                del r['output']
+            results['checker'].append(r)
+
+            print(f"  Total {r['total']:.3f}s, API requests {r['api_requests']}")
+            for phase, seconds in r['phases'].items():
+                print(f"    {phase:<12} {seconds:>8.3f}s")
+            if r['counters']:
+                print("    " + ", ".join(f"{k} {v}" for k, v in r['counters'].items()))
+
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent = 4)
+
+    if tmp is not None:
+        tmp.cleanup()
+
+if __name__ == '__main__':
+    main()
@@ -1,343 +1,1036 @@
+import argparse
 import configparser
+import importlib.util
 import json
 import logging as log
-import xml.etree.ElementTree as ET
 from collections import defaultdict
 import os
 import re
-import subprocess
-import sys
 
+import modules.hashindex as HI
 import modules.launchbox as LB
-import modules.rcheevos.api as RC_API
-import modules.rcheevos.hash as RC_HASH
-
-try:
-    import requests_cache
-except ImportError:
-    print("Module 'requests-cache' not found, installing from pip...\n")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", 'requests-cache'])
-    print("")
-finally:
-    import requests_cache 
+import modules.metrics as METRICS
+import modules.scanstate as SCAN
+import modules.rcheevos.cache as RC_CACHE
+
+# RA API and hashing modules (and 'requests'/'requests-cache' with them) are slow to import, so they're
+# only imported by the steps that need them
 
 ################################################################################
 
-def etree_to_dict(t):
-    """https://stackoverflow.com/questions/2148119/how-to-convert-an-xml-string-to-a-dictionary"""
-
-    d = {t.tag: {} if t.attrib else None}
-    children = list(t)
-    if children:
-        dd = defaultdict(list)
-        for dc in map(etree_to_dict, children):
-            for k, v in dc.items():
-                dd[k].append(v)
-        d = {t.tag: {k:v[0] if len(v) == 1 else v for k, v in dd.items()}}
-    if t.attrib:
-        d[t.tag].update(('@' + k, v) for k, v in t.attrib.items())
-    if t.text:
-        text = t.text.strip()
-        if children or t.attrib:
-            if text:
-              d[t.tag]['#text'] = text
-        else:
-            d[t.tag] = text
-    return d
+COMMANDS = {
+    'run':        "Fetch RA data, hash LB entries, audit them if enabled in config, and compare (default)",
+    'fetch':      "Fetch RA data for consoles and report changes since the last fetch",
+    'hash':       "Hash new or changed LB Additional Application entries",
+    'compare':    "Compare RA data against LB entries, using cached hashes only",
+    'audit':      "Rehash LB Game entries and check them against the hash stored by LaunchBox",
+    'duplicates': "List LB entries that are the same game, by RA hash or by file contents",
+    'watch':      "Run, then keep re-checking consoles whenever their LB platform file or ROM folders change",
+}
+"""Subcommands, with help text."""
+
+LB_FIELDS = ('ID', 'GameID', 'Title', 'Name', 'ApplicationPath', 'RetroAchievementsHash', 'RetroAchievementsID')
+"""LaunchBox entry fields used by the checker, everything else is skipped when loading."""
+LB_TAGS = ('Game', 'AdditionalApplication')
+
+config = None
+"""Loaded config_settings.ini."""
+data_path = ''
+hashes_path = ''
+cache_path = ''
+incremental = True
+"""If True, only changes since the last run are reported. Every console is still loaded and its files checked."""
+resume = False
+"""If True, hashes from an interrupted run are kept rather than discarded."""
+partial = False
+"""If True, only some consoles were selected with --console, so results aren't compared with or kept for other runs."""
 
 ################################################################################
 
-# Load config settings file
-# TODO: ADD WAY MORE VALIDATION
-config = configparser.ConfigParser()
-config_file = 'dev/config_settings.ini' if os.path.exists('dev/config_settings.ini') else 'config_settings.ini'
-if os.path.exists(config_file):
-    config.read(config_file)
-else:
-    print("Couldn't find config_settings.ini, quitting")
-    quit()
-
-# Load config consoles file
-# TODO: ADD WAY MORE VALIDATION
-consoles_file = 'dev/config_consoles.json' if os.path.exists('dev/config_consoles.json') else 'config_consoles.json'
-if os.path.exists(consoles_file):
-    with open(consoles_file) as f:
-        consoles = json.load(f)
-else:
-    print("Couldn't find config_consoles.json, quitting")
-    quit()
-
-# Set up logging
-log.basicConfig(level=log.WARNING)
-
-# Initialize modules
-LB.init(config['LAUNCHBOX']['directory'])
-RC_API.init(config['RETROACHIEVEMENTS']['username'], config['RETROACHIEVEMENTS']['api_key'])
-
-rahasher_path = os.path.join(LB.main_directory, 'ThirdParty', 'RetroAchievements', 'RAHasher.exe')
-dolphintool_path = config.get('RAHASHER', 'doltool_path', fallback = '')
-RC_HASH.init(rahasher_path, dolphintool_path)
-
-# Set up cache for API requests
-cache_path = os.path.join(os.getcwd(), 'cache', 'cache')
-url_expire_rules = {
-    '*API_GetGameList*': 60 * 60 * 24
-}
-requests_cache.install_cache(cache_path, urls_expire_after = url_expire_rules)
+def resolve_app_path(app_path: str) -> str:
+    """Normalizes a LB ApplicationPath, making it absolute if it's relative to the LB directory."""
 
-data_path = os.path.join(os.getcwd(), 'data')
-if not os.path.exists(data_path):
-    os.makedirs(data_path)
+    app_path = os.path.normpath(app_path)
 
-hashes_path = os.path.join(os.getcwd(), 'hashes')
-if not os.path.exists(hashes_path):
-    os.makedirs(hashes_path)
+    # If non-absolute path, append LB main directory
+    if not os.path.isabs(app_path):
+        app_path = os.path.join(LB.main_directory, app_path)
 
+    return app_path
 
+def resolve_local_paths(app_path: str) -> list:
+    """
+    Returns the local files to hash for a resolved LB ApplicationPath, applying
+    any path replacement from config and following M3U playlists, which give
+    every file listed within. Returns None if the playlist can't be read.
+    """
 
-print("Requesting RetroAchievements API data...")
+    # If set in config, replace parts of app path
+    # TODO: Work around normpath stripping trailing slash
+    local_path = app_path
+    path_from = config.get('LAUNCHBOX', 'apppath_replace_from', fallback = None)
+    path_to = config.get('LAUNCHBOX', 'apppath_replace_to', fallback = None)
+    if path_from and path_to:
+        local_path = local_path.replace(path_from, path_to)
 
-rc_consoles = RC_API.get_console_ids()
-print(f"  Requested Console ID data - {len(rc_consoles)} systems")
+    if not local_path.casefold().endswith('.m3u'):
+        return [local_path]
 
-if config['CHEEVO_CHECKER']['dump_ra_data']:
-    f_path = os.path.join(data_path, 'ra_console_ids.json')
-    with open(f_path, 'w', encoding='utf-8') as f:
-        json.dump(rc_consoles, f, ensure_ascii = False, indent = 4)
+    # For M3U playlists, hash all files listed within, the first being what RA hashes for the playlist
+    log.debug(f"Entry is playlist file: {local_path}")
 
-rc_hashes = {}
-for c in consoles:
+    if not os.path.exists(local_path):
+        log.warning(f"Playlist file does not exist: {local_path}")
+        return None
 
-    if not c['should_scan']:
-        continue
+    with open(local_path) as f:
+        m3u_entries = [l.strip() for l in f if l.strip() and not l.startswith('#')]
 
-    # Request RA game list for console
-    c_name = c['rc_name']
-    c_dict = next(i for i in rc_consoles if i["Name"] == c_name)
-    c_id = c_dict['ID']
-    c['rc_games'] = RC_API.get_game_list(c_id, 1, 1)
+    if not m3u_entries:
+        log.warning(f"Playlist file entries could not be read: {local_path}")
+        return None
 
-    # Make sure hash is lowercase, add to hash lookup table
-    h_count = 0
-    for g in c['rc_games']:
-        g['Hashes'] = [h.casefold() for h in g['Hashes']]
-        for h in g['Hashes']:
-            h_count = h_count + 1
-            if h not in rc_hashes:
-                rc_hashes[h] = g
-            else:
-                print(f"ERROR: Hash {h} already exists in RA lookup table?") 
+    # Playlist entries can be non-absolute as well
+    m3u_dir = os.path.split(local_path)[0]
+    return [e if os.path.isabs(e) else os.path.join(m3u_dir, e) for e in map(os.path.normpath, m3u_entries)]
 
-    print(f"  Requested '{c_name}' game data - {len(c['rc_games'])} games, {h_count} hashes")
+def resolve_local_path(app_path: str) -> str:
+    """
+    Returns the main local file to hash for a resolved LB ApplicationPath, see
+    resolve_local_paths.
+    """
 
-    if config['CHEEVO_CHECKER']['dump_ra_data']:
-        f_path = os.path.join(data_path, 'ra_console_' + str(c_id) + '.json')
-        with open(f_path, 'w', encoding='utf-8') as f:
-            json.dump(c['rc_games'], f, ensure_ascii = False, indent = 4)
+    if (local_paths := resolve_local_paths(app_path)) is None:
+        return None
+    return local_paths[0]
+
+################################################################################
+
+def load_config() -> list:
+    '''
+    Loads config_settings.ini into the module, and returns the list of consoles
+    from config_consoles.json, or None if either couldn't be found.
+    '''
+    global config
+
+    # Load config settings file
+    # TODO: ADD WAY MORE VALIDATION
+    config = configparser.ConfigParser()
+    config_file = 'dev/config_settings.ini' if os.path.exists('dev/config_settings.ini') else 'config_settings.ini'
+    if os.path.exists(config_file):
+        config.read(config_file)
+    else:
+        print("Couldn't find config_settings.ini, quitting")
+        return None
+
+    # Load config consoles file
+    # TODO: ADD WAY MORE VALIDATION
+    consoles_file = 'dev/config_consoles.json' if os.path.exists('dev/config_consoles.json') else 'config_consoles.json'
+    if os.path.exists(consoles_file):
+        with open(consoles_file) as f:
+            return json.load(f)
+    else:
+        print("Couldn't find config_consoles.json, quitting")
+        return None
+
+def select_consoles(consoles: list, filters: list) -> bool:
+    '''
+    Limits the consoles to scan to those matching any of the filters, by RA
+    console ID, RA name or LB platform name (case insensitive). Without
+    filters, the 'should_scan' setting from config is used as-is.
+
+    Returns False if a filter didn't match any console.
+    '''
+    if not filters:
+        return True
+
+    for c in consoles:
+        c['should_scan'] = False
+
+    for f in filters:
+        f_folded = f.casefold()
+        f_matches = [c for c in consoles
+                     if f_folded in (str(c.get('rc_id')), c['rc_name'].casefold(), (c['lb_scrapename'] or '').casefold())]
+        if not f_matches:
+            print(f"No console matching '{f}' in config_consoles.json")
+            return False
+        for c in f_matches:
+            c['should_scan'] = True
+
+    return True
+
+################################################################################
+
+def init_api(offline: bool = False) -> bool:
+    '''
+    Initializes the RA API modules, with caching of API requests. If offline,
+    only cached API data is used.
 
-print()
+    Returns False if the 'requests-cache' module isn't installed.
+    '''
+    if importlib.util.find_spec('requests_cache') is None:
+        print("Module 'requests-cache' not found, install it with: python -m pip install requests-cache")
+        return False
 
+    import modules.rcheevos.api as RC_API
+    import modules.rcheevos.sync as RC_SYNC
 
+    api_workers = int(config.get('RETROACHIEVEMENTS', 'workers', fallback = '') or 4)
+    api_url = config.get('RETROACHIEVEMENTS', 'api_url', fallback = '') or None
+    api_rate_limit = int(config.get('RETROACHIEVEMENTS', 'rate_limit', fallback = '') or 0) or None
+    RC_API.init(config['RETROACHIEVEMENTS']['username'], config['RETROACHIEVEMENTS']['api_key'],
+                api_workers, api_url, api_rate_limit)
 
-print("Loading LaunchBox data...")
+    # Set up cache for API requests, how long each endpoint is cached for is set in the API module
+    RC_API.init_cache(os.path.join(cache_path, 'cache'), offline_mode = offline)
+    RC_SYNC.init(os.path.join(cache_path, 'ra_snapshots'))
 
-lb_hashes = []
-"""List of 'RetroAchievementsHash' values across all game/application entries and platforms."""
+    return True
 
-for c in consoles:
+def init_hasher():
+    '''
+    Initializes the hashing module, returning (workers, timeout) to hash with.
+    '''
+    import modules.rcheevos.hash as RC_HASH
 
-    if not c['should_scan']:
-        continue
+    rahasher_path = os.path.join(LB.main_directory, 'ThirdParty', 'RetroAchievements', 'RAHasher.exe')
+    dolphintool_path = config.get('RAHASHER', 'doltool_path', fallback = '')
+    native_hashing = config.getboolean('RAHASHER', 'native_hashing', fallback = True)
+    verify_native = config.getboolean('RAHASHER', 'verify_native', fallback = False)
+    RC_HASH.init(rahasher_path, dolphintool_path, native_hashing, verify_native)
+    hash_workers = int(config.get('RAHASHER', 'workers', fallback = '') or 0) or None
+    hash_timeout = float(config.get('RAHASHER', 'timeout', fallback = '') or 0) or None
+
+    # Hashes from other machines sharing the same ROMs, with a local copy so lookups don't touch the share
+    if (shared_cache := config.get('RAHASHER', 'shared_cache', fallback = '')) and not RC_HASH.use_shared:
+        RC_HASH.init_shared_cache(shared_cache, os.path.join(cache_path, 'shared_hashes.json'))
+
+    return hash_workers, hash_timeout
+
+################################################################################
+
+def resolve_rc_ids(consoles: list):
+    '''
+    Fills in RA console IDs for scanned consoles that don't have one set in
+    config, by name. Consoles with no matching RA console aren't scanned.
+    '''
+    import modules.rcheevos.api as RC_API
+
+    # RA console IDs are set in config, only request them if any are missing
+    if any(c['should_scan'] and not c.get('rc_id') for c in consoles):
+        try:
+            rc_consoles = RC_API.get_console_ids()
+        except RC_API.NotCachedError:
+            print("  Console ID data isn't cached, skipping consoles with no 'rc_id' in config_consoles.json")
+            rc_consoles = []
+        print(f"  Requested Console ID data - {len(rc_consoles)} systems")
+
+        if config.getboolean('CHEEVO_CHECKER', 'dump_ra_data', fallback = False):
+            f_path = os.path.join(data_path, 'ra_console_ids.json')
+            with open(f_path, 'w', encoding='utf-8') as f:
+                json.dump(rc_consoles, f, ensure_ascii = False, indent = 4)
+
+        for c in consoles:
+            if c['should_scan'] and not c.get('rc_id'):
+                if (c_rc := next((i for i in rc_consoles if i["Name"] == c['rc_name']), None)) is None:
+                    c['should_scan'] = False
+                    continue
+                c['rc_id'] = c_rc['ID']
 
-    log.debug(f"Loading LB data - {c['lb_scrapename']}")
+def fetch_ra_data(consoles: list):
+    '''
+    Requests RA game lists for all scanned consoles, adds their hashes to the
+    hash index and reports what changed since the last fetch.
+    '''
+    import modules.rcheevos.api as RC_API
 
-    # Load LB platform data
-    c_name = c['lb_scrapename']
-    pd = LB.get_game_data(c_name)
+    METRICS.phase('api_fetch')
+    print("Requesting RetroAchievements API data...")
+    resolve_rc_ids(consoles)
 
-    if pd == None:
-        log.error(f"Could not find LaunchBox platform data to pair with '{c_name}', so excluding.")
+    # Request RA game lists for all scanned consoles at once
+    rc_game_lists = RC_API.get_game_lists([c['rc_id'] for c in consoles if c['should_scan']], 1, 1)
+
+    for c in consoles:
+        if c['should_scan']:
+            add_ra_data(c, rc_game_lists.get(c['rc_id']))
+
+    print()
+
+def add_ra_data(c: dict, rc_games: list):
+    '''
+    Adds the RA game list for a console to the hash index, and reports what
+    changed since the last fetch. If there's no game list (only when offline),
+    the console isn't scanned.
+    '''
+    import modules.rcheevos.sync as RC_SYNC
+
+    c_name = c['rc_name']
+    c_id = c['rc_id']
+    if rc_games is None:
+        print(f"  No cached '{c_name}' game data while offline, skipping")
         c['should_scan'] = False
-        continue
+        return
+    METRICS.console(c['lb_scrapename'])
 
-    # Stub entries if certain data doesn't exist
-    if pd.get('Game') == None:
-        pd['Game'] = []
-    if pd.get('AdditionalApplication') == None:
-        pd['AdditionalApplication'] = []
+    # Add to hash lookup table, which keeps the hashes, so only what's reported about each game is kept here
+    h_count = 0
+    c['rc_games'] = []
+    for g in rc_games:
+        h_count = h_count + len(g['Hashes'])
+        g_i, g_duplicates = HI.add_rc_game(g['Hashes'])
+        for h in g_duplicates:
+            print(f"ERROR: Hash {h} already exists in RA lookup table?")
+        c['rc_games'].append({'ID': g['ID'], 'Title': g.get('Title'), 'Index': g_i})
+
+    print(f"  Requested '{c_name}' game data - {len(rc_games)} games, {h_count} hashes")
+    METRICS.count('ra_games', len(rc_games))
+    METRICS.count('ra_hashes', h_count)
+
+    # Report what changed since the last run
+    if (c_diff := RC_SYNC.update(c_id, rc_games)):
+        c_titles = {str(g['ID']): g.get('Title') for g in rc_games}
+        for g_id in c_diff['added']:
+            print(f"  [RA ADDED] {c_titles[g_id]}")
+        for g_id in c_diff['removed']:
+            print(f"  [RA REMOVED] {c_diff['old'][g_id].get('Title')}")
+        for g_id, (h_added, h_removed) in c_diff['changed'].items():
+            print(f"  [RA CHANGED] {c_titles[g_id]} - {len(h_added)} hashes added, {len(h_removed)} removed")
+
+    if config.getboolean('CHEEVO_CHECKER', 'dump_ra_data', fallback = False):
+        f_path = os.path.join(data_path, 'ra_console_' + str(c_id) + '.json')
+        with open(f_path, 'w', encoding='utf-8') as f:
+            json.dump(rc_games, f, ensure_ascii = False, indent = 4)
 
-    c['lb_data'] = pd
-    print(f"  Loaded '{c_name}' game data - {len(pd['Game'])} Game entries, {len(pd['AdditionalApplication'])} Additional Application entries")
+################################################################################
 
-    c['lb_game_ids'] = {}
-    c['lb_game_hashes'] = {}
+def load_lb_platforms(consoles: list):
+    '''
+    Parses platform XML files for all scanned consoles that aren't already
+    mirrored, in parallel, so loading them afterwards reads from memory.
+    '''
+    lb_workers = int(config.get('LAUNCHBOX', 'workers', fallback = '') or 0) or None
+    lb_parsed = LB.load_game_data_many([c['lb_scrapename'] for c in consoles if c['should_scan']],
+                                       LB_FIELDS, LB_TAGS, lb_workers)
+    log.debug(f"Parsed {lb_parsed} LaunchBox platform files")
+
+def load_lb_data(consoles: list, hash_files: bool = True):
+    '''
+    Loads LB data for all scanned consoles and adds hashes for their Game and
+    Additional Application entries to the hash index.
+
+    Args:
+        consoles (list): Consoles from config
+        hash_files (bool): If True, Additional Application files that are new
+            or have changed are hashed, otherwise only cached hashes are used
+    '''
+    if hash_files:
+        import modules.rcheevos.hash as RC_HASH
+        hash_workers, hash_timeout = init_hasher()
+
+    METRICS.phase('lb_load')
+    print("Loading LaunchBox data...")
+
+    load_lb_platforms(consoles)
+
+    for c in consoles:
+
+        if not c['should_scan']:
+            continue
 
-    for i, g in enumerate(c['lb_data']['Game']):
-        log.debug(f"Processing Game entry - {g.get('ApplicationPath')}")
+        log.debug(f"Loading LB data - {c['lb_scrapename']}")
 
-        # Build dictionary for quick lookup based on game ID
-        if (g_id := g['ID']):
-            c['lb_game_ids'][g_id] = i
+        # Load LB platform data
+        c_name = c['lb_scrapename']
+        METRICS.phase('lb_load', c_name)
+        pd = LB.get_game_data(c_name, LB_FIELDS, LB_TAGS)
 
-        # Build dictionary for quick lookup based on game RA hash
-        if (g_h := g['RetroAchievementsHash']):
-            g_h = g_h.casefold()
-            if re.findall(r"([a-fA-F\d]{32})", g_h):
+        if pd == None:
+            log.error(f"Could not find LaunchBox platform data to pair with '{c_name}', so excluding.")
+            c['should_scan'] = False
+            continue
 
-                # Add to per-console dictionary
-                c['lb_game_hashes'][g_h] = i
+        # Stub entries if certain data doesn't exist
+        if pd.get('Game') == None:
+            pd['Game'] = []
+        if pd.get('AdditionalApplication') == None:
+            pd['AdditionalApplication'] = []
 
-                # Add to cross-console list
-                if g_h not in lb_hashes:
-                    lb_hashes.append(g_h)
+        c['lb_data'] = pd
+        print(f"  Loaded '{c_name}' game data - {len(pd['Game'])} Game entries, {len(pd['AdditionalApplication'])} Additional Application entries")
+        METRICS.count('lb_games', len(pd['Game']))
+        METRICS.count('lb_apps', len(pd['AdditionalApplication']))
+
+        c['lb_game_ids'] = {}
+
+        for i, g in enumerate(c['lb_data']['Game']):
+            log.debug(f"Processing Game entry - {g.get('ApplicationPath')}")
+
+            # Build dictionary for quick lookup based on game ID
+            if (g_id := g['ID']):
+                c['lb_game_ids'][g_id] = i
+
+            # Add to cross-console index by game RA hash
+            if (g_h := g['RetroAchievementsHash']):
+                g_h = g_h.casefold()
+                if HI.key(g_h) is not None:
+                    if not HI.add_lb_entry(g_h, c_name, 'Game', g):
+                        log.warning(f"Hash for {g.get('Title')} ({g_h}) already exists in global LaunchBox hash list, see the 'duplicates' command")
                 else:
-                    log.warning(f"Hash for {g.get('Title')} ({g_h}) already exists in global LaunchBox hash list")
+                    log.warning(f"Hash appears to be invalid? - {g.get('Title')} ({g_h})")
+
+        # Load cached 'AdditionalApplication' hashes
+        h_file = os.path.join(hashes_path, c_name + '.json')
+        c['lb_extra_hashes'] = load_hash_cache(h_file, c_name)
+        if c['lb_extra_hashes']:
+            print(f"  Loaded '{c_name}' cached hashes - {len(c['lb_extra_hashes'])} Additional Application hashes")
+
+        # With 'AdditionalApplication' entries, we need to do it ourselves...
+        c_id = c['rc_id']
+        a_paths = []
+        """List of (resolved app path, AA entry) for AA entries that need a hash."""
+        a_fps = {}
+        """Dictionary of (local file paths, fingerprint) for AA entries with files, with app path as key."""
+        h_jobs = {}
+        """Dictionary of (local file paths, fingerprint) to hash for AA entries not in the cache, with app path as key."""
+
+        for a in c['lb_data']['AdditionalApplication']:
+            log.debug(f"Processing AdditionalApplication entry - {a.get('ApplicationPath')}")
+            a_path = a.get('ApplicationPath')
+
+            if not a_path:
+                log.debug(f"Skipping, AA entry had no ApplicationPath defined")
+                continue
+
+            a_path = resolve_app_path(a_path)
+
+            if not hash_files:
+                if RC_CACHE.get_hash(c['lb_extra_hashes'], a_path):
+                    a_paths.append((a_path, a))
+                continue
+
+            if (a_paths_local := resolve_local_paths(a_path)) is None:
+                continue
+            a_path_local = a_paths_local[0]
+
+            log.debug(f"Checking if AA entry is same file as main game")
+            if (a_gid := a.get('GameID')):
+                if (g_i := c['lb_game_ids'].get(a_gid)) is not None:
+                    g = c['lb_data']['Game'][g_i]
+                    if g.get('ApplicationPath') == a_path:
+                        log.debug(f"Skipping, AA entry is same ApplicationPath as main game")
+                        continue
+
+            # Playlists are fingerprinted on every file listed, as the entry has a hash for each of them
+            a_fp = RC_CACHE.fingerprint(c_id, a_path_local, a_paths_local[1:])
+            if a_fp is None:
+                log.warning(f"AA file does not exist: {a_path_local}")
+                continue
+
+            a_paths.append((a_path, a))
+            a_fps[a_path] = (a_paths_local, a_fp)
+
+        # Files are always checked, as a ROM can be replaced without the platform data changing
+        # If it doesn't exist in the cache, or the file has changed since, queue it up to be hashed
+        for a_path, (a_paths_local, a_fp) in a_fps.items():
+            log.debug(f"Checking if app path already exists in cached hashes")
+            if (h := RC_CACHE.lookup(c['lb_extra_hashes'], a_path, a_fp)) is None:
+                log.debug(f"App path not found in cached data or file has changed, queueing hash")
+                h_jobs[a_path] = (a_paths_local, a_fp)
             else:
-                log.warning(f"Hash appears to be invalid? - {g.get('Title')} ({g_h})")
-
-    # Load cached 'AdditionalApplication' hashes
-    c['lb_extra_hashes'] = {}
-    h_file = os.path.join(hashes_path, c_name + '.json')
-    if os.path.exists(h_file):
-        with open(h_file) as f:
-            c['lb_extra_hashes'] = json.load(f)
-        print(f"  Loaded '{c_name}' cached hashes - {len(c['lb_extra_hashes'])} Additional Application hashes")
-
-    # With 'AdditionalApplication' entries, we need to do it ourselves...
-    for a in c['lb_data']['AdditionalApplication']:
-        log.debug(f"Processing AdditionalApplication entry - {a.get('ApplicationPath')}")
-        c_dict = next(i for i in rc_consoles if i["Name"] == c['rc_name'])
-        c_id = c_dict['ID']
-        a_path = a.get('ApplicationPath')
-
-        if not a_path:
-            log.debug(f"Skipping, AA entry had no ApplicationPath defined")
+                log.debug(f"App path successfully found in cached hashes ({h})")
+
+        # Generate hashes for all uncached entries at once
+        if h_jobs:
+            METRICS.phase('aa_hashing', c_name)
+            print(f"  Hashing '{c_name}' Additional Application entries - {len(h_jobs)} files")
+            a_paths_from_local = defaultdict(list)
+            a_remaining = {}
+            """Dictionary of local files not hashed yet for each AA entry, with app path as key."""
+            for a_path, (a_paths_local, a_fp) in h_jobs.items():
+                for a_path_local in a_paths_local:
+                    a_paths_from_local[a_path_local].append(a_path)
+                a_remaining[a_path] = len(a_paths_local)
+
+            # Every ROM in archives and every file in playlists is hashed, so an entry can have several hashes
+            # Each entry is journaled as soon as all of its files are hashed, so an interrupted run can be resumed
+            h_results = {}
+            h_journal = RC_CACHE.open_journal(h_file)
+            h_progress = METRICS.Progress(len(a_paths_from_local), f"Hashing '{c_name}'")
+            try:
+                for (_, a_path_local), h_list in RC_HASH.calculate_hashes(((c_id, p) for p in a_paths_from_local),
+                                                                            workers = hash_workers, timeout = hash_timeout,
+                                                                            all_hashes = True):
+                    h_progress.update()
+                    h_list = [h.casefold() for h in h_list if re.findall(r"([a-fA-F\d]{32})", str(h))]
+                    if h_list:
+                        print(f"  New Hash: {a_path_local} ({', '.join(h_list)})")
+                    else:
+                        print(f"  WARNING: Hash rejected by regex: {a_path_local}")
+                    h_results[a_path_local] = h_list
+
+                    for a_path in a_paths_from_local[a_path_local]:
+                        a_remaining[a_path] = a_remaining[a_path] - 1
+                        if a_remaining[a_path]:
+                            continue
+                        a_paths_local, a_fp = h_jobs[a_path]
+                        a_hashes = list(dict.fromkeys(h for p in a_paths_local for h in h_results.get(p, [])))
+                        # The main hash must come from the first file, otherwise the entry doesn't match what RA hashes
+                        if h_results.get(a_paths_local[0]):
+                            RC_CACHE.store(c['lb_extra_hashes'], a_path, a_fp, a_hashes[0], a_hashes[1:], h_journal)
+                        else:
+                            RC_CACHE.remove(c['lb_extra_hashes'], a_path, h_journal)
+            finally:
+                h_journal.close()
+            h_progress.finish()
+            METRICS.phase('lb_load', c_name)
+
+        # Add them to the main hash index
+        for a_path, a in a_paths:
+            for h in RC_CACHE.get_hashes(c['lb_extra_hashes'], a_path):
+                if HI.add_lb_entry(h, c_name, 'AdditionalApplication', a):
+                    log.debug(f"Hash and game data added to cross-platform index")
+                else:
+                    log.debug(f"Hash already existed in cross-platform index, game data added as another owner")
+
+        if not hash_files:
             continue
 
-        a_path = os.path.normpath(a_path)
+        # Save out cache, minus any files that have since been removed, unless nothing changed
+        if (h_evicted := RC_CACHE.evict_missing(c['lb_extra_hashes'])):
+            print(f"  Removed {h_evicted} cached hashes for missing files")
+        if h_jobs or h_evicted or not os.path.exists(h_file):
+            RC_CACHE.save(h_file, c['lb_extra_hashes'])
+
+    print()
+
+################################################################################
+
+def load_hash_cache(cache_file: str, c_name: str) -> dict:
+    '''
+    Loads a hash cache file, along with the hashes in its journal if the
+    last run was interrupted and --resume was given, in which case the cache
+    is saved straight away so the journal can start over.
+    '''
+    cache = RC_CACHE.load(cache_file)
+    if RC_CACHE.has_journal(cache_file):
+        if resume:
+            j_count = RC_CACHE.replay_journal(cache_file, cache)
+            RC_CACHE.save(cache_file, cache)
+            print(f"  Resumed '{c_name}' - {j_count} hashes kept from the interrupted run")
+        else:
+            print(f"  Discarding '{c_name}' hashes from an interrupted run, use --resume to keep them")
+            RC_CACHE.discard_journal(cache_file)
+    return cache
+
+################################################################################
 
-        # If non-absolute path, append LB main directory
-        if not os.path.isabs(a_path):
-            a_path = os.path.join(LB.main_directory, a_path)
+def audit_lb_games(consoles: list):
+    '''
+    Rehashes 'Game' entries for all scanned consoles, and reports any where
+    the file no longer matches the hash stored by LaunchBox.
+    '''
+    import modules.rcheevos.hash as RC_HASH
+    hash_workers, hash_timeout = init_hasher()
 
-        # If set in config, replace parts of app path
-        # TODO: Work around normpath stripping trailing slash
-        a_path_local = a_path
-        a_path_from = config.get('LAUNCHBOX', 'apppath_replace_from', fallback = None)
-        a_path_to = config.get('LAUNCHBOX', 'apppath_replace_to', fallback = None)
-        if a_path_from and a_path_to:
-            a_path_local = a_path_local.replace(a_path_from, a_path_to)
+    METRICS.phase('audit')
+    print("Auditing LaunchBox game hashes...")
 
-        # For M3U playlists as AdditonalApplications, hash the first file listed within
-        if a_path_local.casefold().endswith('.m3u'):
-            log.debug(f"AA entry is playlist file: {a_path_local}")
+    audit_path = os.path.join(hashes_path, 'games')
+    if not os.path.exists(audit_path):
+        os.makedirs(audit_path)
 
-            if not os.path.exists(a_path_local):
-                log.warning(f"AA playlist file does not exist: {a_path_local}")
+    for c in consoles:
+
+        if not c['should_scan']:
+            continue
+
+        c_name = c['lb_scrapename']
+        c_id = c['rc_id']
+        METRICS.phase('audit', c_name)
+
+        # Computed hashes are cached by file fingerprint, so only new or changed files get read
+        g_file = os.path.join(audit_path, c_name + '.json')
+        g_cache = load_hash_cache(g_file, c_name)
+        g_paths = []
+        """List of (resolved app path, Game entry) for Game entries to audit."""
+        g_jobs = {}
+        """Dictionary of (local file path, fingerprint) to hash for Game entries not in the cache, with app path as key."""
+
+        for g in c['lb_data']['Game']:
+            if not (g_path := g.get('ApplicationPath')):
                 continue
 
-            with open(a_path_local) as f:
-                m3u_first = f.readline().rstrip()
+            g_path = resolve_app_path(g_path)
+            if (g_path_local := resolve_local_path(g_path)) is None:
+                continue
 
-            if m3u_first == "":
-                log.warning(f"AA playlist file entries could not be read: {a_path_local}")
+            if (g_fp := RC_CACHE.fingerprint(c_id, g_path_local)) is None:
+                log.warning(f"Game file does not exist: {g_path_local}")
                 continue
 
-            # Playlist entries can be non-absolute as well
-            m3u_first = os.path.normpath(m3u_first)
-            if not os.path.isabs(m3u_first):
-                m3u_first = os.path.join(os.path.split(a_path_local)[0], m3u_first)
+            g_paths.append((g_path, g))
+            if RC_CACHE.lookup(g_cache, g_path, g_fp) is None:
+                g_jobs[g_path] = (g_path_local, g_fp)
+
+        if g_jobs:
+            print(f"  Hashing '{c_name}' Game entries - {len(g_jobs)} new or changed files")
+            g_paths_from_local = defaultdict(list)
+            for g_path, (g_path_local, g_fp) in g_jobs.items():
+                g_paths_from_local[g_path_local].append(g_path)
+
+            g_journal = RC_CACHE.open_journal(g_file)
+            g_progress = METRICS.Progress(len(g_paths_from_local), f"Hashing '{c_name}'")
+            try:
+                for (_, g_path_local), h in RC_HASH.calculate_hashes(((c_id, p) for p in g_paths_from_local),
+                                                                       workers = hash_workers, timeout = hash_timeout):
+                    g_progress.update()
+                    for g_path in g_paths_from_local[g_path_local]:
+                        if re.findall(r"([a-fA-F\d]{32})", str(h)):
+                            RC_CACHE.store(g_cache, g_path, g_jobs[g_path][1], h, journal = g_journal)
+                        else:
+                            RC_CACHE.remove(g_cache, g_path, g_journal)
+            finally:
+                g_journal.close()
+            g_progress.finish()
+
+        # Flag any entries where the file no longer matches what LaunchBox has stored
+        g_mismatches = 0
+        for g_path, g in g_paths:
+            g_h = g.get('RetroAchievementsHash')
+            h = RC_CACHE.get_hash(g_cache, g_path)
+            if g_h and h and g_h.casefold() != h.casefold():
+                g_mismatches = g_mismatches + 1
+                print(f"[HASH MISMATCH] {g.get('Title')} - LaunchBox has {g_h.casefold()}, file hashes to {h.casefold()} ({g_path})")
+
+        print(f"  Audited '{c_name}' - {len(g_paths)} Game entries, {len(g_jobs)} hashed, {g_mismatches} mismatches")
+
+        RC_CACHE.evict_missing(g_cache)
+        RC_CACHE.save(g_file, g_cache)
+
+    print()
+
+################################################################################
+
+def find_duplicates(consoles: list):
+    '''
+    Reports LB entries across all scanned consoles that are the same game,
+    being entries with the same RA hash, or for entries without a hash, files
+    with the same contents. Only cached Additional Application hashes are
+    used, run the 'hash' command first to hash any new ones.
+    '''
+    import modules.duplicates as DUPES
 
-            a_path_local = m3u_first
+    METRICS.phase('duplicates')
+    print("Finding duplicate LaunchBox entries...")
 
-        log.debug(f"Checking if AA entry is same file as main game")
-        if (a_gid := a.get('GameID')):
-            if (g_i := c['lb_game_ids'].get(a_gid)):
-                g = c['lb_data']['Game'][g_i]
-                if g.get('ApplicationPath') == a_path:
-                    log.debug(f"Skipping, AA entry is same ApplicationPath as main game")
+    by_hash = defaultdict(list)
+    """Dictionary of (platform, tag, entry, resolved app path) tuples, with RA hash as key."""
+    by_file = defaultdict(list)
+    """Dictionary of (platform, tag, entry, resolved app path) tuples for entries without a RA hash, with local file path as key."""
+
+    for c in consoles:
+
+        if not c['should_scan']:
+            continue
+
+        c_name = c['lb_scrapename']
+        for tag in LB_TAGS:
+            for e in c['lb_data'][tag]:
+                if not (e_path := e.get('ApplicationPath')):
                     continue
+                e_path = resolve_app_path(e_path)
 
-        # If it doesn't exist in the cache, generate the hash
-        log.debug(f"Checking if app path already exists in cached hashes")
-        if a_path not in c['lb_extra_hashes']:
-            log.debug(f"App path not found in cached data, going to perform hash")
-            
-            h = RC_HASH.calculate_hash(c_id, a_path_local)
-            print(f"  New Hash: {a_path_local} ({h})")
-            if re.findall(r"([a-fA-F\d]{32})", str(h)):
-                c['lb_extra_hashes'][a_path] = h
-            else:
-                print(f"  WARNING: Hash rejected by regex: {a.get('Title')} ({h})")
-        else:
-            log.debug(f"App path successfully found in cached hashes ({c['lb_extra_hashes'][a_path]})")
-
-        # Add it to the main hash lookup table
-        if (h := c['lb_extra_hashes'].get(a_path)):
-            h = h.casefold()
-            log.debug(f"Checking if hash already exists in cross-platform lookup")
-            if h not in lb_hashes:
-                log.debug(f"Hash and game data added to cross-platform lookup")
-                lb_hashes.append(h)
-            else:
-                log.debug(f"Hash and game data already existed in cross-platform lookup")
+                if tag == 'Game':
+                    h = e.get('RetroAchievementsHash')
+                    h = h.casefold() if h and re.fullmatch(r"[a-fA-F\d]{32}", h) else None
+                else:
+                    # Additional Applications for the same file as their game aren't duplicates
+                    if (g_i := c['lb_game_ids'].get(e.get('GameID'))) is not None:
+                        if c['lb_data']['Game'][g_i].get('ApplicationPath') == e.get('ApplicationPath'):
+                            continue
+                    h = RC_CACHE.get_hash(c['lb_extra_hashes'], e_path)
+
+                if h:
+                    by_hash[h].append((c_name, tag, e, e_path))
+                elif (e_path_local := resolve_local_path(e_path)) is not None:
+                    by_file[e_path_local].append((c_name, tag, e, e_path))
+
+    def print_entries(entries: list):
+        for lb_platform, lb_tag, lb_entry, lb_path in entries:
+            lb_title = lb_entry.get('Title') if lb_tag == 'Game' else lb_entry.get('Name')
+            print(f"  {lb_title} ({lb_platform}, {lb_tag}) - {lb_path}")
+
+    h_groups = [(h, entries) for h, entries in by_hash.items() if len(entries) > 1]
+    for h, entries in h_groups:
+        print(f"[DUPLICATE] {len(entries)} entries with RA hash {h}")
+        print_entries(entries)
+
+    # Files are only read if they're the same size as another file
+    f_workers = int(config.get('RAHASHER', 'workers', fallback = '') or 0) or 4
+    f_groups = DUPES.find_duplicate_files(by_file, f_workers)
+    for size, paths in f_groups:
+        entries = [e for p in paths for e in by_file[p]]
+        print(f"[DUPLICATE] {len(entries)} entries with the same file contents ({size:,} bytes)")
+        print_entries(entries)
+
+    METRICS.count('duplicate_groups', len(h_groups) + len(f_groups))
+    print(f"  Found {len(h_groups)} duplicates by RA hash, {len(f_groups)} by file contents "
+          f"({METRICS.counters['dupe_files_read']} file reads for {len(by_file)} files without a RA hash)")
+    print()
 
-    # Save out cache
-    with open(h_file, "w") as f:
-        json.dump(c['lb_extra_hashes'], f, ensure_ascii = False, indent = 4)
+################################################################################
 
-print()
+def check_console(c: dict) -> tuple:
+    '''
+    Checks the RA games for a console against the hash index.
 
+    Returns:
+        (RA games that did not match any LB entries, dictionary of messages
+        for LB games with the wrong RetroAchievementsID with 'platform|ID' as
+        key) tuple
+    '''
+    rc_missing = []
+    lb_wrong_ids = {}
 
+    # Match hashes for all RA games against the global LB hash index at once
+    rc_matches = HI.match_rc_games(g['Index'] for g in c['rc_games'])
 
-# Compare
-for c in consoles:
+    for g, (lb_matching_hash, lb_matching_entries) in zip(c['rc_games'], rc_matches):
+        if not HI.rc_game_hash_count(g['Index']):
+            continue
 
-    if not c['should_scan']:
-        continue
+        # Check matching LB games have the right RetroAchievementsID set
+        for lb_platform, lb_tag, lb_entry in lb_matching_entries:
+            if lb_tag != 'Game':
+                continue
+            lb_ra_id = lb_entry.get('RetroAchievementsID')
+            if lb_ra_id != str(g['ID']):
+                lb_wrong_ids[f"{lb_platform}|{lb_entry.get('ID')}"] = f"{lb_entry.get('Title')} ({lb_platform}) - RetroAchievementsID is {lb_ra_id or 'not set'}, should be {g['ID']} for {g.get('Title')}"
+
+        # If hash wasn't found, output information about missing RA game
+        if lb_matching_hash is None:
+            g_name = g.get('Title')
+
+            skip_data = [ {'config': 'skip_demo',       'string': '~Demo~'},
+                          {'config': 'skip_hack',       'string': '~Hack~'},
+                          {'config': 'skip_homebrew',   'string': '~Homebrew~'},
+                          {'config': 'skip_prototype',  'string': '~Prototype~'},
+                          {'config': 'skip_subset',     'string': '[Subset'},
+                          {'config': 'skip_unlicensed', 'string': '~Unlicensed~'} ]
+
+            skipped = False
+            for s in skip_data:
+                if config.getboolean('CHEEVO_CHECKER', s['config']):
+                    if s['string'] in g_name:
+                        skipped = True
+                        break
+
+            if skipped:
+                log.info(f"Skipped RA entry due to filtering - {g_name}")
+                continue
 
-    print(f"Checking {c["lb_scrapename"]}...")
-    for g in c['rc_games']:
-        if (g_hashes := g.get('Hashes')):
+            rc_missing.append(g)
 
-            lb_matching_hash = ''
+    return rc_missing, lb_wrong_ids
 
-            # Does any hashes for this RA game exist in the global LB hash list?
-            for h_rc in g_hashes:
-                if h_rc.casefold() in lb_hashes:
-                    lb_matching_hash = h_rc.casefold()
-                    break
+def compare(consoles: list):
+    '''
+    Compares RA games for all scanned consoles against the hash index, and
+    reports RA games with no matching LB entry and LB entries with the wrong
+    RetroAchievementsID.
+    '''
+    import modules.rcheevos.sync as RC_SYNC
 
-            # TODO: Look up LB game from hash, see if RetroAchievementsID field is set and correct
+    for c in consoles:
 
-            # If hash wasn't found, output information about missing RA game
-            if lb_matching_hash == '':
-                g_name = g.get('Title')
+        if not c['should_scan']:
+            continue
 
-                skip_data = [ {'config': 'skip_demo',       'string': '~Demo~'},
-                              {'config': 'skip_hack',       'string': '~Hack~'},
-                              {'config': 'skip_homebrew',   'string': '~Homebrew~'},
-                              {'config': 'skip_prototype',  'string': '~Prototype~'},
-                              {'config': 'skip_subset',     'string': '[Subset'},
-                              {'config': 'skip_unlicensed', 'string': '~Unlicensed~'} ]
+        METRICS.phase('compare', c['lb_scrapename'])
+        print(f"Checking {c['lb_scrapename']}...")
+        rc_missing, lb_wrong_ids = check_console(c)
+
+        METRICS.count('ra_games_missing', len(rc_missing))
+
+        # If there are results from the last run, only report what has changed since
+        # A partial run only has some platforms in the index, so matches from the rest are missing
+        c_result = {'missing': {str(g['ID']): g.get('Title') for g in rc_missing}, 'wrong_id': lb_wrong_ids}
+        c_result_old = SCAN.get_result(c['lb_scrapename']) if incremental and not partial else None
+        if not partial:
+            SCAN.set_result(c['lb_scrapename'], c_result)
+
+        if c_result_old is not None:
+            c_diff = SCAN.diff_result(c_result_old, c_result)
+            if not c_diff:
+                print("  No changes since last run")
+            m_added, m_removed = c_diff.get('missing', ([], []))
+            w_added, w_removed = c_diff.get('wrong_id', ([], []))
+            for g_id in m_removed:
+                print(f"[FOUND] {c_result_old['missing'][g_id]}")
+            for k in w_removed:
+                print(f"[FIXED ID] {c_result_old['wrong_id'][k]}")
+            for k in w_added:
+                print(f"[WRONG ID] {lb_wrong_ids[k]}")
+            rc_missing = [g for g in rc_missing if str(g['ID']) in m_added]
+        else:
+            for msg in lb_wrong_ids.values():
+                print(f"[WRONG ID] {msg}")
+
+        # Request hash info for all missing games at once, then list them in order
+        rc_hash_info = RC_SYNC.get_game_hashes(c['rc_id'], [g['ID'] for g in rc_missing])
+        lb_titles = LB.get_title_index(c['lb_scrapename']) if rc_missing else None
+        for g in rc_missing:
+            print(f"[NOT FOUND] {g.get('Title')}")
+            if (g_hash_info := rc_hash_info.get(g['ID'])):
+                if (g_hash_info := g_hash_info.get('Results')):
+                    for h in g_hash_info:
+                        h_labels = h.get('Labels')
+                        h_labels = " ".join('[' + str(x).upper() + ']' for x in h_labels)
+                        print(f"  Possible RA hash: {h.get('MD5')} - {h.get('Name', 'No Name')} {h_labels}")
+
+            # Suggest LB entries with similar titles, which may be a different revision than RA supports
+            for score, (lb_tag, lb_entry) in (lb_titles.search(g.get('Title') or '') if lb_titles else []):
+                lb_hashes = HI.get_entry_hashes(c['lb_scrapename'], lb_tag, lb_entry.get('ID'))
+                lb_title = lb_entry.get('Title') if lb_tag == 'Game' else lb_entry.get('Name')
+                print(f"  Closest LB entry: {lb_title} ({lb_tag}) - {', '.join(lb_hashes) or 'no hash'}, {score:.0%} similar")
+
+        print()
+
+def run_pipeline(consoles: list, audit: bool = False):
+    '''
+    Fetches, loads and hashes each scanned console in turn as soon as its RA
+    data arrives, rather than doing each step for every console before the
+    next, then compares them all.
+
+    RA data for every console is requested up front, and downloads while LB
+    platforms are parsed and other consoles are hashed. LB entries on any
+    platform can match any console's RA games, so nothing is compared until
+    every platform is in the hash index.
+
+    Args:
+        consoles (list): Consoles from config
+        audit (bool): If True, also audit Game entries of each console
+    '''
+    import modules.rcheevos.api as RC_API
+
+    METRICS.phase('api_fetch')
+    print("Requesting RetroAchievements API data...")
+    resolve_rc_ids(consoles)
+    scanned = {c['rc_id']: c for c in consoles if c['should_scan']}
+    rc_game_lists = RC_API.iter_game_lists(scanned, 1, 1)
+
+    METRICS.phase('lb_load')
+    load_lb_platforms(consoles)
+
+    loaded = []
+    METRICS.phase('api_fetch')
+    for c_id, rc_games in rc_game_lists:
+        c = scanned.pop(c_id)
+        add_ra_data(c, rc_games)
+        print()
+        load_lb_data([c])
+        if audit:
+            audit_lb_games([c])
+        loaded.append(c)
+        METRICS.phase('api_fetch')
+
+    # Consoles left over have no cached game list while offline
+    for c in scanned.values():
+        add_ra_data(c, None)
+
+    compare(loaded)
 
-                skipped = False
-                for s in skip_data:
-                    if config.getboolean('CHEEVO_CHECKER', s['config']):
-                        if s['string'] in g_name:
-                            skipped = True
-                            break
+################################################################################
 
-                if skipped:
-                    log.info(f"Skipped RA entry due to filtering - {g_name}")
+def watch_targets(consoles: list) -> dict:
+    '''
+    Returns the directories holding ROM files for scanned consoles.
+
+    Returns:
+        Dictionary of sets of console names affected by changes in each
+        directory, with normalized directory as key (as the watcher reports)
+    '''
+    targets = defaultdict(set)
+    for c in consoles:
+        if not c['should_scan']:
+            continue
+        for tag in LB_TAGS:
+            for e in c['lb_data'][tag]:
+                if not (e_path := e.get('ApplicationPath')):
                     continue
+                e_path = resolve_app_path(e_path)
+                # Playlists are read again on change, so watch the playlist's directory as well as its entries
+                for p in [e_path] + (resolve_local_paths(e_path) or []):
+                    targets[os.path.normpath(os.path.dirname(p))].add(c['lb_scrapename'])
+
+    return targets
+
+def watch(consoles: list):
+    '''
+    Watches LB platform files and ROM directories for scanned consoles, and
+    re-checks only the consoles affected by each change, until interrupted.
+
+    RA data and the hash index stay loaded between checks. Changed platforms
+    are loaded again, and only new or changed files are hashed, as hashes
+    for everything else are cached.
+    '''
+    import modules.watcher as WATCHER
+
+    debounce = float(config.get('CHEEVO_CHECKER', 'watch_debounce', fallback = '') or 2.0)
+    interval = float(config.get('CHEEVO_CHECKER', 'watch_interval', fallback = '') or 5.0)
+    polling = config.getboolean('CHEEVO_CHECKER', 'watch_polling', fallback = False)
+    audit = config.getboolean('CHEEVO_CHECKER', 'audit_games', fallback = False)
+
+    scanned = [c for c in consoles if c['should_scan']]
+    xml_dir = os.path.join(LB.main_directory, 'Data', 'Platforms')
+    xml_files = {os.path.normpath(LB.get_platform_file(c['lb_scrapename'])): c['lb_scrapename'] for c in scanned}
+    targets = watch_targets(scanned)
+    watcher = WATCHER.Watcher([xml_dir, *targets], debounce, interval, polling)
+    print(f"Watching {len(watcher.directories)} directories for changes ({'polling' if watcher.polling else 'inotify'}), press Ctrl+C to stop...")
+    print()
 
-                print(f"[NOT FOUND] {g_name}")
-                if (g_hash_info := RC_API.get_game_hashes(g['ID'])):
-                    if (g_hash_info := g_hash_info.get('Results')):
-                        for h in g_hash_info:
-                            h_labels = h.get('Labels')
-                            h_labels = " ".join('[' + str(x).upper() + ']' for x in h_labels)
-                            print(f"  Possible RA hash: {h.get('MD5')} - {h.get('Name', 'No Name')} {h_labels}")
+    try:
+        while True:
+            changed = watcher.wait()
+            METRICS.count('watch_changes', len(changed))
+
+            # Work out which consoles are affected, by their platform file or a file in their ROM directories
+            c_affected = set()
+            for p in map(os.path.normpath, changed):
+                if (c_name := xml_files.get(p)) is not None:
+                    c_affected.add(c_name)
+                # Whole directories are reported if inotify lost track of events
+                c_affected.update(targets.get(p if p in targets else os.path.dirname(p), ()))
+            if not c_affected:
+                log.debug(f"Ignoring changes to unwatched files: {changed}")
+                continue
 
-    print()
+            print(f"Changes detected for {', '.join(c_affected)}, re-checking...")
+            c_changed = [c for c in scanned if c['lb_scrapename'] in c_affected]
+            for c in c_changed:
+                c_name = c['lb_scrapename']
+                LB.unload_game_data(c_name)
+                HI.remove_lb_platform(c_name)
+
+            load_lb_data(c_changed)
+            if audit:
+                audit_lb_games(c_changed)
+            compare(c_changed)
+            SCAN.save()
+
+            # Entries may have been added or moved to other directories
+            for c_names in targets.values():
+                c_names.difference_update(c_affected)
+            for d, c_names in watch_targets(c_changed).items():
+                targets[d] |= c_names
+            watcher.update([xml_dir] + [d for d, c_names in targets.items() if c_names])
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        watcher.close()
+
+################################################################################
+
+def main(argv: list = None) -> int:
+    global data_path, hashes_path, cache_path, incremental, resume, partial
+
+    # Options can be given before or after the command
+    common_parser = argparse.ArgumentParser(add_help = False)
+    common_parser.add_argument('-c', '--console', action = 'append', dest = 'consoles', metavar = 'CONSOLE',
+                               default = argparse.SUPPRESS,
+                               help = "Only scan this console (RA console ID, RA name or LB platform name), can be repeated")
+    common_parser.add_argument('--offline', action = 'store_true', default = argparse.SUPPRESS,
+                               help = "Only use cached RA data, without sending any API requests")
+    common_parser.add_argument('--resume', action = 'store_true', default = argparse.SUPPRESS,
+                               help = "Keep hashes from an interrupted run, so only files it didn't get to are hashed")
+
+    parser = argparse.ArgumentParser(description = "Checks LaunchBox games and Additional Applications against RetroAchievements hashes",
+                                     parents = [common_parser])
+    commands = parser.add_subparsers(dest = 'command', metavar = 'command')
+    for name, help_text in COMMANDS.items():
+        commands.add_parser(name, help = help_text, description = help_text, parents = [common_parser])
+    args = parser.parse_args(argv)
+    command = args.command or 'run'
+    filters = getattr(args, 'consoles', None)
+    offline = getattr(args, 'offline', False)
+    resume = getattr(args, 'resume', False)
+    partial = bool(filters)
+
+    if (consoles := load_config()) is None:
+        return 1
+    if not select_consoles(consoles, filters):
+        return 1
+
+    # Set up logging
+    log.basicConfig(level=log.WARNING)
+
+    # Set up metrics, and profiling if set in config
+    METRICS.phase('startup')
+    metrics_file = config.get('CHEEVO_CHECKER', 'metrics_file', fallback = '') or os.path.join('data', 'metrics.json')
+    profile_file = config.get('CHEEVO_CHECKER', 'profile_file', fallback = '')
+    if profile_file:
+        METRICS.start_profile()
+
+    # Initialize modules
+    LB.init(config['LAUNCHBOX']['directory'])
+    cache_path = os.path.join(os.getcwd(), 'cache')
+    LB.init_mirror(os.path.join(cache_path, 'launchbox.sqlite'))
+
+    if command in ('run', 'fetch', 'compare', 'watch') and not init_api(offline):
+        return 1
+
+    # Load state from last run, to only report differences
+    incremental = config.getboolean('CHEEVO_CHECKER', 'incremental', fallback = True)
+    SCAN.init(os.path.join(cache_path, 'scan_state.json'))
+
+    data_path = os.path.join(os.getcwd(), 'data')
+    if not os.path.exists(data_path):
+        os.makedirs(data_path)
+
+    hashes_path = os.path.join(os.getcwd(), 'hashes')
+    if not os.path.exists(hashes_path):
+        os.makedirs(hashes_path)
+
+    # Hashes are journaled as they complete, so nothing hashed so far is lost if stopped
+    try:
+        if command in ('run', 'watch'):
+            run_pipeline(consoles, config.getboolean('CHEEVO_CHECKER', 'audit_games', fallback = False))
+
+        if command in ('fetch', 'compare'):
+            fetch_ra_data(consoles)
+
+        if command in ('hash', 'compare', 'audit', 'duplicates'):
+            load_lb_data(consoles, hash_files = command == 'hash')
+
+        if command == 'audit':
+            audit_lb_games(consoles)
+
+        if command == 'compare':
+            compare(consoles)
+
+        if command == 'duplicates':
+            find_duplicates(consoles)
+    except KeyboardInterrupt:
+        print()
+        print("Interrupted, run again with --resume to keep the hashes done so far")
+        return 130
+
+    SCAN.save()
+
+    if command == 'watch':
+        watch(consoles)
+
+    # Write out metrics summary
+    METRICS.phase(None)
+    if profile_file:
+        METRICS.stop_profile(profile_file)
+        print(f"Profile written to {profile_file}")
+    m_summary = METRICS.write_summary(metrics_file)
+    print(f"Finished in {m_summary['total_seconds']:.1f}s - " +
+          ", ".join(f"{k} {v:.1f}s" for k, v in m_summary['phases'].items()))
+
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
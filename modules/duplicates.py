@@ -0,0 +1,107 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+
+from . import metrics
+
+################################################################################
+
+PARTIAL_SIZE = 64 * 1024
+"""Bytes read from the start of same-sized files, to rule out most of them before reading them whole."""
+
+CHUNK_SIZE = 1024 * 1024
+
+################################################################################
+
+def _digest(file_path: str, limit: int = None) -> str:
+    """MD5 of the start of a file up to limit bytes (or all of it), or None if it can't be read."""
+
+    md5 = hashlib.md5()
+    remaining = limit
+    try:
+        with open(file_path, 'rb') as f:
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                md5.update(chunk)
+                metrics.count('dupe_bytes_read', len(chunk))
+                if remaining is not None:
+                    remaining -= len(chunk)
+    except OSError:
+        return None
+    return md5.hexdigest()
+
+def _refine(groups: list, limit: int, pool) -> list:
+    """
+    Splits groups of candidate files by digest, keeping only the groups that
+    still have more than one file.
+
+    Args:
+        groups (list): Lists of (file key, path) tuples that might be the same
+        limit (int): Bytes to read from each file, or None to read them whole
+        pool: Executor to read files on
+
+    Returns:
+        List of lists of (file key, path) tuples
+    """
+
+    files = [f for g in groups for f in g]
+    digests = pool.map(lambda f: _digest(f[1], limit), files)
+    metrics.count('dupe_files_read', len(files))
+
+    refined = defaultdict(list)
+    for i, g in enumerate(groups):
+        for f in g:
+            refined[(i, next(digests))].append(f)
+    return [g for k, g in refined.items() if k[1] is not None and len(g) > 1]
+
+def find_duplicate_files(paths, workers: int = 4) -> list:
+    '''
+    Finds files with the same contents. Files are grouped by size first, so
+    only files sharing a size with another file are ever read, then by the
+    start of the file, and only then read whole.
+
+    Paths to the same file on disk (repeated paths or hard links) are only
+    read once, and count as duplicates of each other.
+
+    Args:
+        paths (iterable): Paths of files to check, ones that don't exist are skipped
+        workers (int): Number of files to read at once
+
+    Returns:
+        List of (size, [paths]) tuples, one for each set of files with the
+        same contents, largest files first
+    '''
+    same_file = defaultdict(list)
+    """Dictionary of paths for each file on disk, with (device, inode) as key."""
+    by_size = defaultdict(list)
+    """Dictionary of lists of (file key, path) tuples, with file size as key."""
+
+    for p in dict.fromkeys(paths):
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        key = (st.st_dev, st.st_ino)
+        if key not in same_file:
+            by_size[st.st_size].append((key, p))
+        same_file[key].append(p)
+    metrics.count('dupe_files_checked', len(same_file))
+
+    sizes = {key: size for size, files in by_size.items() for key, _ in files}
+    with ThreadPoolExecutor(max_workers = max(workers or 1, 1)) as pool:
+        groups = _refine([files for files in by_size.values() if len(files) > 1], PARTIAL_SIZE, pool)
+
+        # Files no bigger than the partial read are already fully compared
+        small = [g for g in groups if sizes[g[0][0]] <= PARTIAL_SIZE]
+        large = [g for g in groups if sizes[g[0][0]] > PARTIAL_SIZE]
+        groups = small + _refine(large, None, pool)
+
+    # Files with several paths are duplicates on their own, even with no other file the same
+    grouped = {key for g in groups for key, _ in g}
+    groups.extend([(key, paths[0])] for key, paths in same_file.items() if len(paths) > 1 and key not in grouped)
+
+    groups.sort(key = lambda g: -sizes[g[0][0]])
+    return [(sizes[g[0][0]], [p for key, _ in g for p in same_file[key]]) for g in groups]
@@ -0,0 +1,343 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import re
+
+################################################################################
+
+HASH_PATTERN = re.compile(r"[0-9a-fA-F]{32}")
+MASK_64 = (1 << 64) - 1
+
+################################################################################
+
+class HashTable:
+    """
+    Compact multimap of MD5 hashes to integer values, stored as two 64-bit
+    halves of each hash and a 32-bit value in sorted arrays. That's 20 bytes
+    per hash, rather than a dictionary of 32 character strings.
+
+    Hashes are given as 128-bit integers (see key). Lookups binary search the
+    arrays. New hashes go in a small buffer first, which is merged into the
+    arrays once full by copying the runs between insertion points, so memory
+    use stays predictable, at most twice the arrays while merging.
+    """
+
+    MAX_PENDING = 4096
+    """Hashes buffered before they're merged into the arrays."""
+
+    def __init__(self):
+        self.hi = array('Q')
+        self.lo = array('Q')
+        self.values = array('I')
+        self.pending = {}
+        """Dictionary of lists of values not merged into the arrays yet, with hash as key."""
+        self.pending_count = 0
+        self.values_bytes = None
+        """Copy of the values array as bytes for find_value, made when first needed after a change."""
+
+    def __len__(self) -> int:
+        return len(self.values) + self.pending_count
+
+    def add(self, k: int, value: int):
+        self.pending.setdefault(k, []).append(value)
+        self.pending_count += 1
+        if self.pending_count >= self.MAX_PENDING:
+            self.merge()
+
+    def _find(self, k: int) -> int:
+        """Returns the index in the arrays a hash is at, or would be inserted at after any equal hashes."""
+
+        hi, lo = k >> 64, k & MASK_64
+        hi_t, lo_t = self.hi, self.lo
+        i = bisect_left(hi_t, hi)
+        while i < len(hi_t) and hi_t[i] == hi and lo_t[i] <= lo:
+            i += 1
+        return i
+
+    def get(self, k: int) -> list:
+        """Returns all values for a hash, or an empty list for None."""
+
+        if k is None:
+            return []
+        found = []
+        hi = k >> 64
+        hi_t = self.hi
+        i = bisect_left(hi_t, hi)
+        if i < len(hi_t) and hi_t[i] == hi:
+            lo = k & MASK_64
+            while i < len(hi_t) and hi_t[i] == hi:
+                if self.lo[i] == lo:
+                    found.append(self.values[i])
+                i += 1
+        if self.pending and (p := self.pending.get(k)):
+            found.extend(p)
+        return found
+
+    def merge(self):
+        """Merges buffered hashes into the sorted arrays."""
+
+        if not self.pending:
+            return
+        hi_t, lo_t, values_t = self.hi, self.lo, self.values
+        hi_n, lo_n, values_n = array('Q'), array('Q'), array('I')
+        pos = 0
+        for k in sorted(self.pending):
+            i = self._find(k)
+            hi_n.extend(hi_t[pos:i])
+            lo_n.extend(lo_t[pos:i])
+            values_n.extend(values_t[pos:i])
+            for v in self.pending[k]:
+                hi_n.append(k >> 64)
+                lo_n.append(k & MASK_64)
+                values_n.append(v)
+            pos = i
+        hi_n.extend(hi_t[pos:])
+        lo_n.extend(lo_t[pos:])
+        values_n.extend(values_t[pos:])
+        self.hi, self.lo, self.values = hi_n, lo_n, values_n
+        self.pending.clear()
+        self.pending_count = 0
+        self.values_bytes = None
+
+    def remove_values(self, values: set):
+        """Removes every hash with one of the values."""
+
+        self.merge()
+        keep = [i for i, v in enumerate(self.values) if v not in values]
+        self.hi = array('Q', [self.hi[i] for i in keep])
+        self.lo = array('Q', [self.lo[i] for i in keep])
+        self.values = array('I', [self.values[i] for i in keep])
+        self.values_bytes = None
+
+    def find_value(self, value: int) -> list:
+        """
+        Returns every hash with a value, in hash order. No index by value is
+        kept, so this searches the values array (as bytes, which is fast enough
+        for the few entries it's used for).
+        """
+
+        self.merge()
+        if self.values_bytes is None:
+            self.values_bytes = self.values.tobytes()
+        data = self.values_bytes
+        v = array('I', [value]).tobytes()
+        found = []
+        i = data.find(v)
+        while i >= 0:
+            # Only matches lined up with an array item count
+            if i % len(v):
+                i = data.find(v, i + 1)
+                continue
+            found.append((self.hi[i // len(v)] << 64) | self.lo[i // len(v)])
+            i = data.find(v, i + len(v))
+        return found
+
+    def join(self, other: 'HashTable'):
+        """
+        Finds the hashes in both tables, in one pass over both sets of sorted
+        arrays, skipping ahead with a binary search over runs that can't match.
+
+        Yields:
+            (hash, values in this table, values in other) tuples, in hash order
+        """
+
+        self.merge()
+        other.merge()
+        a_hi, a_lo, a_values = self.hi, self.lo, self.values
+        b_hi, b_lo, b_values = other.hi, other.lo, other.values
+        i = j = 0
+        while i < len(a_hi) and j < len(b_hi):
+            a, b = a_hi[i], b_hi[j]
+            if a < b:
+                i = bisect_left(a_hi, b, i + 1)
+                continue
+            if b < a:
+                j = bisect_left(b_hi, a, j + 1)
+                continue
+
+            # Same high half, which is almost always one hash each side
+            i_end = bisect_right(a_hi, a, i)
+            j_end = bisect_right(b_hi, a, j)
+            b_run = {}
+            for y in range(j, j_end):
+                b_run.setdefault(b_lo[y], []).append(b_values[y])
+            a_run = {}
+            for x in range(i, i_end):
+                if a_lo[x] in b_run:
+                    a_run.setdefault(a_lo[x], []).append(a_values[x])
+            for lo in sorted(a_run):
+                yield (a << 64) | lo, a_run[lo], b_run[lo]
+            i, j = i_end, j_end
+
+################################################################################
+
+rc_table = HashTable()
+"""RA hashes, with position in rc_game_hi/rc_game_lo as value."""
+rc_game_hi = array('Q')
+rc_game_lo = array('Q')
+"""Every hash of every RA game as two 64-bit halves, grouped by game in the order added."""
+rc_game_start = array('I', [0])
+"""Position in rc_game_hi/rc_game_lo of the first hash of each RA game, followed by the total."""
+lb_table = HashTable()
+"""LB hashes, with index in lb_owners as value."""
+lb_owners = []
+"""LB entries, as (platform, tag, entry) tuples, or None once removed."""
+lb_free = []
+"""Indexes in lb_owners of removed entries, reused for new entries."""
+lb_hashes = {}
+"""Dictionary of index in lb_owners for each LB entry, with (platform, tag, ID) as key. Its hashes are only in lb_table."""
+
+################################################################################
+
+def key(h: str) -> int:
+    """Converts a hex MD5 hash (any case) to the 128-bit integer it's stored as, or None if it isn't one."""
+
+    if not isinstance(h, str) or not HASH_PATTERN.fullmatch(h):
+        return None
+    return int(h, 16)
+
+def hash_str(k: int) -> str:
+    """Converts a hash key back to a lowercase hex MD5 hash."""
+
+    return format(k, '032x')
+
+def reset():
+    """Clears all index data."""
+
+    global rc_table, rc_game_hi, rc_game_lo, rc_game_start, lb_table
+    rc_table = HashTable()
+    rc_game_hi, rc_game_lo, rc_game_start = array('Q'), array('Q'), array('I', [0])
+    lb_table = HashTable()
+    lb_owners.clear()
+    lb_free.clear()
+    lb_hashes.clear()
+
+def remove_lb_platform(platform: str) -> int:
+    """
+    Removes all LB entries for a platform from the index, so they can be added
+    again after the platform has changed.
+
+    Returns:
+        Number of entries removed
+    """
+
+    keys = [k for k in lb_hashes if k[0] == platform]
+    removed = {lb_hashes.pop(k) for k in keys}
+    lb_table.remove_values(removed)
+    for i in removed:
+        lb_owners[i] = None
+    lb_free.extend(removed)
+    return len(keys)
+
+################################################################################
+
+def add_lb_entry(h: str, platform: str, tag: str, entry) -> bool:
+    """
+    Adds a LB Game/AdditionalApplication entry to the index under a hash.
+
+    Args:
+        h (str): RA hash for the entry
+        platform (str): LB platform name the entry belongs to
+        tag (str): Entry type, 'Game' or 'AdditionalApplication'
+        entry: Entry data, must support entry.get('ID')
+
+    Returns:
+        True if the hash was new to the LB side of the index
+    """
+
+    if (k := key(h)) is None:
+        return False
+    entry_key = (platform, tag, entry.get('ID'))
+    if (owner := lb_hashes.get(entry_key)) is None:
+        if lb_free:
+            owner = lb_hashes[entry_key] = lb_free.pop()
+            lb_owners[owner] = (platform, tag, entry)
+        else:
+            owner = lb_hashes[entry_key] = len(lb_owners)
+            lb_owners.append((platform, tag, entry))
+    found = lb_table.get(k)
+    if owner in found:
+        return False
+    lb_table.add(k, owner)
+    return not found
+
+def add_rc_game(hashes: list) -> tuple:
+    """
+    Adds a RA game to the index under all of its hashes. Only the hashes are
+    kept, so the caller keeps whatever else it needs about the game.
+
+    Returns:
+        (RA game index, list of hashes that were already in the RA side of the
+        index) tuple
+    """
+
+    duplicates = []
+    i = len(rc_game_start) - 1
+    for h in hashes or []:
+        if (k := key(h)) is None:
+            continue
+        if rc_table.get(k):
+            duplicates.append(h)
+        rc_table.add(k, len(rc_game_hi))
+        rc_game_hi.append(k >> 64)
+        rc_game_lo.append(k & MASK_64)
+    rc_game_start.append(len(rc_game_hi))
+    return i, duplicates
+
+def _rc_game_keys(i: int):
+    for j in range(rc_game_start[i], rc_game_start[i + 1]):
+        yield (rc_game_hi[j] << 64) | rc_game_lo[j]
+
+################################################################################
+
+def get_lb_entries(h: str) -> list:
+    """Returns (platform, tag, entry) tuples for all LB entries with a hash."""
+
+    return [lb_owners[i] for i in lb_table.get(key(h))]
+
+def rc_game_hash_count(i: int) -> int:
+    """Returns the number of valid hashes a RA game was added with."""
+
+    return rc_game_start[i + 1] - rc_game_start[i]
+
+def get_entry_hashes(platform: str, tag: str, entry_id: str) -> list:
+    """Returns all hashes indexed for a LB entry."""
+
+    if (owner := lb_hashes.get((platform, tag, entry_id))) is None:
+        return []
+    return [hash_str(k) for k in lb_table.find_value(owner)]
+
+def match_rc_game(i: int) -> tuple:
+    """
+    Finds the first hash of a RA game that has LB entries.
+
+    Args:
+        i (int): RA game index, see add_rc_game
+
+    Returns:
+        (hash, [(platform, tag, entry), ...]) tuple, or (None, []) if no LB
+        entries match
+    """
+
+    for k in _rc_game_keys(i):
+        if (found := lb_table.get(k)):
+            return hash_str(k), [lb_owners[o] for o in found]
+    return None, []
+
+def match_rc_games(indexes) -> list:
+    """
+    Same as match_rc_game for many RA games at once, by joining the sorted RA
+    and LB hashes in one pass rather than looking up each hash.
+
+    Returns:
+        List of (hash, [(platform, tag, entry), ...]) tuples, in the same order
+        as indexes
+    """
+
+    # The first hash (lowest position) of each RA game with LB entries
+    first = {}
+    for k, rc_positions, lb_found in rc_table.join(lb_table):
+        for p in rc_positions:
+            i = bisect_right(rc_game_start, p) - 1
+            if i not in first or p < first[i][0]:
+                first[i] = (p, k, lb_found)
+    return [(hash_str(m[1]), [lb_owners[o] for o in m[2]]) if (m := first.get(i)) else (None, []) for i in indexes]
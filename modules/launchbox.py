@@ -1,8 +1,15 @@
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import json
 import logging as log
+import multiprocessing
 import os.path
+import re
+import sqlite3
 import xml.etree.ElementTree as ET
 
+from . import metrics
+
 ################################################################################
 
 main_directory = ''
@@ -10,6 +17,23 @@ platforms = {}
 """Dictionary storing data about available LB platforms, loaded from Platforms.xml, with 'Name' as key."""
 gamedata = {}
 """Dictionary storing data about games/apps/etc for each LB platform, loaded from platform XML files, with LB platform name as key."""
+gamedata_projection = {}
+"""Dictionary storing the (fields, tags) each platform in 'gamedata' was loaded with (None for all), with LB platform name as key."""
+
+title_indexes = {}
+"""Dictionary of TitleIndex objects over titles in 'gamedata', with LB platform name as key."""
+
+mirror = None
+"""SQLite connection for the on-disk mirror of LB data, or None if the mirror isn't enabled."""
+
+MIRROR_VERSION = 1
+MIRROR_TAGS = ('Game', 'AdditionalApplication')
+"""Entry tags stored in the mirror."""
+MIRROR_FIELDS = ('ID', 'GameID', 'Title', 'Name', 'ApplicationPath',
+                 'RetroAchievementsHash', 'RetroAchievementsID')
+"""Entry fields stored in the mirror, requests for other fields are loaded from XML."""
+MIRROR_INDEXED = ('ID', 'GameID', 'ApplicationPath', 'RetroAchievementsHash')
+"""Entry fields that have an index in the mirror, and can be used with find_entries."""
 
 ################################################################################
 
@@ -37,6 +61,194 @@ def etree_to_dict(t):
 
 ################################################################################
 
+class Record:
+    """
+    Compact, read-only record holding a projected subset of fields for a single
+    LB entry (Game, AdditionalApplication, etc).
+
+    Supports the same 'record[key]' and 'record.get(key)' access as the dicts
+    produced by etree_to_dict, so can be used in their place. Requested fields
+    that are missing from the XML entry are stored as None.
+    """
+
+    __slots__ = ('_index', '_values')
+
+    def __init__(self, index: dict, values: list):
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"Record({dict(self.items())!r})"
+
+    def get(self, key, default=None):
+        if (i := self._index.get(key)) is None:
+            return default
+        v = self._values[i]
+        return default if v is None else v
+
+    def keys(self):
+        return self._index.keys()
+
+    def items(self):
+        return ((k, self._values[i]) for k, i in self._index.items())
+
+    def __reduce__(self):
+        return (Record, (self._index, self._values))
+
+################################################################################
+
+TITLE_TAGS = re.compile(r"\([^)]*\)|\[[^\]]*\]|~[^~]*~")
+TITLE_PUNCTUATION = re.compile(r"[^\w]+")
+TITLE_STOPWORDS = frozenset(('the', 'a', 'an', 'of', 'and'))
+
+def normalize_title(title: str) -> str:
+    """
+    Normalizes a game title for fuzzy matching - lowercase, without bracketed
+    tags like '(USA)', '[!]' or RA markers like '~Hack~', and with punctuation
+    and common words removed.
+    """
+
+    title = TITLE_TAGS.sub(' ', title.casefold().replace('&', ' and '))
+    words = TITLE_PUNCTUATION.sub(' ', title).replace('_', ' ').split()
+    return ' '.join(w for w in words if w not in TITLE_STOPWORDS)
+
+def _trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2)) if text else frozenset()
+
+class TitleIndex:
+    """
+    Trigram index over normalized titles, for finding the closest matches to
+    a title without comparing it against every title.
+
+    Candidates are gathered from the titles sharing the most of the rarer half
+    of a title's trigrams, and only the top CANDIDATES of them are ranked by
+    Dice similarity of their trigram sets. This is approximate - a close
+    match can be missed if it only shares the title's more common trigrams,
+    or if more than CANDIDATES other titles share more of the rarer ones.
+    """
+
+    CANDIDATES = 25
+    """Number of candidates to score for each search."""
+
+    def __init__(self):
+        self.items = []
+        self.grams = []
+        self.postings = defaultdict(list)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, title: str, item):
+        """Adds an item under a title, titles that normalize to nothing are skipped."""
+
+        if not (grams := _trigrams(normalize_title(title))):
+            return
+        i = len(self.items)
+        self.items.append(item)
+        self.grams.append(grams)
+        for g in grams:
+            self.postings[g].append(i)
+
+    def search(self, title: str, limit: int = 3, min_score: float = 0.5) -> list:
+        """
+        Finds the items with titles most similar to a title.
+
+        Args:
+            title (str): Title to search for
+            limit (int): Maximum number of results
+            min_score (float): Minimum similarity, from 0 to 1
+
+        Returns:
+            List of (similarity, item) tuples, most similar first
+        """
+
+        if not (grams := _trigrams(normalize_title(title))):
+            return []
+
+        postings = sorted((p for g in grams if (p := self.postings.get(g))), key=len)
+        counts = Counter()
+        for p in postings[:len(grams) // 2 + 1]:
+            counts.update(p)
+
+        results = []
+        for i, _ in counts.most_common(self.CANDIDATES):
+            other = self.grams[i]
+            score = 2 * len(grams & other) / (len(grams) + len(other))
+            if score >= min_score:
+                results.append((score, self.items[i]))
+        results.sort(key=lambda r: r[0], reverse=True)
+        return results[:limit]
+
+################################################################################
+
+def iter_entries(xml_path: str, tags=None, fields=None):
+    """
+    Streams top-level entries from a LaunchBox XML file using iterparse,
+    clearing each element once processed so the full tree is never held in
+    memory.
+
+    Args:
+        xml_path (str): Path to LaunchBox XML file
+        tags (iterable): Entry tags to keep (i.e. 'Game'), or None for all
+        fields (iterable): Field names to keep for each entry, or None to
+            convert the full entry with etree_to_dict
+
+    Yields:
+        (tag, entry) tuples, where entry is a Record if fields is set, or a
+        dict otherwise
+    """
+
+    if tags is not None:
+        tags = frozenset(tags)
+
+    metrics.count('xml_files_parsed')
+    metrics.count('xml_bytes_parsed', os.path.getsize(xml_path))
+
+    index = None
+    if fields is not None:
+        index = {f: i for i, f in enumerate(dict.fromkeys(fields))}
+
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth = depth + 1
+            continue
+
+        depth = depth - 1
+        if depth != 1:
+            continue
+
+        if tags is None or elem.tag in tags:
+            if index is None:
+                yield elem.tag, etree_to_dict(elem)[elem.tag]
+            else:
+                values = [None] * len(index)
+                for child in elem:
+                    if (i := index.get(child.tag)) is not None:
+                        values[i] = child.text.strip() if child.text else None
+                yield elem.tag, Record(index, values)
+
+        # Entry is done with, drop it (and anything before it) from the root
+        root.clear()
+
+################################################################################
+
 def init(directory: str):
     """
     Initializes the module by setting the main LaunchBox directory.
@@ -55,6 +267,171 @@ def init(directory: str):
 
 ################################################################################
 
+def init_mirror(db_path: str) -> int:
+    """
+    Enables the on-disk SQLite mirror of LB data.
+
+    Once enabled, Platforms.xml and platform XML files are only parsed when
+    their size or modified time has changed since they were last mirrored,
+    otherwise data is read straight from the mirror.
+
+    Args:
+        db_path (str): Path to SQLite database file, created if needed
+    """
+
+    global mirror
+
+    if (db_dir := os.path.dirname(db_path)) and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    mirror = sqlite3.connect(db_path)
+    mirror.execute("PRAGMA journal_mode = WAL")
+    mirror.execute("PRAGMA synchronous = NORMAL")
+
+    if mirror.execute("PRAGMA user_version").fetchone()[0] != MIRROR_VERSION:
+        log.debug(f"Mirror schema is out of date, rebuilding")
+        mirror.executescript("""
+            DROP TABLE IF EXISTS sources;
+            DROP TABLE IF EXISTS platforms;
+            DROP TABLE IF EXISTS entries;
+        """)
+
+    columns = ", ".join(f'"{f}" TEXT' for f in MIRROR_FIELDS)
+    mirror.executescript(f"""
+        CREATE TABLE IF NOT EXISTS sources (
+            path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS platforms (
+            name TEXT PRIMARY KEY, data TEXT
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            platform TEXT NOT NULL, tag TEXT NOT NULL, {columns}
+        );
+        CREATE INDEX IF NOT EXISTS entries_platform ON entries (platform, tag);
+    """)
+    for f in MIRROR_INDEXED:
+        mirror.execute(f'CREATE INDEX IF NOT EXISTS "entries_{f}" ON entries ("{f}")')
+    mirror.execute(f"PRAGMA user_version = {MIRROR_VERSION}")
+    mirror.commit()
+
+    return 0
+
+################################################################################
+
+def _mirror_source_stale(path: str) -> bool:
+    """Checks if a source XML file has changed since it was last mirrored."""
+
+    st = os.stat(path)
+    row = mirror.execute("SELECT size, mtime_ns FROM sources WHERE path = ?", (path,)).fetchone()
+    return row != (st.st_size, st.st_mtime_ns)
+
+def _mirror_source_update(path: str):
+    st = os.stat(path)
+    mirror.execute("INSERT OR REPLACE INTO sources (path, size, mtime_ns) VALUES (?, ?, ?)",
+        (path, st.st_size, st.st_mtime_ns))
+
+################################################################################
+
+def refresh_mirror(platform: str = None) -> bool:
+    """
+    Refreshes the mirror from XML if the source file has changed.
+
+    Args:
+        platform (str): Exact name of LaunchBox platform to refresh, or None to
+            refresh the platform list from Platforms.xml
+
+    Returns:
+        True if the mirror was refreshed, False if it was already up to date
+    """
+
+    if platform is None:
+        xml_path = os.path.join(main_directory, "Data", "Platforms.xml")
+    else:
+        xml_path = os.path.join(main_directory, "Data", "Platforms", platform + ".xml")
+
+    if not _mirror_source_stale(xml_path):
+        metrics.count('lb_mirror_hits')
+        return False
+
+    metrics.count('lb_mirror_refreshes')
+
+    log.debug(f"Refreshing mirror from {xml_path}")
+
+    if platform is None:
+        with mirror:
+            mirror.execute("DELETE FROM platforms")
+            mirror.executemany("INSERT OR REPLACE INTO platforms (name, data) VALUES (?, ?)",
+                ((p['Name'], json.dumps(p)) for _, p in iter_entries(xml_path, ('Platform',))
+                 if p and p.get('Name')))
+            _mirror_source_update(xml_path)
+    else:
+        _mirror_store(platform, xml_path,
+            ((tag, e._values) for tag, e in iter_entries(xml_path, MIRROR_TAGS, MIRROR_FIELDS)))
+
+    return True
+
+def _mirror_store(platform: str, xml_path: str, rows):
+    """Replaces mirrored entries for a platform with (tag, values) rows parsed from its XML file."""
+
+    with mirror:
+        mirror.execute("DELETE FROM entries WHERE platform = ?", (platform,))
+        columns = ", ".join(f'"{f}"' for f in MIRROR_FIELDS)
+        params = ", ".join('?' * (len(MIRROR_FIELDS) + 2))
+        mirror.executemany(f"INSERT INTO entries (platform, tag, {columns}) VALUES ({params})",
+            ((platform, tag, *values) for tag, values in rows))
+        _mirror_source_update(xml_path)
+
+################################################################################
+
+def _mirror_covers(fields, tags) -> bool:
+    """Checks if a request for game data can be answered from the mirror."""
+
+    if mirror is None or fields is None:
+        return False
+    return set(fields).issubset(MIRROR_FIELDS) and tags is not None and set(tags).issubset(MIRROR_TAGS)
+
+def _mirror_records(platform: str, fields: tuple, where: str, params: tuple):
+    """Yields (tag, Record) tuples for mirrored entries matching a where clause."""
+
+    index = {f: i for i, f in enumerate(dict.fromkeys(fields))}
+    columns = ", ".join(f'"{f}"' for f in index)
+    if platform is not None:
+        where = where + " AND platform = ?"
+        params = params + (platform,)
+    for tag, *values in mirror.execute(
+            f"SELECT tag, {columns} FROM entries WHERE {where} ORDER BY rowid", params):
+        yield tag, Record(index, values)
+
+################################################################################
+
+def find_entries(field: str, value: str, fields=MIRROR_FIELDS, platform: str = None) -> list:
+    """
+    Looks up mirrored entries by an indexed field, across all mirrored
+    platforms unless one is given.
+
+    Only platforms that have been loaded through the mirror are searched.
+
+    Args:
+        field (str): Indexed field to match on, see MIRROR_INDEXED
+        value (str): Value to match
+        fields (iterable): Fields to return for each entry
+        platform (str): Exact name of LaunchBox platform to limit search to
+
+    Returns:
+        List of (tag, Record) tuples
+    """
+
+    if mirror is None:
+        log.error(f"Mirror is not enabled, has init_mirror been called?")
+        return []
+    if field not in MIRROR_INDEXED:
+        log.error(f"Field '{field}' is not indexed in the mirror")
+        return []
+
+    return list(_mirror_records(platform, tuple(fields), f'"{field}" = ?', (value,)))
+
+################################################################################
+
 def load_platform_list() -> int:
 
     '''
@@ -71,72 +448,282 @@ def load_platform_list() -> int:
         log.debug(f"Platform data is already loaded")
         return 0
 
-    xml_tree = ET.parse(os.path.join(main_directory, "Data", "Platforms.xml"))
-    xml_dict = etree_to_dict(xml_tree.getroot())
+    if mirror is not None:
+        refresh_mirror()
+        for p_name, p_data in mirror.execute("SELECT name, data FROM platforms"):
+            platforms[p_name] = json.loads(p_data)
+        return 0
 
-    # Restructure to dictionary
-    if (p_list := xml_dict['LaunchBox'].get('Platform')):
-        for p in p_list:
-            if (p_name := p.get('Name')):
-                platforms[p_name] = p
+    p_path = os.path.join(main_directory, "Data", "Platforms.xml")
+    for _, p in iter_entries(p_path, tags=('Platform',)):
+        if p and (p_name := p.get('Name')):
+            platforms[p_name] = p
 
     return 0
 
 ################################################################################
 
-def load_game_data(platform: str) -> int:
+def _projection_loaded(platform: str, fields, tags) -> bool:
+    """Checks if already loaded game data for a platform covers the requested fields and tags."""
+
+    if platform not in gamedata:
+        return False
+    for loaded, wanted in zip(gamedata_projection[platform], (fields, tags)):
+        if loaded is not None and (wanted is None or not loaded.issuperset(wanted)):
+            return False
+    return True
+
+################################################################################
+
+def load_game_data(platform: str, fields=None, tags=None) -> int:
     """
     Loads game data for a LaunchBox platform name and stores in module as a 
-    dictionary.
+    dictionary, with a list of entries for each entry tag.
 
     Platform name provided has to be the exact name, not the 'ScrapeAs' name.
+
+    The platform XML is streamed rather than parsed as a whole. If fields are
+    given, only those fields are kept for each entry, stored as compact Record
+    objects, which is much faster and lighter on large platforms.
+
+    If the mirror is enabled and covers the requested fields and tags, data is
+    read from the mirror instead, which is only refreshed from XML if the file
+    has changed.
     
     Args:
         platform (str): Name of LaunchBox platform to load
+        fields (iterable): Field names to keep (i.e. 'ID', 'ApplicationPath'),
+            or None to keep all fields as dicts
+        tags (iterable): Entry tags to keep (i.e. 'Game', 'AdditionalApplication'),
+            or None for all
     """
     global gamedata
-    if gamedata.get(platform):
+    if fields is not None:
+        fields = tuple(fields)
+    if tags is not None:
+        tags = tuple(tags)
+
+    if _projection_loaded(platform, fields, tags):
         log.debug(f"Game data for this platform is already loaded")
         return 0
 
-    gd_path = os.path.join(main_directory, "Data", "Platforms", platform + ".xml")
-    xml_tree = ET.parse(gd_path)
-    xml_dict = etree_to_dict(xml_tree.getroot())["LaunchBox"]
+    if _mirror_covers(fields, tags):
+        refresh_mirror(platform)
+        tags_sql = ", ".join('?' * len(tags))
+        entries = _mirror_records(platform, fields, f"tag IN ({tags_sql})", tags)
+    else:
+        gd_path = os.path.join(main_directory, "Data", "Platforms", platform + ".xml")
+        entries = iter_entries(gd_path, tags, fields)
+
+    data = defaultdict(list)
+    for tag, entry in entries:
+        data[tag].append(entry)
 
-    gamedata[platform] = xml_dict
+    gamedata[platform] = dict(data)
+    title_indexes.pop(platform, None)
+    gamedata_projection[platform] = (
+        None if fields is None else frozenset(fields),
+        None if tags is None else frozenset(tags),
+    )
 
     return 0
 
 ################################################################################
 
-def get_game_data(platform: str) -> dict:
+def _parse_platform(xml_path: str, tags, fields):
+    """
+    Process pool worker for load_game_data_many, parses a platform XML file.
+
+    Returns a dictionary with a list of entries for each entry tag, where
+    entries are plain lists of values if fields is set so they pickle cheaply.
+    """
+
+    data = defaultdict(list)
+    for tag, entry in iter_entries(xml_path, tags, fields):
+        data[tag].append(entry if fields is None else entry._values)
+    return dict(data)
+
+def load_game_data_many(platform_list, fields=None, tags=None, workers: int = None) -> int:
+    """
+    Loads game data for several LaunchBox platforms, parsing their XML files
+    across a pool of processes, and stores in module the same as
+    load_game_data.
+
+    Platforms that are already loaded, or can be read from an up to date
+    mirror, aren't parsed again. The mirror is refreshed with the parsed data
+    if it covers the requested fields and tags.
+
+    Args:
+        platform_list (iterable): LaunchBox platform or 'ScrapeAs' names to load,
+            names without a matching platform are skipped
+        fields (iterable): See load_game_data
+        tags (iterable): See load_game_data
+        workers (int): Number of processes to use, defaults to the CPU count
+
+    Returns:
+        Number of platforms that were parsed from XML
+    """
+    if fields is not None:
+        fields = tuple(fields)
+    if tags is not None:
+        tags = tuple(tags)
+
+    use_mirror = _mirror_covers(fields, tags)
+    parse_fields, parse_tags = (MIRROR_FIELDS, MIRROR_TAGS) if use_mirror else (fields, tags)
+
+    resolved = [platform for p in platform_list if (platform := resolve_platform(p)) is not None]
+
+    to_parse = {}
+    for platform in resolved:
+        if _projection_loaded(platform, fields, tags):
+            continue
+        xml_path = os.path.join(main_directory, "Data", "Platforms", platform + ".xml")
+        if use_mirror and not _mirror_source_stale(xml_path):
+            continue
+        to_parse[platform] = xml_path
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(to_parse))
+
+    if workers > 1:
+        log.debug(f"Parsing {len(to_parse)} platforms with {workers} processes")
+        # Callers can have threads running (i.e. API requests), which forking could copy mid-way through holding a lock
+        with ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('spawn')) as executor:
+            futures = {platform: executor.submit(_parse_platform, xml_path, parse_tags, parse_fields)
+                       for platform, xml_path in to_parse.items()}
+            results = ((platform, futures[platform].result()) for platform in to_parse)
+            _store_parsed(to_parse, results, fields, tags, use_mirror, True)
+    else:
+        results = ((platform, _parse_platform(xml_path, parse_tags, parse_fields))
+                   for platform, xml_path in to_parse.items())
+        _store_parsed(to_parse, results, fields, tags, use_mirror, False)
+
+    # Anything else (mirrored or already loaded) is loaded as usual
+    for platform in resolved:
+        if not _projection_loaded(platform, fields, tags):
+            load_game_data(platform, fields, tags)
+
+    return len(to_parse)
+
+def _store_parsed(to_parse: dict, results, fields, tags, use_mirror: bool, in_worker: bool):
+    """Stores results from _parse_platform in the mirror, or in module game data."""
+
+    for platform, data in results:
+        xml_path = to_parse[platform]
+        # Metrics counted by worker processes are lost, so count their parsing here
+        if in_worker:
+            metrics.count('xml_files_parsed')
+            metrics.count('xml_bytes_parsed', os.path.getsize(xml_path))
+
+        if use_mirror:
+            metrics.count('lb_mirror_refreshes')
+            _mirror_store(platform, xml_path,
+                ((tag, values) for tag, entries in data.items() for values in entries))
+            continue
+
+        if fields is not None:
+            index = {f: i for i, f in enumerate(dict.fromkeys(fields))}
+            data = {tag: [Record(index, values) for values in entries] for tag, entries in data.items()}
+        gamedata[platform] = data
+        title_indexes.pop(platform, None)
+        gamedata_projection[platform] = (
+            None if fields is None else frozenset(fields),
+            None if tags is None else frozenset(tags),
+        )
+
+################################################################################
+
+def resolve_platform(platform: str) -> str:
     '''
-    Loads and returns a dictionary containing all game entries for a LB platform.
+    Returns the exact LB platform name for a platform or 'ScrapeAs' name, or
+    None if there's no matching platform.
     '''
 
     global platforms
-    global gamedata
 
     if not platforms:
         load_platform_list()
 
-    found = False
-
     if platforms.get(platform):
-        found = True
-    else:
-        for p_name, p_data in platforms.items():
-            if p_data.get('ScrapeAs') == platform:
-                platform = p_name
-                found = True
-                break
-
-    if not found:
-        log.error(f"ERROR: Could not find platform matching '{platform}' in LB Platforms.xml")
+        return platform
+
+    for p_name, p_data in platforms.items():
+        if p_data.get('ScrapeAs') == platform:
+            return p_name
+
+    log.error(f"ERROR: Could not find platform matching '{platform}' in LB Platforms.xml")
+    return None
+
+################################################################################
+
+def get_platform_file(platform: str) -> str:
+    '''
+    Returns the path to the XML file for a LB platform or 'ScrapeAs' name, or
+    None if there's no matching platform.
+    '''
+
+    if (platform := resolve_platform(platform)) is None:
+        return None
+    return os.path.join(main_directory, "Data", "Platforms", platform + ".xml")
+
+################################################################################
+
+def get_game_data(platform: str, fields=None, tags=None) -> dict:
+    '''
+    Loads and returns a dictionary containing all game entries for a LB platform.
+
+    See load_game_data for the 'fields' and 'tags' arguments.
+    '''
+
+    global gamedata
+
+    if (platform := resolve_platform(platform)) is None:
         return None
     
-    if not gamedata.get(platform):
-        load_game_data(platform)
+    if not _projection_loaded(platform, fields, tags):
+        load_game_data(platform, fields, tags)
 
     return gamedata[platform]
-    
\ No newline at end of file
+    
+
+def unload_game_data(platform: str):
+    """
+    Drops loaded game data (and its title index) for a LB platform or
+    'ScrapeAs' name, so it's loaded again on next use, i.e. after the platform
+    XML file has changed.
+    """
+
+    if (platform := resolve_platform(platform)) is None:
+        return
+    gamedata.pop(platform, None)
+    gamedata_projection.pop(platform, None)
+    title_indexes.pop(platform, None)
+
+################################################################################
+
+def get_title_index(platform: str) -> TitleIndex:
+    '''
+    Returns a TitleIndex over Game 'Title' and AdditionalApplication 'Name'
+    fields for a LB platform or 'ScrapeAs' name, with (tag, entry) tuples as
+    items, or None if there's no matching platform.
+
+    The index is built on first use, loading game data if the fields aren't
+    already loaded.
+    '''
+
+    if (platform := resolve_platform(platform)) is None:
+        return None
+
+    if (index := title_indexes.get(platform)) is not None:
+        return index
+
+    index = TitleIndex()
+    data = get_game_data(platform, ('ID', 'Title', 'Name'), ('Game', 'AdditionalApplication'))
+    for tag, field in (('Game', 'Title'), ('AdditionalApplication', 'Name')):
+        for entry in data.get(tag) or []:
+            if (title := entry.get(field)):
+                index.add(title, (tag, entry))
+
+    title_indexes[platform] = index
+    return index
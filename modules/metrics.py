@@ -0,0 +1,185 @@
+from collections import defaultdict
+from datetime import datetime
+import cProfile
+import json
+import threading
+import time
+
+################################################################################
+
+counters = defaultdict(int)
+"""Dictionary of event counts (API calls, cache hits, hashes computed, etc), with counter name as key."""
+phases = defaultdict(float)
+"""Dictionary of seconds spent in each phase, with phase name as key."""
+consoles = defaultdict(lambda: defaultdict(float))
+"""Dictionary of seconds spent in each phase per console, with console name as key."""
+
+started = time.time()
+_lock = threading.Lock()
+_current_phase = None
+_current_console = None
+_phase_start = 0.0
+_console_start = 0.0
+_profiler = None
+
+################################################################################
+
+def reset():
+    """Clears all metrics and restarts the run timer."""
+
+    global started, _current_phase, _current_console
+    counters.clear()
+    phases.clear()
+    consoles.clear()
+    started = time.time()
+    _current_phase = None
+    _current_console = None
+
+################################################################################
+
+def count(name: str, n: int = 1):
+    """Adds to a counter, safe to call from worker threads."""
+
+    with _lock:
+        counters[name] = counters[name] + n
+
+################################################################################
+
+def _close_segments(now: float):
+    if _current_phase is not None:
+        phases[_current_phase] = phases[_current_phase] + (now - _phase_start)
+        if _current_console is not None:
+            c = consoles[_current_console]
+            c[_current_phase] = c[_current_phase] + (now - _console_start)
+
+def phase(name: str, console: str = None):
+    '''
+    Ends the current phase and starts timing a new one, optionally for a
+    specific console. Time is added to any previous time for the same phase.
+
+    Args:
+        name (str): Phase name (i.e. 'api_fetch'), or None to stop timing
+        console (str): Console the phase is being done for, if any
+    '''
+    global _current_phase, _current_console, _phase_start, _console_start
+
+    with _lock:
+        now = time.perf_counter()
+        _close_segments(now)
+        _current_phase = name
+        _current_console = console
+        _phase_start = now
+        _console_start = now
+
+def console(name: str):
+    '''
+    Switches the console that time in the current phase is added to.
+    '''
+    global _current_console, _console_start
+
+    with _lock:
+        now = time.perf_counter()
+        if _current_phase is not None and _current_console is not None:
+            c = consoles[_current_console]
+            c[_current_phase] = c[_current_phase] + (now - _console_start)
+        _current_console = name
+        _console_start = now
+
+################################################################################
+
+def _format_seconds(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class Progress:
+    """
+    Prints progress lines with throughput and ETA for a long-running task,
+    at most once every 'interval' seconds.
+    """
+
+    def __init__(self, total: int, label: str, unit: str = 'files', interval: float = 5.0):
+        self.total = total
+        self.label = label
+        self.unit = unit
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self.last_print = self.start
+
+    def update(self, n: int = 1):
+        self.done = self.done + n
+        now = time.perf_counter()
+        if now - self.last_print >= self.interval and self.done < self.total:
+            self.last_print = now
+            print(f"    {self.label}: {self.status(now)}")
+
+    def status(self, now: float = None) -> str:
+        if now is None:
+            now = time.perf_counter()
+        elapsed = now - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        pct = 100.0 * self.done / self.total if self.total else 100.0
+        eta = _format_seconds((self.total - self.done) / rate) if rate > 0 else '?'
+        return f"{self.done}/{self.total} ({pct:.1f}%) - {rate:.1f} {self.unit}/s, ETA {eta}"
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        if elapsed >= self.interval:
+            print(f"    {self.label}: {self.done} {self.unit} in {_format_seconds(elapsed)} ({rate:.1f} {self.unit}/s)")
+
+################################################################################
+
+def summary() -> dict:
+    '''
+    Returns all metrics as a JSON serializable dictionary. Time for the
+    current phase is included up to now.
+    '''
+    with _lock:
+        _close_segments(time.perf_counter())
+        result = {
+            'started': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            'total_seconds': round(time.time() - started, 4),
+            'phases': {k: round(v, 4) for k, v in phases.items()},
+            'consoles': {c: {k: round(v, 4) for k, v in p.items()} for c, p in consoles.items()},
+            'counters': dict(sorted(counters.items())),
+        }
+        # Segments were closed to get up to date numbers, so restart them from here
+        global _phase_start, _console_start
+        _phase_start = _console_start = time.perf_counter()
+    return result
+
+def write_summary(file_path: str) -> dict:
+    '''
+    Writes the metrics summary to a JSON file, and returns it.
+    '''
+    result = summary()
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent = 4)
+    return result
+
+################################################################################
+
+def start_profile():
+    '''
+    Starts profiling with cProfile, stats are written by stop_profile.
+    '''
+    global _profiler
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+def stop_profile(file_path: str):
+    '''
+    Stops profiling and writes stats to a file, which can be read with the
+    pstats module or tools like snakeviz.
+    '''
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.disable()
+    _profiler.dump_stats(file_path)
+    _profiler = None
@@ -1,24 +1,111 @@
 # Modified from https://github.com/RetroAchievements/api-python/
 
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+import threading
 import time
 
+import requests
+from requests.adapters import HTTPAdapter
+
+from .. import metrics
+
 ################################################################################
 
 RC_BASE_URL = "https://retroachievements.org/API/"
+RATE_LIMIT = 180
+"""Maximum requests per minute allowed by the RetroAchievements API."""
+
+CACHE_POLICIES = {
+    'API_GetConsoleIDs': 60 * 60 * 24 * 7,
+    'API_GetGameList': 60 * 60 * 24,
+    'API_GetGameHashes': 60 * 60 * 24 * 30,
+}
+"""Seconds that cached responses stay fresh for each endpoint. Once stale they're still used, while being refreshed in the background."""
+CACHE_DEFAULT_TTL = 60 * 60 * 24
+"""Seconds that cached responses stay fresh for endpoints not in CACHE_POLICIES."""
 
+base_url = RC_BASE_URL
 username = ""
 api_key = ""
+max_workers = 4
+"""Maximum number of concurrent requests for batch calls."""
+session = None
+"""Shared requests session, created on first use."""
+session_lock = threading.Lock()
+cache_path = None
+"""Path to SQLite file caching API responses, or None if responses aren't cached."""
+cache_policies = CACHE_POLICIES
+offline = False
+"""If True, responses only come from the cache and no requests are sent."""
+
+class NotCachedError(Exception):
+    """Raised in offline mode for requests with no cached response."""
+
+################################################################################
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Allows short bursts of up to 'capacity' requests, then limits to 'rate'
+    requests per second.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens = self.tokens - 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def make_limiter(rate_limit: int) -> TokenBucket:
+    # Burst allowance comes out of the per-minute rate, so no 60 second window goes over the limit
+    burst = min(3, max(rate_limit // 60, 1))
+    return TokenBucket(max(rate_limit - burst, 1) / 60, burst)
+
+limiter = make_limiter(RATE_LIMIT)
 
 ################################################################################
 
-def init(user: str, key: str):
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    HTTP adapter that takes a token from the limiter for each request sent.
+
+    Being at the adapter level, responses served from a request cache never
+    reach this, so don't count against the limit.
+    """
+
+    def send(self, request, **kwargs):
+        limiter.acquire()
+        return super().send(request, **kwargs)
+
+################################################################################
+
+def init(user: str, key: str, workers: int = 4, url: str = None, rate_limit: int = None):
     """
     Initializes the module
     
     Args:
         user (str): Username
         key (str): API Key
+        workers (int): Maximum number of concurrent requests for batch calls
+        url (str): Base URL for API requests, if not the RetroAchievements site
+        rate_limit (int): Maximum requests per minute, if not RATE_LIMIT
     """
 
     # TODO: Validate that username value appears to be valid
@@ -29,12 +116,47 @@ def init(user: str, key: str):
     global api_key
     api_key = key
 
+    global max_workers
+    max_workers = workers
+
+    global base_url
+    base_url = url or RC_BASE_URL
+
+    global limiter
+    limiter = make_limiter(rate_limit or RATE_LIMIT)
+
     # TODO: Do a test request to the API, make sure things are okay
 
     return 0
 
 ################################################################################
 
+def init_cache(path: str, policies: dict = None, offline_mode: bool = False):
+    """
+    Enables caching of API responses, requires the 'requests-cache' module.
+
+    Each endpoint has its own time to live (see CACHE_POLICIES). Stale cached
+    responses are returned straight away while a request refreshes them in the
+    background, and are also used if a request fails. In offline mode stale
+    responses are returned as they are, without refreshing them.
+
+    Args:
+        path (str): Path to SQLite cache file, '.sqlite' is added if needed
+        policies (dict): Seconds cached responses stay fresh for, with endpoint
+            name as key, if not CACHE_POLICIES
+        offline_mode (bool): Only use cached responses, no requests are sent
+            and NotCachedError is raised for anything not cached
+    """
+
+    global cache_path, cache_policies, offline, session
+    cache_path = path
+    cache_policies = policies or CACHE_POLICIES
+    offline = offline_mode
+    with session_lock:
+        session = None
+
+################################################################################
+
 def url_params(params=None):
     '''
     Inserts the auth and query params into the request
@@ -46,33 +168,139 @@ def url_params(params=None):
 
 ################################################################################
 
-def call_api(endpoint=None, params=None, timeout=30, headers=None):
+def get_session() -> requests.Session:
+    '''
+    Returns the shared session, creating it on first use with a connection
+    pool sized for batch calls and the rate limiter mounted. Safe to call from
+    the worker threads of batch calls.
+    '''
+    global session
+    with session_lock:
+        if session is None:
+            if cache_path is not None:
+                import requests_cache
+                # Revalidating would send a request, so offline mode relies on stale_if_error to return stale responses
+                s = requests_cache.CachedSession(cache_path,
+                    expire_after = CACHE_DEFAULT_TTL,
+                    urls_expire_after = {f"*{e}*": ttl for e, ttl in cache_policies.items()},
+                    stale_while_revalidate = not offline,
+                    stale_if_error = True,
+                )
+            else:
+                s = requests.Session()
+            adapter = RateLimitedAdapter(pool_connections=1, pool_maxsize=max(max_workers, 1))
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            session = s
+        return session
+
+################################################################################
+
+def retry_after(req) -> float:
+    '''
+    Returns the number of seconds a response asks us to wait with its
+    Retry-After header, or None if not set.
+    '''
+    if req is None or not (value := req.headers.get("Retry-After")):
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+################################################################################
+
+def call_api(endpoint=None, params=None, timeout=30, headers=None, attempts=5, refresh=False):
     if endpoint is None:
         endpoint = {}
 
-    # Rough rate limit - 180 per minute (3 per second)
+    # If requests are being cached, 'refresh' skips any cached response, and offline only uses cached responses
+    kwargs = {}
+    if offline:
+        if not hasattr(get_session(), 'cache'):
+            raise NotCachedError(f"Offline, with no request cache - {endpoint}")
+        kwargs['only_if_cached'] = True
+    elif refresh and hasattr(get_session(), 'cache'):
+        kwargs['force_refresh'] = True
 
-    attempts = 0
-    while attempts < 5:
+    # Rate limit is handled by the session adapter, backs off exponentially on
+    # failures unless the server tells us how long to wait
 
-        req = requests.get(
-            f"{RC_BASE_URL}{endpoint}",
-            params = url_params(params),
-            timeout = timeout,
-            headers = headers,
-        )
+    backoff = 1.0
+    for attempt in range(attempts):
 
-        if req.status_code == 200:
-            break
+        metrics.count('api_calls')
+        try:
+            req = get_session().get(
+                f"{base_url}{endpoint}",
+                params = url_params(params),
+                timeout = timeout,
+                headers = headers,
+                **kwargs,
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == attempts - 1:
+                raise
+            print(f"  {type(e).__name__} - {e}")
+            metrics.count('api_errors')
+            req = None
         else:
+            if offline and req.status_code == 504:
+                raise NotCachedError(f"Offline, and no cached response - {endpoint} {params}")
+            if getattr(req, 'from_cache', False):
+                metrics.count('api_cache_stale' if req.is_expired else 'api_cache_hits')
+            else:
+                metrics.count('api_cache_misses')
+            if req.status_code == 200:
+                break
             print(f"  {req.status_code} - {req.reason}")
-            attempts = attempts + 1
-            time.sleep(1.0)
+            metrics.count('api_errors')
+
+        if attempt < attempts - 1:
+            metrics.count('api_retries')
+            time.sleep(retry_after(req) or backoff)
+            backoff = min(backoff * 2, 60.0)
 
     return req
 
 ################################################################################
 
+def call_many(func, items, *args, workers: int = None):
+    '''
+    Calls an API function for many items at once (i.e. game IDs or console
+    IDs), on a pool of worker threads. All requests still go through the rate
+    limiter. Requests are started straight away, so other work can be done
+    while they run.
+
+    Args:
+        func: API function to call, taking the item as first argument
+        items (iterable): Items to call the function for
+        args: Any extra arguments for the function
+        workers (int): Maximum concurrent requests, or None for module default
+
+    Returns:
+        Iterator of (item, result) tuples, as each request finishes
+    '''
+    pool = ThreadPoolExecutor(max_workers=workers or max_workers)
+    futures = {pool.submit(func, i, *args): i for i in items}
+    # Worker threads exit once all requests are done
+    pool.shutdown(wait=False)
+    return ((futures[f], f.result()) for f in as_completed(futures))
+
+def _call_cached(item, func, *args):
+    """Calls an API function, returning None instead of raising NotCachedError in offline mode."""
+
+    try:
+        return func(item, *args)
+    except NotCachedError:
+        return None
+
+################################################################################
+
 def get_console_ids(active = 0, is_game_system = 0) -> list:
     '''
     Retrieve the complete list of all system ID and name pairs on the site.
@@ -105,13 +333,41 @@ def get_game_list(system: int, has_cheevos = 0, hashes = 0, offset = 0, max_resu
 
 ################################################################################
 
-def get_game_hashes(game_id: int) -> dict:
+def get_game_hashes(game_id: int, refresh = False) -> dict:
     '''
     Retrieve the hashes linked to a game, targeted via its unique ID.
     Params:
         i: The target game ID
     '''
     result = call_api("API_GetGameHashes.php?",
-        {"i": game_id}
+        {"i": game_id}, refresh = refresh
     ).json()
     return result
+
+################################################################################
+
+def get_game_lists(systems, has_cheevos = 0, hashes = 0) -> dict:
+    '''
+    Retrieve the complete game lists for many consoles concurrently.
+    Returns a dictionary of results with console ID as key. In offline mode,
+    consoles with no cached game list are left out.
+    '''
+    return dict(iter_game_lists(systems, has_cheevos, hashes))
+
+def iter_game_lists(systems, has_cheevos = 0, hashes = 0):
+    '''
+    Requests the complete game lists for many consoles concurrently, returning
+    an iterator of (console ID, result) tuples as each request finishes. In
+    offline mode, consoles with no cached game list are left out.
+    '''
+    return ((i, r) for i, r in call_many(_call_cached, systems, get_game_list, has_cheevos, hashes) if r is not None)
+
+################################################################################
+
+def get_games_hashes(game_ids, refresh = False) -> dict:
+    '''
+    Retrieve the hashes linked to many games concurrently.
+    Returns a dictionary of results with game ID as key. In offline mode,
+    games with no cached hashes are left out.
+    '''
+    return {i: r for i, r in call_many(_call_cached, game_ids, get_game_hashes, refresh) if r is not None}
@@ -0,0 +1,209 @@
+import json
+import logging as log
+import os
+
+from .. import metrics
+
+################################################################################
+
+JOURNAL_SUFFIX = '.journal'
+"""Suffix of the journal file kept next to a hash cache file while hashing."""
+
+################################################################################
+
+def fingerprint(system: int, file_path: str, extra_files: list = None) -> dict:
+    '''
+    Builds the fingerprint a cached hash is valid for - the file path, size and
+    modified time, and the console ID it was hashed as.
+
+    Args:
+        extra_files (list): Other files the entry is hashed from, like the
+            rest of the discs in an M3U playlist, whose sizes and modified
+            times are included too (as None for files that don't exist)
+
+    Returns None if the file doesn't exist.
+    '''
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+
+    fp = {"file": file_path, "system": system, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if extra_files:
+        fp["extra_files"] = [[f, *_stat_file(f)] for f in extra_files]
+    return fp
+
+def _stat_file(file_path: str) -> tuple:
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None, None
+    return st.st_size, st.st_mtime_ns
+
+################################################################################
+
+def load(cache_path: str) -> dict:
+    '''
+    Loads a hash cache file, a dictionary of fingerprinted hash entries with
+    LB ApplicationPath as key.
+
+    Entries from older caches that only stored the hash are kept, but have no
+    fingerprint, so lookup() treats them as stale and they get hashed again.
+    '''
+    if not os.path.exists(cache_path):
+        return {}
+
+    with open(cache_path, encoding='utf-8') as f:
+        cache = json.load(f)
+
+    for key, entry in cache.items():
+        if isinstance(entry, str):
+            cache[key] = {"hash": entry}
+
+    return cache
+
+def save(cache_path: str, cache: dict, journal = None):
+    '''
+    Writes a hash cache file, replacing the old one in a single step so it's
+    never left half written. Any journal is closed and removed, as
+    everything in it is now in the cache file.
+    '''
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii = False, separators = (',', ':'))
+    os.replace(tmp_path, cache_path)
+
+    if journal is not None:
+        journal.close()
+    discard_journal(cache_path)
+
+################################################################################
+
+def open_journal(cache_path: str):
+    '''
+    Opens the journal for a hash cache file, which store() and remove() append
+    each change to as it's made, so an interrupted run loses no hashes.
+
+    Returns:
+        Journal file, to pass to store(), remove() and save()
+    '''
+    return open(cache_path + JOURNAL_SUFFIX, 'a', encoding='utf-8')
+
+def _write_journal(journal, key: str, entry: dict):
+    if journal is not None:
+        journal.write(json.dumps([key, entry], ensure_ascii = False) + '\n')
+        journal.flush()
+
+def has_journal(cache_path: str) -> bool:
+    '''
+    Checks if a hash cache file has a journal, left by a run that was
+    interrupted before saving the cache.
+    '''
+    return os.path.exists(cache_path + JOURNAL_SUFFIX)
+
+def replay_journal(cache_path: str, cache: dict) -> int:
+    '''
+    Applies changes from the journal of an interrupted run to a loaded hash
+    cache. A change that was only partly written when the run stopped is
+    skipped.
+
+    Returns:
+        Number of changes applied
+    '''
+    count = 0
+    with open(cache_path + JOURNAL_SUFFIX, encoding='utf-8') as f:
+        for line in f:
+            try:
+                key, entry = json.loads(line)
+            except ValueError:
+                log.debug(f"Skipping partly written journal entry - {line[:100]}")
+                continue
+            if entry is None:
+                cache.pop(key, None)
+            else:
+                cache[key] = entry
+            count = count + 1
+    metrics.count('hash_journal_replayed', count)
+    return count
+
+def discard_journal(cache_path: str):
+    try:
+        os.remove(cache_path + JOURNAL_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+################################################################################
+
+def lookup(cache: dict, key: str, fp: dict) -> str:
+    '''
+    Returns the cached hash for a key if its fingerprint still matches, or
+    None if it's missing or stale.
+    '''
+    if fp is None or (entry := cache.get(key)) is None:
+        metrics.count('hash_cache_misses')
+        return None
+
+    # Legacy entries without a fingerprint could be for a file that has since been replaced
+    if "size" not in entry:
+        log.debug(f"Cached hash has no fingerprint - {key}")
+        metrics.count('hash_cache_stale')
+        return None
+
+    if any(entry.get(k) != v for k, v in fp.items()) or ("extra_files" in entry and "extra_files" not in fp):
+        log.debug(f"Cached hash is stale - {key}")
+        metrics.count('hash_cache_stale')
+        return None
+
+    metrics.count('hash_cache_hits')
+    return entry["hash"]
+
+def store(cache: dict, key: str, fp: dict, h: str, extra_hashes: list = None, journal = None):
+    '''
+    Stores a hash in the cache, along with the fingerprint of the file at the
+    time it was hashed, and appends it to the journal if given.
+
+    Extra hashes are for entries with more than one ROM, like multi-disc
+    playlists or archives with several ROMs, with 'h' being the main one.
+    '''
+    cache[key] = dict(fp, hash = h)
+    if extra_hashes:
+        cache[key]["extra_hashes"] = extra_hashes
+    _write_journal(journal, key, cache[key])
+
+def remove(cache: dict, key: str, journal = None):
+    '''
+    Removes an entry from the cache, and appends the removal to the journal
+    if given.
+    '''
+    if cache.pop(key, None) is not None:
+        _write_journal(journal, key, None)
+
+def get_hash(cache: dict, key: str) -> str:
+    '''
+    Returns the cached hash for a key without checking its fingerprint.
+    '''
+    if (entry := cache.get(key)) is None:
+        return None
+    return entry.get("hash")
+
+def get_hashes(cache: dict, key: str) -> list:
+    '''
+    Returns the main and any extra cached hashes for a key without checking
+    its fingerprint.
+    '''
+    if (entry := cache.get(key)) is None or not entry.get("hash"):
+        return []
+    return [entry["hash"]] + entry.get("extra_hashes", [])
+
+################################################################################
+
+def evict_missing(cache: dict) -> int:
+    '''
+    Removes entries for files that no longer exist.
+
+    Returns the number of entries removed.
+    '''
+    missing = [k for k, e in cache.items() if "file" in e and not os.path.exists(e["file"])]
+    for k in missing:
+        del cache[k]
+    return len(missing)
@@ -0,0 +1,229 @@
+    # Pure-Python CD image reading for the disc hash methods, based on
+    # https://github.com/RetroAchievements/rcheevos/blob/develop/src/rhash/cdreader.c
+    # Only the sectors a hash method asks for are read, nothing is mapped or read whole.
+
+import os
+import re
+
+################################################################################
+
+SECTOR_DATA_SIZE = 2048
+"""Bytes of user data in a data sector, whatever the sector size in the image."""
+
+SYNC_PATTERN = b'\x00' + b'\xff' * 10 + b'\x00'
+"""First 12 bytes of every raw (2352 byte) data sector."""
+
+FIRST_DATA_TRACK = 0
+"""Track number for open_track meaning the first data (non-audio) track."""
+
+HEADER_SIZES = {
+    'MODE1/2048': 0,
+    'MODE1/2352': 16,
+    'MODE2/2048': 0,
+    'MODE2/2336': 8,
+    'MODE2/2352': 24,
+}
+"""Bytes before the user data in each sector, for each CUE track mode."""
+
+CUE_PATTERN = re.compile(r'\s*(FILE|TRACK|INDEX)\s+(?:"([^"]*)"|(\S+))(?:\s+(\S+))?', re.IGNORECASE)
+
+################################################################################
+
+class Track:
+    """
+    A data track of a disc image, read a sector at a time with seeks.
+
+    Sectors are numbered from the start of the disc, as they are in ISO9660
+    directory records, and sectors before the track can't be read.
+    """
+
+    def __init__(self, file_path: str, first_sector: int = 0, file_offset: int = 0,
+                 sector_size: int = SECTOR_DATA_SIZE, header_size: int = 0):
+        '''
+        Args:
+            file_path (str): Path to the image file the track is in
+            first_sector (int): Sector number of the start of the track (INDEX 01)
+            file_offset (int): Byte offset of the start of the track in the file
+            sector_size (int): Bytes per sector in the file, 2048 or raw 2352
+            header_size (int): Bytes before the user data in each sector
+
+        Raises:
+            OSError: If the file can't be opened
+        '''
+        self.first_sector = first_sector
+        self.file_offset = file_offset
+        self.sector_size = sector_size
+        self.header_size = header_size
+        self.f = open(file_path, 'rb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.f.close()
+
+    def read(self, sector: int, size: int = SECTOR_DATA_SIZE) -> bytes:
+        """Reads user data starting at a sector, carrying on into following sectors if needed. Short at the end of the file."""
+
+        if sector < self.first_sector:
+            return b''
+        pos = self.file_offset + (sector - self.first_sector) * self.sector_size + self.header_size
+        if self.header_size == 0 and self.sector_size == SECTOR_DATA_SIZE:
+            self.f.seek(pos)
+            return self.f.read(size)
+
+        data = bytearray()
+        while size > 0:
+            self.f.seek(pos)
+            chunk = self.f.read(min(size, SECTOR_DATA_SIZE))
+            data += chunk
+            if len(chunk) < min(size, SECTOR_DATA_SIZE):
+                break
+            size -= len(chunk)
+            pos += self.sector_size
+        return bytes(data)
+
+################################################################################
+
+def _parse_msf(msf: str) -> int:
+    """Converts a CUE mm:ss:ff time to a number of sectors."""
+
+    if not (m := re.fullmatch(r'(\d+):(\d+):(\d+)', msf)):
+        raise ValueError(f"Invalid CUE time: {msf}")
+    return (int(m[1]) * 60 + int(m[2])) * 75 + int(m[3])
+
+def parse_cue(cue_path: str) -> list:
+    '''
+    Reads the tracks from a CUE sheet.
+
+    Returns:
+        List of dictionaries with 'number', 'mode', 'file', 'first_sector'
+        (from the start of the disc) and 'file_offset' for each track with an
+        INDEX 01, in sheet order
+
+    Raises:
+        OSError: If the CUE sheet or its files can't be read, or it's not valid
+    '''
+    with open(cue_path, encoding='utf-8', errors='replace') as f:
+        lines = f.read().splitlines()
+
+    tracks = []
+    file_path = None
+    file_sector = 0
+    """Sector number of the start of the current file, from the sizes of the files before it."""
+    track = None
+    for line in lines:
+        if not (m := CUE_PATTERN.match(line)):
+            continue
+        command, value, extra = m[1].upper(), m[2] if m[2] is not None else m[3], m[4]
+
+        try:
+            if command == 'FILE':
+                if file_path is not None and track is not None:
+                    file_sector = file_sector + os.path.getsize(file_path) // _sector_size(track['mode'])
+                file_path = os.path.join(os.path.dirname(cue_path), value)
+                track = None
+            elif command == 'TRACK' and file_path is not None:
+                track = {'number': int(value), 'mode': (extra or '').upper(), 'file': file_path}
+            elif command == 'INDEX' and track is not None and int(value) == 1 and extra:
+                index = _parse_msf(extra)
+                track.update(first_sector = file_sector + index, file_offset = index * _sector_size(track['mode']))
+                tracks.append(track)
+        except ValueError as e:
+            raise OSError(f"Invalid CUE sheet {cue_path}: {e}") from e
+    return tracks
+
+def _sector_size(mode: str) -> int:
+    if mode == 'AUDIO':
+        return 2352
+    if (m := re.search(r'/(\d+)$', mode)):
+        return int(m[1])
+    return 2352
+
+def open_track(file_path: str, number: int = 1) -> Track:
+    '''
+    Opens a track of a disc image, either from a CUE sheet or a single track
+    image (.iso/.bin/.img), which can have 2048 byte or raw 2352 byte sectors.
+
+    Args:
+        file_path (str): Path to image
+        number (int): Track number, or FIRST_DATA_TRACK for the first data track
+
+    Raises:
+        OSError: If the image can't be read or doesn't have the track
+    '''
+    if file_path.casefold().endswith('.cue'):
+        for t in parse_cue(file_path):
+            if (t['number'] == number) if number != FIRST_DATA_TRACK else t['mode'] != 'AUDIO':
+                if t['mode'] not in HEADER_SIZES:
+                    raise OSError(f"Unsupported track mode {t['mode'] or '(none)'} in {file_path}")
+                return Track(t['file'], t['first_sector'], t['file_offset'], _sector_size(t['mode']), HEADER_SIZES[t['mode']])
+        raise OSError(f"Could not find track {number or 'with data'} in {file_path}")
+
+    if number not in (1, FIRST_DATA_TRACK):
+        raise OSError(f"Could not find track {number} in {file_path}, single track images only have track 1")
+
+    # Raw images start every sector with the sync pattern, the byte after the address is the mode
+    with open(file_path, 'rb') as f:
+        header = f.read(16)
+    if header[:12] == SYNC_PATTERN:
+        return Track(file_path, sector_size = 2352, header_size = 24 if header[15] == 2 else 16)
+    return Track(file_path)
+
+################################################################################
+
+def find_file_sector(track: Track, path: str) -> tuple:
+    '''
+    Finds a file in the ISO9660 filesystem of a track. Directories in the path
+    are separated by backslashes, and names are matched without case, with or
+    without the ';1' version suffix.
+
+    Returns:
+        (sector, size) tuple, or (0, 0) if not found
+    '''
+    if path.startswith('\\'):
+        path = path[1:]
+    num_sectors = 0
+
+    if '\\' in path:
+        directory, path = path.rsplit('\\', 1)
+        sector, _ = find_file_sector(track, directory)
+        if not sector:
+            return 0, 0
+    else:
+        # The primary volume descriptor is at sector 16, with the root directory record at 156
+        pvd = track.read(track.first_sector + 16, 256)
+        if len(pvd) < 256:
+            return 0, 0
+        sector = int.from_bytes(pvd[158:161], 'little')
+        # The root directory can span more than one sector
+        block_size = int.from_bytes(pvd[128:130], 'little')
+        num_sectors = int.from_bytes(pvd[166:170], 'little') // block_size if block_size else 1
+
+    name = path.encode('latin-1', errors='replace').lower()
+    buf = track.read(sector)
+    if not buf:
+        return 0, 0
+
+    pos = 0
+    while True:
+        if pos >= len(buf) or not buf[pos]:
+            # End of the directory in this sector, carry on into the next if it spans several
+            if num_sectors > 1:
+                num_sectors = num_sectors - 1
+                sector = sector + 1
+                if (buf := track.read(sector)):
+                    pos = 0
+                    continue
+            return 0, 0
+
+        # Names start 33 bytes into the record, as "NAME;version" for files or "NAME" for directories
+        record = buf[pos:pos + buf[pos]]
+        if ((record[32:33] == bytes([len(name)]) or record[33 + len(name):34 + len(name)] == b';') and
+                record[33:33 + len(name)].lower() == name):
+            return int.from_bytes(record[2:5], 'little'), int.from_bytes(record[10:14], 'little')
+
+        pos = pos + buf[pos]
@@ -0,0 +1,332 @@
+    # Pure-Python GameCube disc image reading for the native hash methods, based on
+    # https://github.com/dolphin-emu/dolphin/blob/master/docs/WiaAndRvz.md
+    # Only the groups of a WIA/RVZ image that are read from are decompressed.
+
+import bz2
+import lzma
+import struct
+
+################################################################################
+
+WIA_MAGIC = b'WIA\x01'
+RVZ_MAGIC = b'RVZ\x01'
+
+DISC_HEADER_SIZE = 0x80
+"""Bytes at the start of the disc stored in the WIA/RVZ header rather than in groups."""
+BLOCK_SIZE = 0x8000
+"""Raw data starts are rounded down to this, and RVZ junk data is generated in blocks of it."""
+
+FILE_HEAD = struct.Struct('>4sIII20sQQ20s')
+"""wia_file_head_t: magic, version, compatible version, disc struct size, disc hash, ISO size, file size, header hash."""
+DISC = struct.Struct('>IIiI128sIIQ20sIQIIQIB7s')
+"""wia_disc_t: disc type, compression, level, chunk size, disc header, partitions (4), raw data (3), groups (3), compressor data."""
+RAW_DATA = struct.Struct('>QQII')
+"""wia_raw_data_t: disc offset, size, first group index, number of groups."""
+WIA_GROUP = struct.Struct('>II')
+"""wia_group_t: file offset / 4, size."""
+RVZ_GROUP = struct.Struct('>III')
+"""rvz_group_t: file offset / 4, size with compressed flag in the top bit, packed size."""
+
+GAMECUBE_DISC = 1
+COMPRESSION_NONE, COMPRESSION_PURGE, COMPRESSION_BZIP2, COMPRESSION_LZMA, COMPRESSION_LZMA2, COMPRESSION_ZSTD = range(6)
+
+LFG_K = 521
+LFG_J = 32
+LFG_SEED_SIZE = 17
+"""Lagged Fibonacci generator parameters, for the junk data RVZ stores as a seed."""
+
+MAX_CACHED_CHUNKS = 4
+
+################################################################################
+
+def _zstd_module():
+    """Returns a module for Zstandard (Python 3.14+, or the optional 'zstandard' module), or None."""
+
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+def _decompress(data: bytes, size: int, compression: int, compressor_data: bytes) -> bytes:
+    """Decompresses a group or table to (at most) size bytes."""
+
+    try:
+        if compression == COMPRESSION_NONE:
+            return data[:size]
+
+        if compression == COMPRESSION_PURGE:
+            # Runs of (offset, size, data), anything not covered is zeros, followed by a SHA-1
+            out = bytearray(size)
+            pos = 0
+            end = len(data) - 20
+            while pos + 8 <= end:
+                offset, length = struct.unpack_from('>II', data, pos)
+                out[offset:offset + length] = data[pos + 8:pos + 8 + length]
+                pos = pos + 8 + length
+            return bytes(out)
+
+        if compression == COMPRESSION_BZIP2:
+            return bz2.decompress(data)[:size]
+
+        if compression in (COMPRESSION_LZMA, COMPRESSION_LZMA2):
+            # LZMA has 5 bytes of properties (lc/lp/pb and dictionary size), LZMA2 just the dictionary size
+            props = compressor_data[0]
+            if compression == COMPRESSION_LZMA:
+                lzma_filter = {'id': lzma.FILTER_LZMA1, 'dict_size': int.from_bytes(compressor_data[1:5], 'little'),
+                               'lc': props % 9, 'lp': props // 9 % 5, 'pb': props // 45}
+            else:
+                dict_size = 0xFFFFFFFF if props >= 40 else (2 | (props & 1)) << (props // 2 + 11)
+                lzma_filter = {'id': lzma.FILTER_LZMA2, 'dict_size': dict_size}
+            return lzma.LZMADecompressor(lzma.FORMAT_RAW, filters = [lzma_filter]).decompress(data, size)
+    except (lzma.LZMAError, OSError, ValueError, EOFError, IndexError) as e:
+        raise OSError(f"Could not decompress data: {e}") from e
+
+    # Frames aren't required to have their size in them, so decompress as a stream
+    zstd = _zstd_module()
+    try:
+        if hasattr(zstd, 'ZstdDecompressor') and hasattr(zstd.ZstdDecompressor, 'decompressobj'):
+            return zstd.ZstdDecompressor().decompressobj().decompress(data)[:size]
+        return zstd.decompress(data)[:size]
+    except zstd.ZstdError as e:
+        raise OSError(f"Could not decompress data: {e}") from e
+
+def _xor(buf: bytearray, dst: int, src: int, length: int):
+    buf[dst:dst + length] = (int.from_bytes(buf[dst:dst + length], 'big') ^
+                             int.from_bytes(buf[src:src + length], 'big')).to_bytes(length, 'big')
+
+def _lfg_forward(buf: bytearray):
+    _xor(buf, 0, (LFG_K - LFG_J) * 4, LFG_J * 4)
+    # Each word depends on the one LFG_J before it, so go in steps of LFG_J words
+    for i in range(LFG_J, LFG_K, LFG_J):
+        _xor(buf, i * 4, (i - LFG_J) * 4, min(LFG_J, LFG_K - i) * 4)
+
+def _junk(seed: bytes, skip: int, size: int) -> bytes:
+    """
+    Generates the junk data Nintendo discs are padded with, as Dolphin's
+    LaggedFibonacciGenerator does, from a seed stored in an RVZ group.
+
+    Args:
+        seed (bytes): 17 big-endian 32-bit words
+        skip (int): Bytes into the block the data starts at
+        size (int): Bytes to generate
+
+    Raises:
+        OSError: If the seed is the wrong size, from a truncated or corrupt group
+    """
+
+    if len(seed) != LFG_SEED_SIZE * 4:
+        raise OSError(f"Invalid RVZ junk data seed of {len(seed)} bytes")
+    words = list(struct.unpack(f'>{LFG_SEED_SIZE}I', seed))
+    for i in range(LFG_SEED_SIZE, LFG_K):
+        words.append(((words[i - 17] << 23) & 0xFFFFFFFF) ^ (words[i - 16] >> 9) ^ words[i - 1])
+    # Output is every word with bits 16-23 replaced by bits 18-25, big-endian
+    buf = bytearray(struct.pack(f'>{LFG_K}I', *((w & 0xFF00FFFF) | ((w >> 2) & 0x00FF0000) for w in words)))
+    for _ in range(4):
+        _lfg_forward(buf)
+
+    for _ in range(skip // len(buf)):
+        _lfg_forward(buf)
+    pos = skip % len(buf)
+
+    out = bytearray(buf[pos:pos + size])
+    while len(out) < size:
+        _lfg_forward(buf)
+        out += buf[:size - len(out)]
+    return bytes(out)
+
+def _unpack_rvz(data: bytes, size: int, data_offset: int) -> bytes:
+    """
+    Expands an RVZ packed group, a list of runs that are either stored as-is,
+    or stored as a seed for junk data (top bit of the run size set).
+    """
+
+    out = bytearray()
+    pos = 0
+    while len(out) < size and pos + 4 <= len(data):
+        length = int.from_bytes(data[pos:pos + 4], 'big')
+        pos = pos + 4
+        if length & 0x80000000:
+            length = length & 0x7FFFFFFF
+            seed = data[pos:pos + LFG_SEED_SIZE * 4]
+            pos = pos + LFG_SEED_SIZE * 4
+            out += _junk(seed, (data_offset + len(out)) % BLOCK_SIZE, min(length, size - len(out)))
+        else:
+            out += data[pos:pos + length]
+            pos = pos + length
+    return bytes(out[:size])
+
+################################################################################
+
+class IsoReader:
+    """Reads a GameCube disc from a plain .iso/.gcm image."""
+
+    def __init__(self, file_path: str):
+        self.f = open(file_path, 'rb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.f.close()
+
+    def read(self, offset: int, size: int) -> bytes:
+        self.f.seek(offset)
+        return self.f.read(size)
+
+class WiaReader(IsoReader):
+    """
+    Reads a GameCube disc from a WIA or RVZ image. Disc data is stored in
+    groups of 'chunk size' bytes, each compressed on its own, so only the
+    groups that are read from are decompressed. The last few are kept, as
+    reads tend to be close together.
+    """
+
+    def __init__(self, file_path: str):
+        '''
+        Raises:
+            OSError: If the image can't be read, isn't a GameCube disc, or uses
+                compression that isn't available
+        '''
+        super().__init__(file_path)
+        try:
+            self._read_headers()
+        except (struct.error, IndexError) as e:
+            self.close()
+            raise OSError(f"Invalid WIA/RVZ image {file_path}: {e}") from e
+        except OSError:
+            self.close()
+            raise
+        self.chunks = {}
+        """Dictionary of recently decompressed groups, with group index as key."""
+
+    def _read_headers(self):
+        magic, _, _, disc_size, _, self.iso_size, _, _ = FILE_HEAD.unpack(self.f.read(FILE_HEAD.size))
+        if magic not in (WIA_MAGIC, RVZ_MAGIC):
+            raise OSError("Not a WIA or RVZ image")
+        self.rvz = magic == RVZ_MAGIC
+
+        (disc_type, self.compression, _, self.chunk_size, self.disc_header, n_partitions, _, _, _,
+         n_raw_data, raw_data_offset, raw_data_size, n_groups, group_offset, group_size,
+         compressor_data_size, compressor_data) = DISC.unpack(self.f.read(disc_size).ljust(DISC.size, b'\0')[:DISC.size])
+        self.compressor_data = compressor_data[:compressor_data_size]
+
+        if disc_type != GAMECUBE_DISC or n_partitions:
+            raise OSError("Not a GameCube disc")
+        if not can_decompress(self.compression):
+            raise OSError(f"Unsupported WIA/RVZ compression type {self.compression}")
+
+        raw_data = self._decompress_at(raw_data_offset, raw_data_size, n_raw_data * RAW_DATA.size, self.compression)
+        self.raw_data = sorted(RAW_DATA.iter_unpack(raw_data[:n_raw_data * RAW_DATA.size]))
+        """List of (disc offset, size, first group index, number of groups) for each run of disc data, in disc order."""
+
+        group_struct = RVZ_GROUP if self.rvz else WIA_GROUP
+        groups = self._decompress_at(group_offset, group_size, n_groups * group_struct.size, self.compression)
+        self.groups = [g if self.rvz else g + (0,) for g in group_struct.iter_unpack(groups[:n_groups * group_struct.size])]
+        """List of (file offset / 4, stored size, RVZ packed size) for each group."""
+
+    def _decompress_at(self, offset: int, stored_size: int, size: int, compression: int) -> bytes:
+        self.f.seek(offset)
+        return _decompress(self.f.read(stored_size), size, compression, self.compressor_data)
+
+    def _chunk(self, index: int, size: int, data_offset: int) -> bytes:
+        """Decompresses a group, which holds size bytes starting data_offset bytes into its run of disc data."""
+
+        if (chunk := self.chunks.get(index)) is not None:
+            return chunk
+
+        offset, stored_size, packed_size = self.groups[index]
+        compression = self.compression
+        if self.rvz:
+            # RVZ only compresses groups that got smaller for it
+            if not stored_size & 0x80000000:
+                compression = COMPRESSION_NONE
+            stored_size = stored_size & 0x7FFFFFFF
+
+        if stored_size == 0:
+            chunk = bytes(size)
+        else:
+            chunk = self._decompress_at(offset << 2, stored_size, packed_size or size, compression)
+            if packed_size:
+                chunk = _unpack_rvz(chunk, size, data_offset)
+
+        if len(self.chunks) >= MAX_CACHED_CHUNKS:
+            del self.chunks[next(iter(self.chunks))]
+        self.chunks[index] = chunk
+        return chunk
+
+    def read(self, offset: int, size: int) -> bytes:
+        size = max(min(size, self.iso_size - offset), 0)
+        out = bytearray()
+        if offset < DISC_HEADER_SIZE and size:
+            out += self.disc_header[offset:offset + size]
+            offset, size = offset + len(out), size - len(out)
+
+        while size > 0:
+            # The run of disc data the offset is in
+            entry = next((r for r in self.raw_data if r[0] + r[1] > offset), None)
+            if entry is None:
+                break
+            data_offset, data_size, group_index, n_groups = entry
+            data_size = data_size + data_offset % BLOCK_SIZE
+            data_offset = data_offset - data_offset % BLOCK_SIZE
+
+            i = (offset - data_offset) // self.chunk_size
+            if i >= n_groups or group_index + i >= len(self.groups):
+                raise OSError(f"Disc offset {offset:#x} is missing from image")
+            group_start = i * self.chunk_size
+            group_size = min(self.chunk_size, data_size - group_start)
+            chunk = self._chunk(group_index + i, group_size, group_start)
+
+            in_group = offset - data_offset - group_start
+            length = min(group_size - in_group, size)
+            out += chunk[in_group:in_group + length]
+            offset, size = offset + length, size - length
+        return bytes(out)
+
+################################################################################
+
+def can_decompress(compression: int) -> bool:
+    """Checks if a WIA/RVZ compression type can be read, Zstandard needs Python 3.14+ or the optional 'zstandard' module."""
+
+    if compression == COMPRESSION_ZSTD:
+        return _zstd_module() is not None
+    return COMPRESSION_NONE <= compression <= COMPRESSION_LZMA2
+
+def is_wia(file_path: str) -> bool:
+    return file_path.casefold().endswith(('.wia', '.rvz'))
+
+def can_read(file_path: str) -> bool:
+    """Checks if a disc image can be read, which for WIA/RVZ depends on the compression used."""
+
+    if not is_wia(file_path):
+        return True
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(FILE_HEAD.size + DISC.size)
+        if head[:4] not in (WIA_MAGIC, RVZ_MAGIC):
+            return False
+        disc_type, compression = struct.unpack_from('>II', head, FILE_HEAD.size)
+    except (OSError, struct.error):
+        return False
+    return disc_type == GAMECUBE_DISC and can_decompress(compression)
+
+def open_disc(file_path: str):
+    '''
+    Opens a GameCube disc image (.iso/.gcm, or .wia/.rvz).
+
+    Returns:
+        Reader with read(offset, size), for the disc as if it were a plain image
+
+    Raises:
+        OSError: If the image can't be read
+    '''
+    return WiaReader(file_path) if is_wia(file_path) else IsoReader(file_path)
@@ -1,21 +1,36 @@
-import os.path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+import logging as log
+import os
 import re
 import subprocess
 
+from .. import metrics
+from . import native
+from . import shared
+
 ################################################################################
 
 rahasher_path = ''
 dtool_path = ''
+use_native = True
+"""If True, files for systems supported by the native module are hashed in-process instead of with RAHasher."""
+verify_native = False
+"""If True, native hashes are checked against RAHasher as well, and any mismatches logged."""
+use_shared = False
+"""If True, hashes are looked up in and added to the shared hash cache."""
 
 ################################################################################
 
-def init(hasher: str, dtool: str):
+def init(hasher: str, dtool: str, native_hashing: bool = True, verify: bool = False):
     '''
     Initializes the module
     
     Args:
         hasher (str): Path to RAHasher.exe
         dtool (str): Path to DolphinTool.exe
+        native_hashing (bool): Hash supported cartridge and disc systems in-process
+        verify (bool): Check native hashes against RAHasher, see verify_native_hash
     '''
 
     # TODO: Validate that hasher path appears correct
@@ -26,27 +41,210 @@ def init(hasher: str, dtool: str):
     global dtool_path
     dtool_path = dtool
 
+    global use_native, verify_native
+    use_native = native_hashing
+    verify_native = verify
+
     return 0
 
+def init_shared_cache(directory: str, local_file: str) -> bool:
+    '''
+    Enables the shared hash cache for calculate_hashes, so files hashed by any
+    machine using the same shared directory aren't hashed again.
+
+    Args:
+        directory (str): Shared cache directory, i.e. on a network share
+        local_file (str): Path to JSON file for the local copy of the cache
+
+    Returns:
+        False if the shared directory can't be reached, see shared.init
+    '''
+    global use_shared
+    use_shared = True
+    return shared.init(directory, local_file)
+
 ################################################################################
 
-def calculate_hash(system: int, file_path: str) -> str:
+def calculate_hash(system: int, file_path: str, timeout: float = None) -> str:
     '''
     Calculate hash
+
+    Args:
+        system (int): RetroAchievements console ID
+        file_path (str): Path to file to hash
+        timeout (float): Seconds to wait for the hasher before giving up, or
+            None to wait forever
+
+    Files that can't be hashed natively (i.e. a disc layout the native
+    module doesn't handle) are hashed with RAHasher instead.
     '''
+    if use_native and native.supports(system, file_path):
+        try:
+            result = native.calculate_hash(system, file_path)
+        except OSError as e:
+            log.info(f"Native hashing failed for {file_path}, using RAHasher instead: {e}")
+            metrics.count('hashes_native_fallback')
+        else:
+            metrics.count('hashes_native')
+            if verify_native:
+                verify_native_hash(system, file_path, timeout, result)
+            return result
+
+    return _calculate_external_hash(system, file_path, timeout)
+
+def _calculate_external_hash(system: int, file_path: str, timeout: float = None) -> str:
+    """Calculate hash with RAHasher, or DolphinTool for GameCube, returning 0 on failure."""
+
     result = 0
 
     if system == 16:
         if not os.path.exists(dtool_path):
             return 0
-        r = subprocess.run([dtool_path, 'verify', '-i', file_path, '-a' , 'rchash'], capture_output=True, text=True)
-        h = r.stdout.strip()
-        if re.findall(r"([a-fA-F\d]{32})", h):
-            result = h
+        args = [dtool_path, 'verify', '-i', file_path, '-a' , 'rchash']
+    else:
+        args = [rahasher_path, str(system), file_path]
+
+    try:
+        r = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        log.warning(f"Hashing timed out after {timeout}s: {file_path}")
+        metrics.count('hashes_timed_out')
+        return 0
+
+    h = r.stdout.strip()
+    if re.findall(r"([a-fA-F\d]{32})", h):
+        result = h
+        metrics.count('hashes_external')
     else:
-        r = subprocess.run([rahasher_path, str(system), file_path], capture_output=True, text=True)
-        h = r.stdout.strip()
-        if re.findall(r"([a-fA-F\d]{32})", h):
-            result = h
+        metrics.count('hashes_failed')
     
     return result
+
+def calculate_all_hashes(system: int, file_path: str, timeout: float = None) -> list:
+    '''
+    Calculate hashes for every ROM in a file. For archives that can be hashed
+    natively, this is every ROM in the archive, read in a single pass.
+    Otherwise it's the same as calculate_hash.
+
+    Returns:
+        List of hashes, the first being what calculate_hash returns, or an
+        empty list on failure
+    '''
+    if use_native and native.supports(system, file_path) and native.is_archive(file_path):
+        try:
+            result = list(native.hash_archive(system, file_path).values())
+        except OSError as e:
+            log.info(f"Native hashing failed for {file_path}, using RAHasher instead: {e}")
+            metrics.count('hashes_native_fallback')
+            h = _calculate_external_hash(system, file_path, timeout)
+            return [h] if h else []
+        metrics.count('hashes_native')
+        metrics.count('archive_members_hashed', len(result))
+        return result
+
+    h = calculate_hash(system, file_path, timeout)
+    return [h] if h else []
+
+################################################################################
+
+def verify_native_hash(system: int, file_path: str, timeout: float = None, h_native: str = None) -> bool:
+    '''
+    Checks that the native hash for a file matches the one from RAHasher.
+
+    Args:
+        h_native (str): Native hash if already calculated, otherwise it's
+            calculated here
+
+    Returns True if they match, or if the file can't be hashed natively.
+    '''
+    if not native.supports(system, file_path):
+        return True
+
+    if h_native is None:
+        h_native = native.calculate_hash(system, file_path)
+    h_rahasher = _calculate_external_hash(system, file_path, timeout)
+
+    if str(h_native).casefold() != str(h_rahasher).casefold():
+        log.warning(f"Native hash mismatch for {file_path}: {h_native} (RAHasher {h_rahasher})")
+        metrics.count('native_hash_mismatches')
+        return False
+    return True
+
+################################################################################
+
+def _calculate_shared(func, all_hashes: bool, system: int, file_path: str, timeout: float = None):
+    '''
+    Wraps a hash function for calculate_hashes, returning hashes from the
+    shared cache if there are any, and adding new ones to it.
+    '''
+    # Archives only have every ROM hashed with all_hashes, so entries with just the first aren't shared
+    k = shared.key(system, file_path) if all_hashes or not native.is_archive(file_path) else None
+    if (hashes := shared.lookup(k)):
+        return hashes if all_hashes else hashes[0]
+
+    h = func(system, file_path, timeout)
+    shared.store(k, h if all_hashes else [h] if h else [])
+    return h
+
+def calculate_hashes(jobs, workers: int = None, timeout: float = None, all_hashes: bool = False):
+    '''
+    Calculate hashes for many files at once, on a bounded pool of worker
+    threads (each hash is a separate hasher process, so threads are enough).
+
+    Results are yielded as each job finishes, not in the order given. Jobs are
+    only submitted as workers free up, so 'jobs' can be a lazy iterable.
+
+    Args:
+        jobs (iterable): (system, file_path) tuples to hash
+        workers (int): Maximum number of hashes to run at once, or None to use
+            the number of CPUs
+        timeout (float): Seconds to wait for each hash before giving up, or
+            None to wait forever
+        all_hashes (bool): If True, hash every ROM in archives with
+            calculate_all_hashes, and yield lists of hashes instead
+
+    Yields:
+        ((system, file_path), hash) tuples, with hash being 0 on failure (or
+        an empty list, if all_hashes is set)
+    '''
+    func = calculate_all_hashes if all_hashes else calculate_hash
+    failed = [] if all_hashes else 0
+
+    if use_shared:
+        shared.refresh()
+        func = partial(_calculate_shared, func, all_hashes)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    jobs = iter(jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+
+            def submit(n: int):
+                for job in jobs:
+                    pending[pool.submit(func, job[0], job[1], timeout)] = job
+                    n = n - 1
+                    if n <= 0:
+                        break
+
+            submit(workers * 2)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    job = pending.pop(f)
+                    try:
+                        h = f.result()
+                    except Exception as e:
+                        # One bad file shouldn't stop the rest of the library being hashed
+                        log.warning(f"Hashing failed for {job[1]}: {e!r}")
+                        metrics.count('hashes_failed')
+                        h = failed
+                    yield job, h
+                submit(len(done))
+    finally:
+        # Write out anything hashed for the shared cache, even if stopped early
+        if use_shared:
+            shared.flush()
+            shared.save()
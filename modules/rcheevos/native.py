@@ -0,0 +1,448 @@
+    # Pure-Python versions of the RetroAchievements hash methods, based on
+    # https://github.com/RetroAchievements/rcheevos/blob/develop/src/rhash/hash.c
+
+from array import array
+from functools import partial
+import hashlib
+import lzma
+import mmap
+import os
+import re
+import struct
+import zipfile
+import zlib
+
+from . import disc
+from . import gamecube
+
+################################################################################
+
+MAX_BUFFER_SIZE = 64 * 1024 * 1024
+"""Largest amount of a file that rcheevos will hash for whole-file methods."""
+
+MAX_HEADER_SIZE = 512
+"""Largest header any hash method skips, archive members are read up to MAX_BUFFER_SIZE past this."""
+
+UNSUPPORTED_EXTENSIONS = ('.m3u', '.cue', '.chd')
+"""File types the native cartridge hashers don't handle, these are left to RAHasher (or the disc hashers)."""
+
+DISC_EXTENSIONS = ('.cue', '.iso', '.bin', '.img')
+"""Disc image types the native disc hashers read, see the disc module."""
+
+GAMECUBE_EXTENSIONS = ('.iso', '.gcm', '.wia', '.rvz')
+"""GameCube disc image types the native GameCube hasher reads, see the gamecube module."""
+
+ARCHIVE_EXTENSIONS = ('.zip', '.7z')
+"""Archive types that ROMs are hashed from directly, without extracting to disk."""
+
+SKIPPED_MEMBER_EXTENSIONS = ('.txt', '.nfo', '.diz', '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.htm', '.html', '.xml', '.sfv', '.md5')
+"""Archive members that are never ROMs, and are skipped when looking for ROMs to hash."""
+
+################################################################################
+
+def _map_file(file_path: str):
+    """
+    Opens a file for hashing, returning a (file, buffer) tuple where buffer is
+    memory-mapped, or empty bytes for empty files (which can't be mapped).
+    """
+
+    f = open(file_path, 'rb')
+    if os.fstat(f.fileno()).st_size == 0:
+        return f, b''
+    return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _md5(buf, skip: int = 0) -> str:
+    """MD5 of a buffer after skipping a header, capped at MAX_BUFFER_SIZE."""
+
+    with memoryview(buf) as view:
+        return hashlib.md5(view[skip:skip + MAX_BUFFER_SIZE]).hexdigest()
+
+################################################################################
+
+def hash_whole_file(buf, size: int) -> str:
+    return _md5(buf)
+
+def hash_nes(buf, size: int) -> str:
+    """NES/Famicom - skips iNES or fwNES (FDS) headers."""
+
+    if buf[:4] in (b'NES\x1a', b'FDS\x1a'):
+        return _md5(buf, 16)
+    return _md5(buf)
+
+def hash_snes(buf, size: int) -> str:
+    """SNES - skips 512 byte copier header if file size suggests there is one."""
+
+    if size % 0x2000 == 512:
+        return _md5(buf, 512)
+    return _md5(buf)
+
+def hash_pce(buf, size: int) -> str:
+    """PC Engine - skips 512 byte copier header if file size suggests there is one."""
+
+    if size % 0x20000 == 512:
+        return _md5(buf, 512)
+    return _md5(buf)
+
+def hash_lynx(buf, size: int) -> str:
+    """Atari Lynx - skips 64 byte LNX header."""
+
+    if buf[:5] == b'LYNX\0':
+        return _md5(buf, 64)
+    return _md5(buf)
+
+def hash_7800(buf, size: int) -> str:
+    """Atari 7800 - skips 128 byte A78 header."""
+
+    if buf[1:10] == b'ATARI7800':
+        return _md5(buf, 128)
+    return _md5(buf)
+
+def hash_n64(buf, size: int) -> str:
+    """Nintendo 64 - converts .v64 (byte-swapped) and .n64 (little-endian) to big-endian first."""
+
+    header = buf[:4]
+    if header[:2] == b'\x80\x37' or header == b'\xe8\x48\x12\x37':
+        return _md5(buf)
+
+    if header[:2] == b'\x37\x80':
+        item = 'H'
+    elif header == b'\x40\x12\x37\x80':
+        item = 'I'
+    else:
+        # rcheevos rejects these, so RAHasher gets to report it
+        raise OSError("Not a Nintendo 64 ROM")
+
+    md5 = hashlib.md5()
+    with memoryview(buf) as view:
+        end = min(len(view), MAX_BUFFER_SIZE)
+        for pos in range(0, end, 1024 * 1024):
+            chunk = view[pos:min(pos + 1024 * 1024, end)]
+            data = array(item)
+            usable = len(chunk) - len(chunk) % data.itemsize
+            data.frombytes(chunk[:usable])
+            data.byteswap()
+            md5.update(data)
+            md5.update(chunk[usable:])
+    return md5.hexdigest()
+
+################################################################################
+
+HASHERS = {
+    1:  hash_whole_file,    # Genesis/Mega Drive
+    2:  hash_n64,           # Nintendo 64
+    3:  hash_snes,          # SNES/Super Famicom
+    4:  hash_whole_file,    # Game Boy
+    5:  hash_whole_file,    # Game Boy Advance
+    6:  hash_whole_file,    # Game Boy Color
+    7:  hash_nes,           # NES/Famicom
+    8:  hash_pce,           # PC Engine/TurboGrafx-16
+    10: hash_whole_file,    # 32X
+    11: hash_whole_file,    # Master System
+    13: hash_lynx,          # Atari Lynx
+    14: hash_whole_file,    # Neo Geo Pocket
+    15: hash_whole_file,    # Game Gear
+    17: hash_whole_file,    # Atari Jaguar
+    23: hash_whole_file,    # Magnavox Odyssey 2
+    24: hash_whole_file,    # Pokemon Mini
+    25: hash_whole_file,    # Atari 2600
+    28: hash_whole_file,    # Virtual Boy
+    33: hash_whole_file,    # SG-1000
+    44: hash_whole_file,    # ColecoVision
+    45: hash_whole_file,    # Intellivision
+    46: hash_whole_file,    # Vectrex
+    51: hash_7800,          # Atari 7800
+    53: hash_whole_file,    # WonderSwan
+    57: hash_whole_file,    # Fairchild Channel F
+    63: hash_whole_file,    # Watara Supervision
+    69: hash_whole_file,    # Mega Duck
+    73: hash_whole_file,    # Arcadia 2001
+    74: hash_whole_file,    # Interton VC 4000
+}
+"""Native hash methods for cartridge-based systems, with RA console ID as key."""
+
+################################################################################
+
+def _hash_cd_file(md5, track, sector: int, size: int):
+    """
+    Adds a file on a disc to a hash, capped at MAX_BUFFER_SIZE. Like rcheevos,
+    at least the whole first sector is hashed, even for smaller files.
+    """
+
+    data = track.read(sector)
+    if len(data) < disc.SECTOR_DATA_SIZE:
+        raise OSError(f"Could not read file at sector {sector}")
+    md5.update(data)
+
+    size = min(size, MAX_BUFFER_SIZE)
+    if size > disc.SECTOR_DATA_SIZE:
+        md5.update(track.read(sector + 1, size - disc.SECTOR_DATA_SIZE))
+
+def _find_playstation_executable(track, boot_key: bytes, cdrom_prefix: bytes) -> tuple:
+    """
+    Finds the boot executable named in SYSTEM.CNF (i.e. 'BOOT = cdrom:\\SLUS_000.01;1').
+
+    Returns:
+        (executable name, sector, size) tuple, with sector 0 if not found, and
+        name None if the disc has no SYSTEM.CNF
+    """
+
+    sector, _ = disc.find_file_sector(track, 'SYSTEM.CNF')
+    if not sector:
+        return None, 0, 0
+
+    cnf = track.read(sector, disc.SECTOR_DATA_SIZE - 1).split(b'\0', 1)[0]
+    for line in cnf.split(b'\n'):
+        if not line.startswith(boot_key):
+            continue
+        value = line[len(boot_key):].lstrip()
+        if value[:1] != b'=':
+            continue
+        value = value[1:].lstrip()
+        if value.startswith(cdrom_prefix):
+            value = value[len(cdrom_prefix):]
+        exe_name = re.match(rb'[^\s;]*', value.lstrip(b'\\'))[0][:63]
+        sector, size = disc.find_file_sector(track, exe_name.decode('latin-1'))
+        return exe_name, sector, size
+    return b'', 0, 0
+
+def hash_psx(track) -> str:
+    """PlayStation - boot executable name and contents, including its PS-X EXE header."""
+
+    exe_name, sector, size = _find_playstation_executable(track, b'BOOT', b'cdrom:')
+    if exe_name is None:
+        # Discs without a SYSTEM.CNF boot PSX.EXE, a SYSTEM.CNF without a BOOT line doesn't
+        sector, size = disc.find_file_sector(track, 'PSX.EXE')
+        exe_name = b'PSX.EXE'
+    if not sector:
+        raise OSError("Could not locate primary executable")
+
+    header = track.read(sector, 32)
+    if len(header) < 32:
+        raise OSError("Could not read primary executable")
+    if header[:7] == b'PS-X EX':
+        # The size in the header doesn't include the header itself
+        size = int.from_bytes(header[28:32], 'little') + 2048
+
+    md5 = hashlib.md5(exe_name)
+    _hash_cd_file(md5, track, sector, size)
+    return md5.hexdigest()
+
+def hash_ps2(track) -> str:
+    """PlayStation 2 - boot executable name and contents."""
+
+    exe_name, sector, size = _find_playstation_executable(track, b'BOOT2', b'cdrom0:')
+    if not sector:
+        raise OSError("Could not locate primary executable")
+
+    md5 = hashlib.md5(exe_name)
+    _hash_cd_file(md5, track, sector, size)
+    return md5.hexdigest()
+
+def hash_sega_cd(track) -> str:
+    """Sega CD/Saturn - volume and ROM headers at the start of the disc."""
+
+    header = track.read(0, 512)
+    if header[:16] not in (b'SEGADISCSYSTEM  ', b'SEGA SEGASATURN '):
+        raise OSError("Not a Sega CD")
+    return hashlib.md5(header).hexdigest()
+
+def hash_pce_cd(track) -> str:
+    """PC Engine CD - disc title and boot program from the header sector, or BOOT.BIN for GameExpress discs."""
+
+    header = track.read(track.first_sector + 1, 128)
+    if len(header) < 128:
+        raise OSError("Not a PC Engine CD")
+
+    if header[32:55] == b'PC Engine CD-ROM SYSTEM':
+        # The title is the last 22 bytes of the header, followed by the program sectors it gives
+        md5 = hashlib.md5(header[106:128])
+        sector = int.from_bytes(header[0:3], 'big') + track.first_sector
+        data = track.read(sector, header[3] * disc.SECTOR_DATA_SIZE)
+        if len(data) < header[3] * disc.SECTOR_DATA_SIZE:
+            raise OSError("Could not read boot program")
+        md5.update(data)
+        return md5.hexdigest()
+
+    sector, size = disc.find_file_sector(track, 'BOOT.BIN')
+    if not sector or size >= MAX_BUFFER_SIZE:
+        raise OSError("Not a PC Engine CD")
+    md5 = hashlib.md5()
+    _hash_cd_file(md5, track, sector, size)
+    return md5.hexdigest()
+
+def hash_gamecube(image) -> str:
+    """GameCube - disc header and apploader, then the code and data sections of the boot DOL."""
+
+    if image.read(0x1c, 4) != b'\xc2\x33\x9f\x3d':
+        raise OSError("Not a GameCube disc")
+
+    # The apploader follows the 0x2440 byte disc header, with a 0x20 byte header of its own
+    sizes = image.read(0x2440 + 0x14, 8)
+    if len(sizes) < 8:
+        raise OSError("Could not read apploader")
+    body_size, trailer_size = struct.unpack('>II', sizes)
+    header = image.read(0, min(0x2440 + 0x20 + body_size + trailer_size, 1024 * 1024))
+    md5 = hashlib.md5(header)
+
+    # The DOL starts with the file offsets of its 7 code and 11 data sections, with their sizes at 0x90
+    dol_offset = int.from_bytes(header[0x420:0x424], 'big')
+    dol_header = image.read(dol_offset, 0xD8)
+    if len(dol_header) < 0xD8:
+        raise OSError("Could not read boot DOL")
+    offsets = struct.unpack_from('>18I', dol_header, 0)
+    sizes = struct.unpack_from('>18I', dol_header, 0x90)
+    for offset, size in zip(offsets, sizes):
+        if size:
+            data = image.read(dol_offset + offset, size)
+            if len(data) < size:
+                raise OSError("Could not read boot DOL")
+            md5.update(data)
+    return md5.hexdigest()
+
+_open_first_track = partial(disc.open_track, number = 1)
+_open_data_track = partial(disc.open_track, number = disc.FIRST_DATA_TRACK)
+
+DISC_HASHERS = {
+    8:  (hash_pce_cd,    _open_data_track,   ('.cue',)),             # PC Engine/TurboGrafx-16, CD images
+    9:  (hash_sega_cd,   _open_first_track,  DISC_EXTENSIONS),       # Sega CD
+    12: (hash_psx,       _open_first_track,  DISC_EXTENSIONS),       # PlayStation
+    16: (hash_gamecube,  gamecube.open_disc, GAMECUBE_EXTENSIONS),   # GameCube
+    21: (hash_ps2,       _open_first_track,  DISC_EXTENSIONS),       # PlayStation 2
+    39: (hash_sega_cd,   _open_first_track,  DISC_EXTENSIONS),       # Sega Saturn
+    76: (hash_pce_cd,    _open_data_track,   ('.cue',)),             # PC Engine CD/TurboGrafx-CD
+}
+"""Native hash methods for disc-based systems as (method, open function, extensions) tuples, with RA console ID as key."""
+
+################################################################################
+
+def is_archive(file_path: str) -> bool:
+    return file_path.casefold().endswith(ARCHIVE_EXTENSIONS)
+
+def _has_7z_support() -> bool:
+    """Checks if the optional 'py7zr' module is installed, with the read() API used here."""
+
+    try:
+        import py7zr
+    except ImportError:
+        return False
+    return hasattr(py7zr.SevenZipFile, 'read')
+
+def _is_rom_member(name: str) -> bool:
+    return not name.endswith('/') and not name.casefold().endswith(SKIPPED_MEMBER_EXTENSIONS)
+
+def iter_archive(archive_path: str, members=None):
+    """
+    Reads ROMs from a .zip or .7z archive straight into memory, without
+    extracting anything to disk. Each member is read once, up to the most any
+    hash method would use.
+
+    .7z archives need the optional 'py7zr' module, and are decompressed in a
+    single pass for all members, as solid archives can't be read out of order.
+
+    Args:
+        archive_path (str): Path to archive
+        members (iterable): Member names to read, or None for all ROM members
+
+    Yields:
+        (member name, buffer, full member size) tuples, in archive order
+
+    Raises:
+        OSError: If the archive can't be read
+    """
+
+    limit = MAX_BUFFER_SIZE + MAX_HEADER_SIZE
+    if members is not None:
+        members = set(members)
+
+    def wanted(name: str) -> bool:
+        return _is_rom_member(name) if members is None else name in members
+
+    if archive_path.casefold().endswith('.zip'):
+        try:
+            with zipfile.ZipFile(archive_path) as z:
+                for info in z.infolist():
+                    if info.is_dir() or not wanted(info.filename):
+                        continue
+                    with z.open(info) as f:
+                        yield info.filename, f.read(limit), info.file_size
+        # bz2 errors are already OSErrors, zlib/lzma decompression errors aren't
+        except (zipfile.BadZipFile, NotImplementedError, RuntimeError, EOFError, zlib.error, lzma.LZMAError) as e:
+            raise OSError(f"Could not read archive {archive_path}: {e}") from e
+        return
+
+    import py7zr
+    try:
+        with py7zr.SevenZipFile(archive_path, 'r') as z:
+            infos = [i for i in z.list() if not i.is_directory and wanted(i.filename)]
+            if not infos:
+                return
+            data = z.read([i.filename for i in infos])
+    except (py7zr.exceptions.ArchiveError, py7zr.exceptions.PasswordRequired, EOFError, zlib.error, lzma.LZMAError) as e:
+        raise OSError(f"Could not read archive {archive_path}: {e}") from e
+    for i in infos:
+        if (f := data.get(i.filename)) is not None:
+            yield i.filename, f.read(limit), i.uncompressed
+
+def hash_archive(system: int, archive_path: str, members=None) -> dict:
+    """
+    Hashes ROMs in an archive in a single pass, see iter_archive.
+
+    Returns:
+        Dictionary of hashes, with member name as key, in archive order
+    """
+
+    hasher = HASHERS[system]
+    return {name: hasher(buf, size) for name, buf, size in iter_archive(archive_path, members)}
+
+################################################################################
+
+def _disc_hasher(system: int, file_path: str) -> tuple:
+    if (d := DISC_HASHERS.get(system)) and file_path.casefold().endswith(d[2]):
+        return d
+    return None
+
+def supports(system: int, file_path: str) -> bool:
+    """Checks if a file can be hashed natively, rather than needing RAHasher."""
+
+    if (d := _disc_hasher(system, file_path)):
+        # WIA/RVZ images can use compression that needs an optional module
+        return gamecube.can_read(file_path) if d[0] is hash_gamecube else True
+    if system not in HASHERS:
+        return False
+    if file_path.casefold().endswith('.7z'):
+        return _has_7z_support()
+    return not file_path.casefold().endswith(UNSUPPORTED_EXTENSIONS)
+
+def calculate_hash(system: int, file_path: str) -> str:
+    """
+    Calculate hash for a file in-process. For archives, the first ROM in the
+    archive is hashed, the same as emulators that load ROMs from archives.
+    Disc images only have the parts the hash method needs read.
+
+    Args:
+        system (int): RetroAchievements console ID, must be supported (see supports)
+        file_path (str): Path to file to hash
+
+    Returns:
+        Hash, or 0 if an archive has no ROMs in it
+
+    Raises:
+        OSError: If the file can't be read, or isn't a disc for the system
+    """
+
+    if (d := _disc_hasher(system, file_path)):
+        with d[1](file_path) as image:
+            return d[0](image)
+
+    if is_archive(file_path):
+        for _, buf, size in iter_archive(file_path):
+            return HASHERS[system](buf, size)
+        return 0
+
+    f, buf = _map_file(file_path)
+    with f:
+        try:
+            return HASHERS[system](buf, len(buf))
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
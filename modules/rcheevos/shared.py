@@ -0,0 +1,268 @@
+import json
+import logging as log
+import os
+import threading
+import time
+import uuid
+
+from .. import metrics
+
+################################################################################
+
+LOG_NAME = 'hashes.jsonl'
+"""Shared hash log, one JSON record per line, only ever appended to."""
+LOCK_NAME = 'hashes.lock'
+"""Lock directory for writers, creating a directory is atomic even on network shares."""
+
+LOCK_TIMEOUT = 30.0
+"""Seconds to wait for another writer before giving up on a write."""
+LOCK_STALE = 120.0
+"""Seconds after which a lock is assumed to be left over from a writer that crashed."""
+FLUSH_SIZE = 64
+"""Hashes buffered before they're written to the shared log."""
+
+shared_dir = None
+"""Directory of the shared cache, or None if not enabled."""
+local_path = ''
+local = {}
+"""Local copy of the shared log: {'source': log path, 'offset': bytes read, 'hashes': {key: [hashes]}}."""
+pending = []
+"""Records not written to the shared log yet."""
+_lock = threading.Lock()
+
+################################################################################
+
+def init(directory: str, local_file: str) -> bool:
+    '''
+    Initializes the shared hash cache, loading the local copy and reading
+    anything other machines added to the shared log since it was last read.
+
+    The local copy means lookups never touch the share, and hashes already
+    read stay available if the share can't be reached.
+
+    Args:
+        directory (str): Shared cache directory, i.e. on a network share
+        local_file (str): Path to JSON file for the local copy
+
+    Returns:
+        False if the shared directory can't be reached, in which case only
+        the local copy is used
+    '''
+    global shared_dir, local_path, local
+    shared_dir = directory
+    local_path = local_file
+
+    log_path = os.path.join(shared_dir, LOG_NAME)
+    local = {}
+    if os.path.exists(local_path):
+        with open(local_path, encoding='utf-8') as f:
+            local = json.load(f)
+    if local.get('source') != log_path:
+        local = {'source': log_path, 'offset': 0, 'hashes': {}}
+
+    if not os.path.isdir(shared_dir):
+        log.warning(f"Shared hash cache directory not found, only using local copy: {shared_dir}")
+        return False
+    refresh()
+    return True
+
+def key(system: int, file_path: str) -> str:
+    '''
+    Builds the shared cache key for a file - the console ID it's hashed as,
+    and the file name, size and modified time, which are the same from every
+    machine that sees the file, unlike its full path.
+
+    Returns None if the file doesn't exist.
+    '''
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    # Whole seconds, as network filesystems don't all report the same precision
+    return f"{system}:{st.st_size}:{st.st_mtime_ns // 1_000_000_000}:{os.path.basename(file_path)}"
+
+################################################################################
+
+def refresh() -> int:
+    '''
+    Reads records added to the shared log since it was last read.
+
+    Returns:
+        Number of records read
+    '''
+    log_path = local['source']
+    try:
+        with open(log_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < local['offset']:
+                # The log was replaced, so start over
+                log.debug(f"Shared hash log is smaller than last read, reading it all again")
+                local.update(offset = 0, hashes = {})
+            f.seek(local['offset'])
+            data = f.read()
+    except FileNotFoundError:
+        return 0
+    except OSError as e:
+        log.warning(f"Could not read shared hash cache: {e}")
+        return 0
+
+    # Only read up to the last complete line, another machine may be partway through writing
+    end = data.rfind(b'\n') + 1
+    count = 0
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+            local['hashes'][record['k']] = record['h']
+        except (ValueError, KeyError, TypeError):
+            log.debug(f"Skipping damaged shared hash record: {line[:100]}")
+            continue
+        count = count + 1
+    local['offset'] = local['offset'] + end
+    metrics.count('shared_cache_records_read', count)
+    return count
+
+def lookup(k: str) -> list:
+    '''
+    Returns the cached hashes for a key, or None.
+    '''
+    if k is None:
+        return None
+    with _lock:
+        hashes = local['hashes'].get(k)
+    metrics.count('shared_cache_hits' if hashes else 'shared_cache_misses')
+    return hashes
+
+def store(k: str, hashes: list):
+    '''
+    Stores hashes for a key locally, and queues them to be written to the
+    shared log. Safe to call from worker threads.
+    '''
+    if k is None or not hashes:
+        return
+    with _lock:
+        local['hashes'][k] = hashes
+        pending.append({'k': k, 'h': hashes})
+        full = len(pending) >= FLUSH_SIZE
+    if full:
+        flush()
+
+################################################################################
+
+def _acquire(lock_path: str) -> os.stat_result:
+    '''
+    Takes the writer lock, removing it first if it's stale.
+
+    Returns:
+        Stat of the lock directory, to pass to _release, or None if it timed out
+    '''
+    start = time.monotonic()
+    while True:
+        try:
+            os.mkdir(lock_path)
+            return os.stat(lock_path)
+        except FileExistsError:
+            pass
+        try:
+            st = os.stat(lock_path)
+            if time.time() - st.st_mtime > LOCK_STALE:
+                log.warning(f"Removing stale shared hash cache lock: {lock_path}")
+                _release(lock_path, st)
+                continue
+        except OSError:
+            continue
+        if time.monotonic() - start > LOCK_TIMEOUT:
+            return None
+        time.sleep(0.05)
+
+def _release(lock_path: str, st: os.stat_result) -> bool:
+    '''
+    Removes the writer lock, but only if it's still the lock directory 'st'
+    is for. It's renamed aside first, which only one machine can do, then
+    checked, so a lock another writer has taken since is never removed.
+
+    Returns:
+        True if the lock was removed
+    '''
+    aside = f"{lock_path}.{uuid.uuid4().hex}"
+    try:
+        os.rename(lock_path, aside)
+    except OSError:
+        return False
+    try:
+        st_aside = os.stat(aside)
+        if (st_aside.st_ino, st_aside.st_mtime_ns) != (st.st_ino, st.st_mtime_ns):
+            # Another writer took the lock since, so put it back
+            os.rename(aside, lock_path)
+            return False
+        os.rmdir(aside)
+    except OSError as e:
+        log.warning(f"Could not remove shared hash cache lock: {e}")
+        return False
+    return True
+
+def flush() -> int:
+    '''
+    Writes queued records to the shared log, under the writer lock and as a
+    single append, so records from different machines never interleave. The
+    local copy isn't saved, see save.
+
+    Returns:
+        Number of records written, records are kept queued if the shared log
+        can't be written to
+    '''
+    if shared_dir is None:
+        return 0
+
+    with _lock:
+        records = pending[:]
+        del pending[:]
+
+    written = 0
+    if records:
+        data = ''.join(json.dumps(r, ensure_ascii = False) + '\n' for r in records).encode('utf-8')
+        lock_path = os.path.join(shared_dir, LOCK_NAME)
+        if (lock_st := _acquire(lock_path)) is None:
+            log.warning(f"Timed out waiting for shared hash cache lock, will retry: {lock_path}")
+        else:
+            try:
+                fd = os.open(local['source'], os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+                try:
+                    # Start on a new line, in case a writer crashed partway through a record
+                    size = os.fstat(fd).st_size
+                    if size and _last_byte(local['source'], size) != b'\n':
+                        data = b'\n' + data
+                    os.write(fd, data)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                written = len(records)
+                records = []
+            except OSError as e:
+                log.warning(f"Could not write to shared hash cache, will retry: {e}")
+            finally:
+                _release(lock_path, lock_st)
+
+    with _lock:
+        # Keep anything that couldn't be written for next time
+        pending[:0] = records
+        metrics.count('shared_cache_records_written', written)
+    return written
+
+def _last_byte(file_path: str, size: int) -> bytes:
+    with open(file_path, 'rb') as f:
+        f.seek(size - 1)
+        return f.read(1)
+
+def save():
+    '''
+    Writes the local copy of the shared cache. This rewrites the whole file,
+    so it's done once hashing is finished rather than on every flush. Anything
+    flushed but not saved is read back from the shared log next time.
+    '''
+    if shared_dir is None:
+        return
+    with _lock:
+        tmp_path = local_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(local, f, ensure_ascii = False)
+        os.replace(tmp_path, local_path)
@@ -0,0 +1,189 @@
+import json
+import logging as log
+import os
+import time
+
+from . import api as RC_API
+
+################################################################################
+
+snapshot_path = ''
+"""Directory storing a snapshot of each console's game list, and hash info for its games."""
+snapshots = {}
+"""Dictionary of loaded snapshots, with console ID as key."""
+
+################################################################################
+
+def init(directory: str):
+    '''
+    Initializes the module
+
+    Args:
+        directory (str): Directory to store snapshots in, created if needed
+    '''
+    global snapshot_path
+    snapshot_path = directory
+
+    if not os.path.exists(snapshot_path):
+        os.makedirs(snapshot_path)
+
+    return 0
+
+################################################################################
+
+def _snapshot_file(system: int) -> str:
+    return os.path.join(snapshot_path, 'ra_console_' + str(system) + '.json')
+
+def load_snapshot(system: int) -> dict:
+    '''
+    Loads the stored snapshot for a console, or None if there isn't one.
+
+    Snapshot is a dictionary with:
+        games: {game ID: {'Title': str, 'Hashes': [str]}}
+        hash_info: {game ID: get_game_hashes result}
+        hash_time: {game ID: time hash_info was requested, in seconds since the epoch}
+        stale: [game IDs with changed hashes that hash_info has not been refetched for]
+    '''
+    if system in snapshots:
+        return snapshots[system]
+
+    s_file = _snapshot_file(system)
+    if not os.path.exists(s_file):
+        return None
+
+    with open(s_file, encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    # Older snapshots didn't record when hash info was requested, so it's counted from now
+    hash_time = snapshot.setdefault('hash_time', {})
+    now = time.time()
+    for g_id in snapshot['hash_info']:
+        hash_time.setdefault(g_id, now)
+
+    snapshots[system] = snapshot
+    return snapshot
+
+def save_snapshot(system: int):
+    if (snapshot := snapshots.get(system)) is None:
+        return
+    with open(_snapshot_file(system), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii = False)
+
+################################################################################
+
+def diff_games(old_games: dict, games: dict) -> dict:
+    '''
+    Compares two {game ID: {'Title', 'Hashes'}} dictionaries.
+
+    Returns:
+        Dictionary with 'added' and 'removed' lists of game IDs, and 'changed'
+        as {game ID: (added hashes, removed hashes)}
+    '''
+    added = [g_id for g_id in games if g_id not in old_games]
+    removed = [g_id for g_id in old_games if g_id not in games]
+    changed = {}
+    for g_id, g in games.items():
+        if (old := old_games.get(g_id)) is None:
+            continue
+        h_new, h_old = set(g['Hashes']), set(old['Hashes'])
+        if h_new != h_old:
+            changed[g_id] = (sorted(h_new - h_old), sorted(h_old - h_new))
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+def update(system: int, game_list: list) -> dict:
+    '''
+    Updates the snapshot for a console with a newly requested game list.
+
+    Hash info for removed games or games whose hashes changed is dropped, so
+    it gets requested again next time it's needed.
+
+    Returns:
+        Differences from the previous snapshot (see diff_games), plus 'old'
+        with the previous games dictionary for looking up removed titles. None
+        if there was no previous snapshot.
+    '''
+    games = {str(g['ID']): {'Title': g.get('Title'), 'Hashes': [h.casefold() for h in g.get('Hashes') or []]}
+             for g in game_list}
+
+    if (snapshot := load_snapshot(system)) is None:
+        snapshots[system] = {'games': games, 'hash_info': {}, 'hash_time': {}, 'stale': []}
+        save_snapshot(system)
+        return None
+
+    diff = diff_games(snapshot['games'], games)
+    diff['old'] = snapshot['games']
+
+    stale = set(snapshot.get('stale', []))
+    for g_id in diff['removed']:
+        snapshot['hash_info'].pop(g_id, None)
+        snapshot['hash_time'].pop(g_id, None)
+        stale.discard(g_id)
+    for g_id in diff['changed']:
+        snapshot['hash_info'].pop(g_id, None)
+        snapshot['hash_time'].pop(g_id, None)
+        stale.add(g_id)
+
+    snapshot['games'] = games
+    snapshot['stale'] = sorted(stale)
+    save_snapshot(system)
+
+    return diff
+
+################################################################################
+
+def get_game_hashes(system: int, game_ids) -> dict:
+    '''
+    Returns hash info for many games on a console, only requesting it from the
+    API for games that don't have it stored in the snapshot, or whose stored
+    info is older than the API_GetGameHashes cache policy. Games whose hashes
+    changed since it was last stored, or whose stored info is too old, bypass
+    the request cache.
+
+    Returns:
+        Dictionary of get_game_hashes results, with game ID as key
+    '''
+    if (snapshot := load_snapshot(system)) is None:
+        return RC_API.get_games_hashes(game_ids)
+
+    # Stored info is kept as long as cached responses are, and used as it is when offline
+    ttl = RC_API.cache_policies.get('API_GetGameHashes', RC_API.CACHE_DEFAULT_TTL)
+    now = time.time()
+
+    result = {}
+    missing = []
+    expired = set()
+    for g_id in game_ids:
+        if (info := snapshot['hash_info'].get(str(g_id))) is not None:
+            if RC_API.offline or now - snapshot['hash_time'].get(str(g_id), now) < ttl:
+                result[g_id] = info
+                continue
+            expired.add(str(g_id))
+        missing.append(g_id)
+
+    if not missing:
+        return result
+
+    stale = set(snapshot['stale'])
+    log.debug(f"Requesting hash info for {len(missing)} games, {len(stale)} stale, {len(expired)} expired")
+    refresh = [g_id for g_id in missing if str(g_id) in stale or str(g_id) in expired]
+    fetched = {}
+    if (request := [g_id for g_id in missing if str(g_id) not in stale and str(g_id) not in expired]):
+        fetched.update(RC_API.get_games_hashes(request))
+    if refresh:
+        fetched.update(RC_API.get_games_hashes(refresh, True))
+
+    for g_id, info in fetched.items():
+        snapshot['hash_info'][str(g_id)] = info
+        snapshot['hash_time'][str(g_id)] = now
+        stale.discard(str(g_id))
+        result[g_id] = info
+
+    # Expired info that couldn't be requested again is still better than none
+    for g_id in missing:
+        if g_id not in result and str(g_id) in expired:
+            result[g_id] = snapshot['hash_info'][str(g_id)]
+
+    snapshot['stale'] = sorted(stale)
+    save_snapshot(system)
+
+    return result
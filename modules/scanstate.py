@@ -0,0 +1,63 @@
+import json
+import os
+
+################################################################################
+
+state_path = ''
+state = {}
+"""Dictionary storing comparison results from the last run, with console name as key."""
+
+################################################################################
+
+def init(file_path: str):
+    '''
+    Initializes the module, loading state from the last run if there is any.
+
+    Args:
+        file_path (str): Path to state JSON file
+    '''
+    global state_path
+    state_path = file_path
+
+    global state
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+
+    return 0
+
+def save():
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii = False)
+
+################################################################################
+
+def get_result(console: str) -> dict:
+    '''
+    Returns comparison results for a console from the last run, or None.
+    '''
+    if (c_state := state.get(console)) is None:
+        return None
+    return c_state.get('result')
+
+def set_result(console: str, result: dict):
+    state.setdefault(console, {})['result'] = result
+
+def diff_result(old: dict, new: dict) -> dict:
+    '''
+    Compares two sets of comparison results, each being a dictionary of
+    categories (i.e. 'missing'), each a dictionary of {key: description}.
+
+    Returns:
+        Dictionary of {category: (added keys, removed keys)} for categories
+        that changed
+    '''
+    diff = {}
+    for k in new.keys() | old.keys():
+        n, o = new.get(k, {}), old.get(k, {})
+        added = [i for i in n if i not in o]
+        removed = [i for i in o if i not in n]
+        if added or removed:
+            diff[k] = (added, removed)
+    return diff
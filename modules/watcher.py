@@ -0,0 +1,205 @@
+import ctypes
+import ctypes.util
+import logging as log
+import os
+import select
+import struct
+import sys
+import time
+
+################################################################################
+
+IN_MODIFY      = 0x00000002
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_Q_OVERFLOW  = 0x00004000
+IN_NONBLOCK    = 0x00000800
+IN_CLOEXEC     = 0x00080000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB
+"""inotify events that mean a file was written, added, removed or replaced."""
+
+EVENT_HEADER = struct.Struct('iIII')
+"""inotify_event header: watch descriptor, mask, cookie, name length."""
+
+################################################################################
+
+def _load_inotify():
+    """Returns libc if it has inotify (Linux only), otherwise None."""
+
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno = True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return libc
+
+class Watcher:
+    """
+    Watches directories (not recursively) for changes to the files in them,
+    using inotify on Linux and polling file sizes and modified times anywhere
+    else, or if inotify can't be set up.
+
+    Changes are debounced, so a burst of writes (i.e. LaunchBox saving a
+    platform, or copying in a set of ROMs) is reported once it has settled.
+    """
+
+    def __init__(self, directories, debounce: float = 2.0, interval: float = 5.0, polling: bool = False):
+        '''
+        Args:
+            directories (iterable): Directories to watch, ones that don't exist are skipped
+            debounce (float): Seconds without any further changes before changes are reported
+            interval (float): Seconds between scans when polling
+            polling (bool): If True, always poll rather than use inotify
+        '''
+        self.debounce = debounce
+        self.interval = interval
+        self.directories = set()
+        self.fd = None
+        self.wds = {}
+        """Dictionary of watched directories, with inotify watch descriptor as key."""
+        self.snapshot = {}
+        """Dictionary of (size, modified time) for files in watched directories when polling, with path as key."""
+
+        libc = None if polling else _load_inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                log.warning(f"Could not set up inotify ({os.strerror(ctypes.get_errno())}), polling for changes instead")
+            else:
+                self.fd = fd
+                self.libc = libc
+
+        self.update(directories)
+
+    @property
+    def polling(self) -> bool:
+        return self.fd is None
+
+    def update(self, directories):
+        """Adds any directories not already watched, and stops watching the rest."""
+
+        directories = {os.path.normpath(d) for d in directories if os.path.isdir(d)}
+        removed = self.directories - directories
+        added = directories - self.directories
+        self.directories = directories
+
+        if self.polling:
+            self.snapshot = {p: s for p, s in self.snapshot.items() if os.path.dirname(p) not in removed}
+            for d in added:
+                self.snapshot.update(self._scan(d))
+            return
+
+        for wd, d in list(self.wds.items()):
+            if d in removed:
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.wds[wd]
+        for d in added:
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(d), WATCH_MASK)
+            if wd < 0:
+                log.warning(f"Could not watch {d}: {os.strerror(ctypes.get_errno())}")
+                continue
+            self.wds[wd] = d
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.wds.clear()
+
+    ############################################################################
+
+    def wait(self, timeout: float = None) -> set:
+        '''
+        Blocks until files in the watched directories change, then until no
+        more changes have happened for the debounce time.
+
+        Args:
+            timeout (float): Seconds to wait for a first change, or None for no limit
+
+        Returns:
+            Set of paths that were written, added or removed, empty on timeout
+        '''
+        changed = set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not changed:
+            wait_for = None if deadline is None else deadline - time.monotonic()
+            if wait_for is not None and wait_for <= 0:
+                return changed
+            changed = self._next_changes(wait_for)
+
+        # Keep collecting until the changes settle
+        while (more := self._next_changes(self.debounce)):
+            changed |= more
+        return changed
+
+    def _next_changes(self, timeout: float) -> set:
+        """Returns changes that happen within timeout seconds (None for no limit), or an empty set."""
+
+        if self.polling:
+            end = None if timeout is None else time.monotonic() + timeout
+            while True:
+                step = self.interval if end is None else min(self.interval, end - time.monotonic())
+                if step > 0:
+                    time.sleep(step)
+                if (changed := self._poll()) or (end is not None and time.monotonic() >= end):
+                    return changed
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        return self._read_events()
+
+    def _read_events(self) -> set:
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = data[pos:pos + name_len].rstrip(b'\0')
+            pos += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, so report everything as changed
+                log.warning("Too many file changes at once, treating all watched directories as changed")
+                changed.update(self.directories)
+            elif (d := self.wds.get(wd)) is not None and name:
+                changed.add(os.path.join(d, os.fsdecode(name)))
+        return changed
+
+    ############################################################################
+
+    @staticmethod
+    def _scan(directory: str) -> dict:
+        snapshot = {}
+        try:
+            with os.scandir(directory) as it:
+                for e in it:
+                    try:
+                        if e.is_file():
+                            st = e.stat()
+                            snapshot[e.path] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return snapshot
+
+    def _poll(self) -> set:
+        snapshot = {}
+        for d in self.directories:
+            snapshot.update(self._scan(d))
+        changed = {p for p in snapshot.keys() | self.snapshot.keys() if snapshot.get(p) != self.snapshot.get(p)}
+        self.snapshot = snapshot
+        return changed
@@ -0,0 +1,242 @@
+    # Known-vector tests for the native CD hash methods, on small generated
+    # disc images. Images are built sector by sector, with an ISO9660 volume
+    # descriptor and directories holding only what the hash methods read.
+
+import pytest
+
+from modules.rcheevos import disc
+from modules.rcheevos import hash as RC_HASH
+from modules.rcheevos import native
+
+################################################################################
+
+SS = disc.SECTOR_DATA_SIZE
+
+def data(size: int, seed: int = 1) -> bytes:
+    """Deterministic file contents, the same on every run."""
+
+    return bytes((i * 29 + seed * 13 + (i >> 9)) & 0xff for i in range(size))
+
+def _record(name: str, sector: int, size: int, is_dir: bool = False) -> bytes:
+    n = name.encode('latin-1')
+    r = bytearray(33 + len(n) + (1 - len(n) % 2))
+    r[0] = len(r)
+    r[2:6] = sector.to_bytes(4, 'little')
+    r[6:10] = sector.to_bytes(4, 'big')
+    r[10:14] = size.to_bytes(4, 'little')
+    r[14:18] = size.to_bytes(4, 'big')
+    r[25] = 2 if is_dir else 0
+    r[32] = len(n)
+    r[33:33 + len(n)] = n
+    return bytes(r)
+
+def _directory(sector: int, entries: list) -> bytes:
+    return b''.join([_record('\0', sector, SS, True), _record('\1', sector, SS, True), *entries])
+
+def iso(files: dict, sectors: int = 40, split_root: bool = False) -> bytes:
+    """
+    Builds a 2048 byte sector ISO9660 image.
+
+    Args:
+        files (dict): (sector, contents) tuples with path as key, paths can
+            have one directory ('DIR\\NAME'), whose record goes in sector 19
+        split_root (bool): Put every root entry after '.' and '..' in a
+            second root directory sector, to test directories spanning sectors
+    """
+
+    img = bytearray(sectors * SS)
+    pvd = bytearray(SS)
+    pvd[0:6] = b'\x01CD001'
+    pvd[128:130] = SS.to_bytes(2, 'little')
+    pvd[156:190] = _record('\0', 17, SS * (2 if split_root else 1), True)[:34]
+    img[16 * SS:17 * SS] = pvd
+
+    root, sub = [], []
+    for path, (sector, contents) in files.items():
+        img[sector * SS:sector * SS + len(contents)] = contents
+        name = path.rsplit('\\', 1)[-1] + ';1'
+        (sub if '\\' in path else root).append(_record(name, sector, len(contents)))
+    if sub:
+        img[19 * SS:20 * SS] = _directory(19, sub).ljust(SS, b'\0')
+        root.append(_record(next(p for p in files if '\\' in p).split('\\')[0], 19, SS, True))
+
+    if split_root:
+        img[17 * SS:18 * SS] = _directory(17, []).ljust(SS, b'\0')
+        img[18 * SS:19 * SS] = b''.join(root).ljust(SS, b'\0')
+    else:
+        img[17 * SS:18 * SS] = _directory(17, root).ljust(SS, b'\0')
+    return bytes(img)
+
+def raw(img: bytes, mode: int) -> bytes:
+    """Converts a 2048 byte sector image to raw 2352 byte sectors (mode 1 or mode 2 form 1)."""
+
+    header = 16 if mode == 1 else 24
+    out = bytearray()
+    for i in range(len(img) // SS):
+        sector = bytearray(2352)
+        sector[:12] = disc.SYNC_PATTERN
+        sector[15] = mode
+        sector[header:header + SS] = img[i * SS:(i + 1) * SS]
+        out += sector
+    return bytes(out)
+
+def write(tmp_path, name: str, contents) -> str:
+    path = tmp_path / name
+    if isinstance(contents, str):
+        path.write_text(contents)
+    else:
+        path.write_bytes(contents)
+    return str(path)
+
+################################################################################
+
+PSX_EXE = b'PS-X EXE' + bytes(20) + (4096).to_bytes(4, 'little') + data(8000)
+"""PS-X EXE header giving 4096 bytes after the header, so 6144 bytes are hashed."""
+PSX_CNF = b'BOOT = cdrom:\\SLUS_012.34;1\r\nTCB = 4\r\nEVENT = 10\r\n'
+PSX_IMAGE = iso({'SYSTEM.CNF': (20, PSX_CNF), 'SLUS_012.34': (21, PSX_EXE)})
+PSX_MD5 = 'f3e46754b538f590144d6c771ba606ad'
+"""MD5 of 'SLUS_012.34' and the first 6144 bytes of PSX_EXE."""
+
+@pytest.mark.parametrize('name, contents', [
+    ('game.iso', PSX_IMAGE),
+    ('game.bin', raw(PSX_IMAGE, 2)),
+])
+def test_psx_image(tmp_path, name, contents):
+    path = write(tmp_path, name, contents)
+    assert native.supports(12, path)
+    assert native.calculate_hash(12, path) == PSX_MD5
+
+def test_psx_cue(tmp_path):
+    write(tmp_path, 'game (track 1).bin', raw(PSX_IMAGE, 2))
+    cue = write(tmp_path, 'game.cue',
+                'FILE "game (track 1).bin" BINARY\n'
+                '  TRACK 01 MODE2/2352\n'
+                '    INDEX 01 00:00:00\n'
+                '  TRACK 02 AUDIO\n'
+                '    INDEX 00 00:10:00\n'
+                '    INDEX 01 00:12:00\n')
+    assert native.calculate_hash(12, cue) == PSX_MD5
+
+def test_psx_subdirectory_and_split_root(tmp_path):
+    # No PS-X EXE header, so the size from the directory is used
+    exe = data(3000, 2)
+    img = iso({'SYSTEM.CNF': (22, b'BOOT=cdrom:\\GAME\\MAIN.EXE;1\n'), 'GAME\\MAIN.EXE': (24, exe)}, split_root=True)
+    assert native.calculate_hash(12, write(tmp_path, 'game.iso', img)) == 'e398bd97a8970ab39cdea5f09d92e10c'
+
+def test_psx_small_file_hashes_whole_sector(tmp_path):
+    # rcheevos always hashes the first full sector, including what's past the end of the file
+    img = bytearray(iso({'SYSTEM.CNF': (20, b'BOOT = cdrom:\\TINY.EXE;1\n'), 'TINY.EXE': (21, b'tiny')}))
+    img[21 * SS + 4:22 * SS] = data(SS - 4, 3)
+    assert native.calculate_hash(12, write(tmp_path, 'game.iso', bytes(img))) == '348acf70fddcb3ccb3bd3099d315beaa'
+
+def test_psx_without_system_cnf(tmp_path):
+    img = iso({'PSX.EXE': (20, PSX_EXE)})
+    assert native.calculate_hash(12, write(tmp_path, 'game.iso', img)) == 'a3e516a48aed6d8d7423a5af395bbaa7'
+
+def test_psx_without_boot_line(tmp_path):
+    # PSX.EXE is only used when there's no SYSTEM.CNF at all
+    img = iso({'SYSTEM.CNF': (20, b'TCB = 4\n'), 'PSX.EXE': (21, PSX_EXE)})
+    with pytest.raises(OSError):
+        native.calculate_hash(12, write(tmp_path, 'game.iso', img))
+
+def test_ps2(tmp_path):
+    img = iso({'SYSTEM.CNF': (20, b'BOOT2 = cdrom0:\\SLUS_200.01;1\nVER = 1.00\n'), 'SLUS_200.01': (21, data(5000, 4))})
+    assert native.calculate_hash(21, write(tmp_path, 'game.iso', img)) == 'e78f726c0d2f7b41be44416863aa9b71'
+
+################################################################################
+
+SEGA_HEADER = b'SEGADISCSYSTEM  ' + data(496, 5)
+SEGA_MD5 = 'a5cf860b65f09694f7e4cb3953224fd5'
+SATURN_HEADER = b'SEGA SEGASATURN ' + data(496, 5)
+SATURN_MD5 = 'b4523f8109c6fd5c154aeb00edf2a894'
+
+def test_sega_cd_cue(tmp_path):
+    write(tmp_path, 'game.bin', raw(SEGA_HEADER + data(SS * 20 - 512, 6), 1))
+    cue = write(tmp_path, 'game.cue', 'FILE "game.bin" BINARY\n  TRACK 01 MODE1/2352\n    INDEX 01 00:00:00\n')
+    assert native.calculate_hash(9, cue) == SEGA_MD5
+
+def test_saturn_iso(tmp_path):
+    path = write(tmp_path, 'game.iso', SATURN_HEADER + data(SS * 20 - 512, 6))
+    assert native.calculate_hash(39, path) == SATURN_MD5
+
+def test_not_a_sega_disc(tmp_path):
+    with pytest.raises(OSError):
+        native.calculate_hash(39, write(tmp_path, 'game.iso', PSX_IMAGE))
+
+################################################################################
+
+PCE_CD_MD5 = '8f77ce833f4cc0ace6a9b44e39bcbaa9'
+"""MD5 of the title from the header sector and the 3 boot program sectors."""
+
+def test_pce_cd(tmp_path):
+    # Audio track 1 in its own file, then data track 2 with a 2 second pregap
+    track = bytearray(data(SS * 20, 7))
+    header = bytearray(SS)
+    header[0:3] = (2).to_bytes(3, 'big')
+    header[3] = 3
+    header[32:55] = b'PC Engine CD-ROM SYSTEM'
+    header[106:128] = b'TEST TITLE            '
+    track[SS:2 * SS] = header
+
+    write(tmp_path, 'game (track 1).bin', data(2352 * 300, 8))
+    write(tmp_path, 'game (track 2).bin', data(2352 * 150, 9) + raw(bytes(track), 1))
+    cue = write(tmp_path, 'game.cue',
+                'FILE "game (track 1).bin" BINARY\n'
+                '  TRACK 01 AUDIO\n'
+                '    INDEX 01 00:00:00\n'
+                'FILE "game (track 2).bin" BINARY\n'
+                '  TRACK 02 MODE1/2352\n'
+                '    INDEX 00 00:00:00\n'
+                '    INDEX 01 00:02:00\n')
+
+    tracks = disc.parse_cue(cue)
+    assert [(t['number'], t['mode'], t['first_sector'], t['file_offset']) for t in tracks] == [
+        (1, 'AUDIO', 0, 0),
+        (2, 'MODE1/2352', 450, 150 * 2352),
+    ]
+    assert native.calculate_hash(76, cue) == PCE_CD_MD5
+
+def test_pce_cd_gameexpress(tmp_path):
+    # No header sector, so BOOT.BIN is hashed, as a whole sector like other CD files
+    img = bytearray(iso({'BOOT.BIN': (20, b'gameexpress boot')}))
+    img[20 * SS + 16:21 * SS] = data(SS - 16, 10)
+    write(tmp_path, 'game.bin', raw(bytes(img), 1))
+    cue = write(tmp_path, 'game.cue', 'FILE "game.bin" BINARY\n  TRACK 01 MODE1/2352\n    INDEX 01 00:00:00\n')
+    assert native.calculate_hash(76, cue) == 'd2285a47583ce2110bead1c3e3b2593e'
+
+################################################################################
+
+def test_iso9660_lookup(tmp_path):
+    img = iso({'SYSTEM.CNF': (22, b'x'), 'GAME\\MAIN.EXE': (24, data(3000))}, split_root=True)
+    with disc.open_track(write(tmp_path, 'game.bin', raw(img, 1))) as track:
+        assert (track.sector_size, track.header_size) == (2352, 16)
+        assert disc.find_file_sector(track, 'system.cnf') == (22, 1)
+        assert disc.find_file_sector(track, 'SYSTEM.CNF;1') == (22, 1)
+        assert disc.find_file_sector(track, '\\GAME\\MAIN.EXE') == (24, 3000)
+        assert disc.find_file_sector(track, 'GAME\\MISSING.EXE') == (0, 0)
+        assert disc.find_file_sector(track, 'MISSING\\MAIN.EXE') == (0, 0)
+        assert track.read(24, 3000) == data(3000)
+
+def test_invalid_cue(tmp_path):
+    write(tmp_path, 'game.bin', raw(PSX_IMAGE, 2))
+    cue = write(tmp_path, 'game.cue', 'FILE "game.bin" BINARY\n  TRACK 01 MODE2/2352\n    INDEX 01 xx:00:00\n')
+    with pytest.raises(OSError):
+        native.calculate_hash(12, cue)
+
+def test_native_failure_falls_back_to_rahasher(tmp_path, monkeypatch):
+    path = write(tmp_path, 'game.iso', iso({'SYSTEM.CNF': (20, b'TCB = 4\n')}))
+    calls = []
+    monkeypatch.setattr(RC_HASH, 'use_native', True)
+    monkeypatch.setattr(RC_HASH, '_calculate_external_hash', lambda *args: calls.append(args) or 'f' * 32)
+    assert RC_HASH.calculate_hash(12, path) == 'f' * 32
+    assert calls == [(12, path, None)]
+
+def test_failed_job_does_not_stop_scan(tmp_path, monkeypatch):
+    def calculate_hash(system, file_path, timeout):
+        if file_path.endswith('bad.iso'):
+            raise ValueError('unexpected')
+        return 'f' * 32
+    monkeypatch.setattr(RC_HASH, 'use_shared', False)
+    monkeypatch.setattr(RC_HASH, 'calculate_hash', calculate_hash)
+    results = dict(RC_HASH.calculate_hashes([(12, 'bad.iso'), (12, 'good.iso')], workers = 1))
+    assert results == {(12, 'bad.iso'): 0, (12, 'good.iso'): 'f' * 32}
@@ -0,0 +1,214 @@
+    # Known-vector tests for the native GameCube hash method, on a small
+    # generated disc stored as a plain .iso and as .wia/.rvz images. The
+    # images are written with the layout from Dolphin's WiaAndRvz.md.
+
+import bz2
+import hashlib
+import lzma
+import struct
+
+import pytest
+
+from modules.rcheevos import gamecube as GC
+from modules.rcheevos import native
+
+################################################################################
+
+DISC_SIZE = 0x100000
+CHUNK_SIZE = 0x20000
+
+APPLOADER_SIZES = (0x1234, 0x100)
+"""Apploader body and trailer sizes, so 0x2440 + 0x20 + 0x1334 header bytes are hashed."""
+DOL_OFFSET = 0x40000
+DOL_SECTIONS = [(0x100, 0x4f00), (0x5000, 0x20000), (0x30000, 0x1000)]
+"""(offset from DOL start, size) of the DOL sections that are used, the rest are empty."""
+
+def lfg_junk(seed: bytes, skip: int, size: int) -> bytes:
+    """
+    Junk data from a line-by-line port of Dolphin's LaggedFibonacciGenerator
+    (SetSeed, Forward(count) then GetBytes), one word at a time, to check the
+    faster generator in the gamecube module against.
+    """
+
+    k, j = 521, 32
+    buf = list(struct.unpack('>17I', seed))
+    for i in range(17, k):
+        buf.append(((buf[i - 17] << 23) & 0xFFFFFFFF) ^ (buf[i - 16] >> 9) ^ buf[i - 1])
+    buf = [(x & 0xFF00FFFF) | ((x >> 2) & 0x00FF0000) for x in buf]
+
+    def forward():
+        for i in range(j):
+            buf[i] ^= buf[i + k - j]
+        for i in range(j, k):
+            buf[i] ^= buf[i - j]
+
+    for _ in range(4):
+        forward()
+    position = skip
+    while position >= k * 4:
+        forward()
+        position -= k * 4
+
+    out = bytearray()
+    while len(out) < size:
+        out += struct.pack(f'>{k}I', *buf)[position:position + size - len(out)]
+        position = 0
+        forward()
+    return bytes(out)
+
+JUNK_OFFSET = 0xC8123
+JUNK_SIZE = 0xD0000 - JUNK_OFFSET
+JUNK_SEED = bytes(range(68))
+"""Junk padding to the end of a 0x8000 byte block, which RVZ images store as a seed."""
+
+GAMECUBE_MD5 = '8802c766a87d429421a27f8506fb5637'
+"""MD5 of the disc header and apploader, then the 3 DOL sections in order."""
+
+def disc() -> bytes:
+    image = bytearray((i * 7 + (i >> 11)) & 0xff for i in range(DISC_SIZE))
+    image[0x1c:0x20] = b'\xc2\x33\x9f\x3d'
+    image[0x420:0x424] = DOL_OFFSET.to_bytes(4, 'big')
+    image[0x2454:0x245c] = struct.pack('>II', *APPLOADER_SIZES)
+
+    offsets = [0] * 18
+    sizes = [0] * 18
+    for i, (offset, size) in zip((0, 1, 7), DOL_SECTIONS):
+        offsets[i], sizes[i] = offset, size
+    image[DOL_OFFSET:DOL_OFFSET + 0x48] = struct.pack('>18I', *offsets)
+    image[DOL_OFFSET + 0x90:DOL_OFFSET + 0xD8] = struct.pack('>18I', *sizes)
+
+    image[JUNK_OFFSET:JUNK_OFFSET + JUNK_SIZE] = lfg_junk(JUNK_SEED, JUNK_OFFSET % GC.BLOCK_SIZE, JUNK_SIZE)
+    return bytes(image)
+
+DISC = disc()
+
+################################################################################
+
+def compress(data: bytes, compression: int) -> bytes:
+    if compression == GC.COMPRESSION_NONE:
+        return data
+    if compression == GC.COMPRESSION_PURGE:
+        # Runs of non-zero data as (offset, size, data), followed by a SHA-1 of them
+        runs = b''.join(struct.pack('>II', o, 0x1000) + data[o:o + 0x1000]
+                        for o in range(0, len(data), 0x1000) if any(data[o:o + 0x1000]))
+        return runs + hashlib.sha1(runs).digest()
+    if compression == GC.COMPRESSION_BZIP2:
+        return bz2.compress(data)
+    if compression == GC.COMPRESSION_LZMA:
+        return lzma.compress(data, lzma.FORMAT_RAW, filters = [{'id': lzma.FILTER_LZMA1, 'dict_size': 1 << 20, 'lc': 3, 'lp': 0, 'pb': 2}])
+    if compression == GC.COMPRESSION_LZMA2:
+        return lzma.compress(data, lzma.FORMAT_RAW, filters = [{'id': lzma.FILTER_LZMA2, 'dict_size': 1 << 20}])
+    return pytest.importorskip('zstandard').ZstdCompressor(write_content_size = False).compress(data)
+
+COMPRESSOR_DATA = {
+    GC.COMPRESSION_LZMA: bytes([3 + 45 * 2]) + (1 << 20).to_bytes(4, 'little'),
+    GC.COMPRESSION_LZMA2: bytes([18]),
+}
+"""LZMA properties for the filters used by compress."""
+
+def pack_rvz(group: bytes, start: int) -> bytes:
+    """Stores any junk padding in a group as its seed, as RVZ does."""
+
+    if not start <= JUNK_OFFSET < start + len(group):
+        return None
+    a = JUNK_OFFSET - start
+    b = min(a + JUNK_SIZE, len(group))
+    packed = struct.pack('>I', a) + group[:a] + struct.pack('>I', 0x80000000 | (b - a)) + JUNK_SEED
+    if b < len(group):
+        packed = packed + struct.pack('>I', len(group) - b) + group[b:]
+    return packed
+
+def wia(rvz: bool, compression: int) -> bytes:
+    """Builds a WIA or RVZ image of DISC, with one run of raw data after the disc header."""
+
+    groups = []
+    for start in range(0, DISC_SIZE, CHUNK_SIZE):
+        group = DISC[start:start + CHUNK_SIZE]
+        packed = (pack_rvz(group, start) if rvz else None) or b''
+        data = compress(packed or group, compression)
+        flag = 0
+        if rvz:
+            # RVZ only compresses groups that get smaller for it
+            if compression and len(data) < len(packed or group):
+                flag = 0x80000000
+            else:
+                data = packed or group
+        groups.append((data, flag, len(packed)))
+
+    raw_data = compress(GC.RAW_DATA.pack(GC.DISC_HEADER_SIZE, DISC_SIZE - GC.DISC_HEADER_SIZE, 0, len(groups)), compression)
+    raw_data_offset = GC.FILE_HEAD.size + GC.DISC.size
+    group_table_offset = raw_data_offset + len(raw_data)
+    data_offset = (group_table_offset + 0x1000) & ~3
+
+    entries, body = [], bytearray()
+    for data, flag, packed_size in groups:
+        offset = data_offset + len(body)
+        if rvz:
+            entries.append(GC.RVZ_GROUP.pack(offset >> 2, len(data) | flag, packed_size))
+        else:
+            entries.append(GC.WIA_GROUP.pack(offset >> 2, len(data)))
+        body += data + bytes(-len(data) % 4)
+    group_table = compress(b''.join(entries), compression)
+    assert group_table_offset + len(group_table) <= data_offset
+
+    compressor_data = COMPRESSOR_DATA.get(compression, b'')
+    disc_struct = GC.DISC.pack(GC.GAMECUBE_DISC, compression, 5, CHUNK_SIZE, DISC[:GC.DISC_HEADER_SIZE], 0, 0, 0, bytes(20),
+                               1, raw_data_offset, len(raw_data), len(groups), group_table_offset, len(group_table),
+                               len(compressor_data), compressor_data)
+    head = GC.FILE_HEAD.pack(GC.RVZ_MAGIC if rvz else GC.WIA_MAGIC, 0x01000000, 0x00030000, len(disc_struct), bytes(20),
+                             DISC_SIZE, data_offset + len(body), bytes(20))
+    image = bytearray(head + disc_struct + raw_data + group_table)
+    image += bytes(data_offset - len(image)) + body
+    return bytes(image)
+
+################################################################################
+
+def test_disc_vector():
+    md5 = hashlib.md5(DISC[:0x2440 + 0x20 + sum(APPLOADER_SIZES)])
+    for offset, size in DOL_SECTIONS:
+        md5.update(DISC[DOL_OFFSET + offset:DOL_OFFSET + offset + size])
+    assert md5.hexdigest() == GAMECUBE_MD5
+
+@pytest.mark.parametrize('name', ['game.iso', 'game.gcm'])
+def test_iso(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(DISC)
+    assert native.supports(16, str(path))
+    assert native.calculate_hash(16, str(path)) == GAMECUBE_MD5
+
+@pytest.mark.parametrize('rvz, compression', [
+    (False, GC.COMPRESSION_NONE),
+    (False, GC.COMPRESSION_PURGE),
+    (False, GC.COMPRESSION_BZIP2),
+    (False, GC.COMPRESSION_LZMA),
+    (False, GC.COMPRESSION_LZMA2),
+    (True, GC.COMPRESSION_NONE),
+    (True, GC.COMPRESSION_BZIP2),
+    (True, GC.COMPRESSION_LZMA2),
+    (True, GC.COMPRESSION_ZSTD),
+])
+def test_wia_rvz(tmp_path, rvz, compression):
+    path = tmp_path / ('game.rvz' if rvz else 'game.wia')
+    path.write_bytes(wia(rvz, compression))
+    assert native.supports(16, str(path))
+    assert native.calculate_hash(16, str(path)) == GAMECUBE_MD5
+
+    # The whole disc reads back the same, including RVZ junk padding regenerated from its seed
+    with GC.open_disc(str(path)) as image:
+        assert image.read(0, DISC_SIZE) == DISC
+
+@pytest.mark.parametrize('skip, size', [(0, 0x40), (0x123, 0x1000), (521 * 4 * 3 + 5, 521 * 4 + 7)])
+def test_junk_matches_reference(skip, size):
+    seed = bytes((i * 37 + 11) & 0xff for i in range(68))
+    assert GC._junk(seed, skip, size) == lfg_junk(seed, skip, size)
+
+def test_truncated_junk_seed():
+    # A junk run whose seed is cut short, as in a truncated or corrupt RVZ group
+    with pytest.raises(OSError):
+        GC._unpack_rvz(struct.pack('>I', 0x80000100) + bytes(40), 0x100, 0)
+
+def test_not_a_gamecube_disc(tmp_path):
+    path = tmp_path / 'game.iso'
+    path.write_bytes(bytes(0x10000))
+    with pytest.raises(OSError):
+        native.calculate_hash(16, str(path))
@@ -0,0 +1,82 @@
+    # Tests for the cross-platform hash index, checking the batched RA/LB
+    # join against one game at a time, on hashes that share high halves.
+
+import hashlib
+
+import pytest
+
+from modules import hashindex as HI
+
+################################################################################
+
+def md5(n: int) -> str:
+    return hashlib.md5(str(n).encode()).hexdigest()
+
+def near(n: int) -> str:
+    """A hash with the same high half as md5(n), so lookups have to compare both halves."""
+
+    return md5(n)[:16] + md5(-n)[16:]
+
+@pytest.fixture(autouse = True)
+def reset_index():
+    HI.reset()
+    yield
+    HI.reset()
+
+def add_games():
+    """Adds RA games and LB entries with every kind of match, more than HashTable.MAX_PENDING of each."""
+
+    rc_games = []
+    for g in range(3000):
+        hashes = [md5(g * 3), md5(g * 3 + 1), near(g * 3 + 2)]
+        if g % 500 == 0:
+            hashes.append(md5(1))                   # duplicate of another game's hash
+        rc_games.append(HI.add_rc_game(hashes)[0])
+    for e in range(6000):
+        n = e * 2
+        HI.add_lb_entry(near(n) if e % 7 == 0 else md5(n), 'Platform A', 'Game', {'ID': str(e)})
+        if e % 3 == 0:
+            HI.add_lb_entry(md5(n + 1).upper(), 'Platform B', 'AdditionalApplication', {'ID': str(e)})
+    return rc_games
+
+################################################################################
+
+def test_match_rc_games_matches_single_lookups():
+    rc_games = add_games()
+    batched = HI.match_rc_games(rc_games)
+    assert batched == [HI.match_rc_game(i) for i in rc_games]
+    assert sum(h is not None for h, _ in batched) > 1000
+    assert sum(h is None for h, _ in batched) > 100
+
+def test_match_uses_first_hash_of_game():
+    i = HI.add_rc_game([md5(1), md5(2)])[0]
+    HI.add_lb_entry(md5(2), 'P', 'Game', {'ID': 'b'})
+    HI.add_lb_entry(md5(1), 'P', 'Game', {'ID': 'a'})
+    [(h, entries)] = HI.match_rc_games([i])
+    assert h == md5(1)
+    assert [e.get('ID') for _, _, e in entries] == ['a']
+
+def test_duplicate_rc_hash_matches_both_games():
+    i, _ = HI.add_rc_game([md5(1)])
+    j, duplicates = HI.add_rc_game([md5(1), md5(2)])
+    assert duplicates == [md5(1)]
+    HI.add_lb_entry(md5(1), 'P', 'Game', {'ID': 'a'})
+    assert [h for h, _ in HI.match_rc_games([i, j])] == [md5(1), md5(1)]
+
+def test_entry_hashes_and_removal():
+    assert HI.add_lb_entry(md5(1), 'P', 'Game', {'ID': 'a'})
+    assert not HI.add_lb_entry(md5(1), 'P', 'Game', {'ID': 'a'})
+    assert HI.add_lb_entry(near(1), 'P', 'Game', {'ID': 'a'})
+    assert not HI.add_lb_entry(md5(1), 'Q', 'Game', {'ID': 'a'})
+    assert sorted(HI.get_entry_hashes('P', 'Game', 'a')) == sorted([md5(1), near(1)])
+
+    assert HI.remove_lb_platform('P') == 1
+    assert HI.get_entry_hashes('P', 'Game', 'a') == []
+    assert [p for p, _, _ in HI.get_lb_entries(md5(1))] == ['Q']
+    assert HI.get_lb_entries(near(1)) == []
+
+    # The removed entry's slot is reused
+    owners = len(HI.lb_owners)
+    HI.add_lb_entry(md5(3), 'P', 'Game', {'ID': 'c'})
+    assert len(HI.lb_owners) == owners
+    assert HI.get_entry_hashes('P', 'Game', 'c') == [md5(3)]
@@ -0,0 +1,118 @@
+    # Known-vector tests for the native cartridge hash methods. The ROMs are
+    # generated, so the expected hashes are fixed digests of fixed inputs.
+
+import hashlib
+import zipfile
+
+import pytest
+
+from modules.rcheevos import native
+
+################################################################################
+
+def rom(size: int, seed: int = 1) -> bytes:
+    """Deterministic ROM contents, the same on every run."""
+
+    return bytes((i * 31 + seed * 17 + (i >> 8)) & 0xff for i in range(size))
+
+def write(tmp_path, name: str, data: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+BODY = rom(0x8000)
+BODY_MD5 = 'f90a1909e64894f1cae23a736aadf2e8'
+PCE_BODY = rom(0x20000)
+PCE_MD5 = '783ebe988925f71c8382243fc16d7444'
+ALT_MD5 = '3240c3f210f15d06c51f50623b35bd8f'
+"""MD5 of BODY reversed, the second ROM in the archive test."""
+
+################################################################################
+
+def test_body_vectors():
+    # The cartridge vectors below hash these bodies once their headers are skipped
+    assert hashlib.md5(BODY).hexdigest() == BODY_MD5
+    assert hashlib.md5(PCE_BODY).hexdigest() == PCE_MD5
+
+@pytest.mark.parametrize('header', [
+    b'NES\x1a' + bytes([2, 1]) + bytes(10),     # iNES
+    b'FDS\x1a' + bytes([1]) + bytes(11),        # fwNES
+])
+def test_nes_header_skipped(tmp_path, header):
+    assert native.calculate_hash(7, write(tmp_path, 'game.nes', header + BODY)) == BODY_MD5
+
+def test_nes_headerless(tmp_path):
+    assert native.calculate_hash(7, write(tmp_path, 'game.nes', BODY)) == BODY_MD5
+
+def test_snes_copier_header_skipped(tmp_path):
+    assert native.calculate_hash(3, write(tmp_path, 'game.smc', rom(512, 9) + BODY)) == BODY_MD5
+    assert native.calculate_hash(3, write(tmp_path, 'game.sfc', BODY)) == BODY_MD5
+
+def test_pce_copier_header_skipped(tmp_path):
+    assert native.calculate_hash(8, write(tmp_path, 'game.pce', rom(512, 9) + PCE_BODY)) == PCE_MD5
+    assert native.calculate_hash(8, write(tmp_path, 'plain.pce', PCE_BODY)) == PCE_MD5
+
+def test_lynx_header_skipped(tmp_path):
+    header = b'LYNX\0' + rom(59, 5)
+    assert native.calculate_hash(13, write(tmp_path, 'game.lnx', header + BODY)) == BODY_MD5
+
+def test_7800_header_skipped(tmp_path):
+    header = b'\x01ATARI7800' + rom(118, 5)
+    assert native.calculate_hash(51, write(tmp_path, 'game.a78', header + BODY)) == BODY_MD5
+
+################################################################################
+
+N64_BODY = b'\x80\x37\x12\x40' + rom(0x1000 - 4)
+N64_MD5 = '513804545843c91b484c00e53543dae8'
+
+def byteswap(data: bytes, width: int) -> bytes:
+    return b''.join(data[i:i + width][::-1] for i in range(0, len(data), width))
+
+@pytest.mark.parametrize('name, data', [
+    ('game.z64', N64_BODY),                     # big-endian, hashed as is
+    ('game.v64', byteswap(N64_BODY, 2)),        # byte-swapped
+    ('game.n64', byteswap(N64_BODY, 4)),        # little-endian
+])
+def test_n64_byte_order(tmp_path, name, data):
+    assert native.calculate_hash(2, write(tmp_path, name, data)) == N64_MD5
+
+def test_n64_unknown_header(tmp_path):
+    # rcheevos doesn't hash these, so they're left for RAHasher
+    with pytest.raises(OSError):
+        native.calculate_hash(2, write(tmp_path, 'game.z64', rom(0x1000)))
+
+################################################################################
+
+def test_archive_member(tmp_path):
+    path = tmp_path / 'game.zip'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('readme.txt', b'not a ROM')
+        z.writestr('game.nes', b'NES\x1a' + bytes(12) + BODY)
+        z.writestr('game (alt).nes', BODY[::-1])
+
+    assert native.supports(7, str(path))
+    assert native.calculate_hash(7, str(path)) == BODY_MD5
+    assert native.hash_archive(7, str(path)) == {
+        'game.nes': BODY_MD5,
+        'game (alt).nes': ALT_MD5,
+    }
+
+def test_empty_archive(tmp_path):
+    path = tmp_path / 'empty.zip'
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('readme.txt', b'not a ROM')
+    assert native.calculate_hash(7, str(path)) == 0
+
+def test_corrupt_archive_member(tmp_path):
+    path = tmp_path / 'game.zip'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('game.nes', BODY)
+    # Corrupt the deflate stream, which zipfile reports as a zlib.error
+    data = bytearray(path.read_bytes())
+    data[40:200] = bytes(range(160))
+    path.write_bytes(data)
+
+    with pytest.raises(OSError):
+        native.calculate_hash(7, str(path))
+    with pytest.raises(OSError):
+        native.hash_archive(7, str(path))